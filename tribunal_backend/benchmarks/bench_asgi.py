@@ -0,0 +1,254 @@
+"""Benchmark de clientes lentos com keep-alive: servidor WSGI com threads vs modo ASGI.
+
+Um único processo servidor e milhares de ligações HTTP/1.1 persistentes. Cada
+cliente envia o pedido em duas metades separadas por --slow segundos (cliente
+lento), lê a resposta e fica parado --think segundos na mesma ligação antes do
+pedido seguinte (keep-alive).
+
+- wsgi: servidor do Werkzeug com um pool de --threads threads, em que cada
+  ligação ocupa uma thread enquanto estiver aberta (modelo thread por ligação);
+  o Werkzeug fecha a ligação depois de cada resposta e o cliente volta a ligar;
+- asgi: uvicorn com src.models.asgi.ASGIApp; as leituras usam o aiosqlite.
+
+Mede-se, para cada número de clientes: pedidos por segundo, latência p50/p99
+(do primeiro byte do pedido ao fim da resposta, descontada a pausa --slow),
+ligações abertas, clientes que nunca foram servidos, erros, o RSS máximo e o
+tempo de CPU por pedido do servidor.
+
+Uso: python benchmarks/bench_asgi.py [--clients 100,1000,3000] [--think 60] [--duration 60]
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import socket
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer
+
+from bench_case_search import populate
+from bench_suite import process_peak_rss_mb
+from common import create_bench_app, summarize
+
+SEARCH_PATH = '/api/cases/search?per_page=10'
+
+
+def app_config():
+    return {
+        'PASSWORD_HASH_WORKERS': 0,
+        'RESPONSE_CACHE_BACKEND': None,
+    }
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Servidor WSGI em que cada ligação ocupa uma thread de um pool fixo"""
+
+    multithread = True
+    request_queue_size = 4096
+
+    def __init__(self, host, port, app, threads):
+        super().__init__(host, port, app)
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def serve(db_path, mode, port, threads):
+    """Processo servidor (um só processo em ambos os modos)"""
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    app = create_bench_app(db_path, app_config())
+
+    if mode == 'wsgi':
+        PooledWSGIServer('127.0.0.1', port, app, threads).serve_forever()
+        return
+
+    import uvicorn
+    from src.models.asgi import ASGIApp
+    from src.models.database import init_async_database
+
+    asgi = ASGIApp(app, engine=init_async_database(app))
+    config = uvicorn.Config(
+        asgi, host='127.0.0.1', port=port, log_level='warning', lifespan='on',
+        backlog=4096, timeout_keep_alive=600,
+    )
+    uvicorn.Server(config).run()
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    return status, headers.get('connection') == 'close'
+
+
+async def client(port, stop, delay, args, results):
+    """Um cliente lento: uma ligação persistente e pedidos até ao fim da fase"""
+    loop = asyncio.get_running_loop()
+    await asyncio.sleep(delay)
+    request = f'GET {SEARCH_PATH} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: keep-alive\r\n\r\n'.encode('ascii')
+    half = len(request) // 2
+    served = False
+    writer = None
+    try:
+        while loop.time() < stop:
+            if writer is None:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                results['connections'] += 1
+            sent = loop.time()
+            writer.write(request[:half])
+            await writer.drain()
+            await asyncio.sleep(args.slow)
+            writer.write(request[half:])
+            await writer.drain()
+
+            remaining = stop - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                status, close = await asyncio.wait_for(read_response(reader), remaining)
+            except asyncio.TimeoutError:
+                break
+            # Sem a pausa do próprio cliente: o que resta é espera pelo servidor
+            results['timings'].append((loop.time() - sent - args.slow) * 1000)
+            if status != 200:
+                results['errors'] += 1
+            served = True
+            if close:
+                writer.close()
+                writer = None
+            await asyncio.sleep(min(args.think, max(stop - loop.time(), 0)))
+    except (OSError, asyncio.IncompleteReadError):
+        results['errors'] += 1
+    finally:
+        if writer is not None:
+            writer.close()
+    if not served:
+        results['unserved'] += 1
+
+
+async def run_clients(port, clients, args):
+    loop = asyncio.get_running_loop()
+    results = {'timings': [], 'errors': 0, 'unserved': 0, 'connections': 0}
+    # Ligações abertas ao longo dos primeiros --ramp segundos
+    start = loop.time()
+    stop = start + args.duration
+    await asyncio.gather(*[
+        client(port, stop, args.ramp * i / clients, args, results) for i in range(clients)
+    ])
+    return results, loop.time() - start
+
+
+def client_process(port, clients, args, queue):
+    queue.put(asyncio.run(run_clients(port, clients, args)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'Servidor sem resposta na porta {port}')
+
+
+def process_cpu_seconds(pid):
+    """Tempo de CPU (user + system) de outro processo, a partir de /proc"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+    except OSError:
+        return 0.0
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def run(db_path, mode, clients, args):
+    context = multiprocessing.get_context('fork')
+    port = free_port()
+    server = context.Process(target=serve, args=(db_path, mode, port, args.threads), daemon=True)
+    server.start()
+    try:
+        wait_for_port(port)
+        cpu = process_cpu_seconds(server.pid)
+        # Clientes noutro processo, para não partilharem o GIL com o servidor
+        queue = context.Queue()
+        process = context.Process(target=client_process, args=(port, clients, args, queue))
+        process.start()
+        results, elapsed = queue.get()
+        process.join()
+        rss = process_peak_rss_mb(server.pid)
+        cpu = process_cpu_seconds(server.pid) - cpu
+    finally:
+        server.terminate()
+        server.join()
+    return results, elapsed, rss, cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cases', type=int, default=20_000)
+    parser.add_argument('--clients', default='100,1000,3000')
+    parser.add_argument('--modes', default='wsgi,asgi')
+    parser.add_argument('--threads', type=int, default=32, help='Threads do servidor WSGI')
+    parser.add_argument('--slow', type=float, default=0.5, help='Pausa a meio do envio de cada pedido (s)')
+    parser.add_argument('--think', type=float, default=60.0, help='Pausa entre pedidos na mesma ligação (s)')
+    parser.add_argument('--ramp', type=float, default=60, help='Intervalo em que os clientes se ligam (s)')
+    parser.add_argument('--duration', type=float, default=60)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        create_bench_app(db_path, app_config())
+        populate(db_path, args.cases)
+
+        print(
+            f"{'modo':5} {'clientes':>8} {'pedidos/s':>10} {'p50 ms':>9} {'p99 ms':>9} "
+            f"{'ligações':>8} {'não servidos':>12} {'erros':>6} {'RSS MB':>7} {'CPU ms/pedido':>14}"
+        )
+        for clients in map(int, args.clients.split(',')):
+            for mode in args.modes.split(','):
+                results, elapsed, rss, cpu = run(db_path, mode, clients, args)
+                stats = summarize(results['timings']) if results['timings'] else {'p50': 0.0, 'p99': 0.0}
+                print(
+                    f"{mode:5} {clients:8d} {len(results['timings']) / elapsed:10.1f} "
+                    f"{stats['p50']:9.2f} {stats['p99']:9.2f} {results['connections']:8d} {results['unserved']:12d} "
+                    f"{results['errors']:6d} {rss if rss is not None else 0:7.1f} "
+                    f"{cpu * 1000 / max(len(results['timings']), 1):14.2f}"
+                )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Benchmark da pesquisa de processos: ILIKE vs índice FTS5 e OFFSET vs cursor.
+
+Uso: python benchmarks/bench_case_search.py [--cases 1000000]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from datetime import datetime
+
+from common import create_bench_app, measure, summarize
+from src.models.pagination import encode_cursor
+from src.models.user import normalize_text
+
+FIRST_NAMES = ['João', 'Maria', 'António', 'Ana', 'José', 'Fátima', 'Manuel', 'Inês', 'Armando', 'Graça']
+LAST_NAMES = ['Silva', 'Santos', 'Costa', 'Macuácua', 'Mondlane', 'Chissano', 'Nhantumbo', 'Sitoe', 'Mabunda', 'Cossa']
+CASE_TYPES = [('civil', 'CV'), ('criminal', 'CR'), ('family', 'FM'), ('probate', 'PR')]
+STATUSES = ['open', 'pending', 'closed', 'suspended']
+
+QUERIES = [
+    '/api/cases/search?case_number=CV/0001',
+    '/api/cases/search?party_name=Jo%C3%A3o%20Mabunda',
+    '/api/cases/search?party_name=nhantumbo',
+    '/api/cases/search?q=cobran%C3%A7a%20sitoe&sort=relevance',
+]
+
+
+def populate(db_path, total, seed=42):
+    """Inserir processos sintéticos diretamente com sqlite3 (executemany)"""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+
+    def rows():
+        for i in range(total):
+            case_type, code = rng.choice(CASE_TYPES)
+            year = 2000 + i % 25
+            plaintiff = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+            defendant = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+            title = f'{plaintiff} vs. {defendant} - Ação de cobrança'
+            yield (
+                f'{year}/{code}/{i:07d}', title, case_type, rng.choice(STATUSES), plaintiff, defendant,
+                f'{year}-{1 + i % 12:02d}-{1 + i % 28:02d} 10:00:00.000000',
+                'Processo gerado para benchmark', 1,
+                normalize_text(title), normalize_text(plaintiff), normalize_text(defendant)
+            )
+
+    conn.executemany(
+        'INSERT INTO "case" (case_number, title, case_type, status, plaintiff, defendant, '
+        'filing_date, description, is_public, title_normalized, plaintiff_normalized, '
+        'defendant_normalized) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        rows()
+    )
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cases', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        app = create_bench_app(db_path)
+
+        start = time.perf_counter()
+        populate(db_path, args.cases)
+        print(f'{args.cases} processos inseridos (com índice FTS5) em {time.perf_counter() - start:.1f}s')
+
+        client = app.test_client()
+        print(f"{'consulta':60} {'modo':6} {'p50 ms':>10} {'p99 ms':>10}")
+        for url in QUERIES:
+            for mode, enabled in (('ilike', False), ('fts5', True)):
+                app.config['CASE_FTS_ENABLED'] = enabled
+                stats = summarize(measure(client, url, args.repeat))
+                print(f"{url[18:]:60} {mode:6} {stats['p50']:10.2f} {stats['p99']:10.2f}")
+
+        print()
+        print(f"{'paginação (per_page=10)':60} {'modo':6} {'p50 ms':>10} {'p99 ms':>10}")
+        for page in (1, 5000):
+            url = f'/api/cases/search?page={page}&per_page=10'
+            stats = summarize(measure(client, url, args.repeat))
+            print(f"{'página ' + str(page):60} {'offset':6} {stats['p50']:10.2f} {stats['p99']:10.2f}")
+
+            cursor = deep_cursor(client, page)
+            stats = summarize(measure(client, f'/api/cases/search?per_page=10&cursor={cursor}', args.repeat))
+            print(f"{'página ' + str(page):60} {'cursor':6} {stats['p50']:10.2f} {stats['p99']:10.2f}")
+
+
+def deep_cursor(client, page):
+    """Cursor da página `page`, obtido a partir do último processo da página anterior"""
+    if page == 1:
+        return ''
+    offset = (page - 1) * 10 - 1
+    last = client.get(f'/api/cases/search?page={offset + 1}&per_page=1').get_json()['cases'][0]
+    return encode_cursor(datetime.fromisoformat(last['filing_date']), last['id'])
+
+
+if __name__ == '__main__':
+    main()
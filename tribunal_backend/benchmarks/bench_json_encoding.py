@@ -0,0 +1,73 @@
+"""Benchmark da codificação JSON de listas grandes: json vs orjson, corpo completo vs streaming.
+
+Mede a latência e o pico de memória (tracemalloc) de uma página grande da
+pesquisa de processos, com o corpo lido em blocos como faria o servidor.
+
+Uso: python benchmarks/bench_json_encoding.py [--cases 20000] [--per-page 5000]
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from bench_case_search import populate
+from common import create_bench_app, summarize
+from src.models.serialization import JSONProvider, orjson
+
+
+def request(client, url):
+    """Pedido com o corpo consumido bloco a bloco (sem o juntar em memória)"""
+    response = client.get(url, buffered=False)
+    size = 0
+    for chunk in response.response:
+        size += len(chunk)
+    response.close()
+    assert response.status_code == 200
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cases', type=int, default=20_000)
+    parser.add_argument('--per-page', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        app = create_bench_app(db_path, {'RESPONSE_CACHE_BACKEND': None, 'PASSWORD_HASH_WORKERS': 0})
+        populate(db_path, args.cases)
+        client = app.test_client()
+        url = f'/api/cases/search?per_page={args.per_page}&total=none'
+
+        encoders = ['stdlib'] + (['orjson'] if orjson is not None else [])
+        print(f"{'codificador':12} {'modo':10} {'p50 ms':>10} {'p99 ms':>10} {'pico MB':>10} {'KB':>10}")
+        for encoder in encoders:
+            for mode, min_rows in (('completo', args.per_page), ('streaming', 0)):
+                app.config.update(JSON_ENCODER=encoder, JSON_STREAM_MIN_ROWS=min_rows)
+                app.json = JSONProvider(app)
+
+                size = request(client, url)  # aquecimento
+                timings = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    request(client, url)
+                    timings.append((time.perf_counter() - start) * 1000)
+
+                tracemalloc.start()
+                request(client, url)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+                stats = summarize(timings)
+                print(
+                    f"{encoder:12} {mode:10} {stats['p50']:10.2f} {stats['p99']:10.2f} "
+                    f"{peak / 1024 / 1024:10.1f} {size / 1024:10.0f}"
+                )
+
+        app.extensions['password_hasher'].shutdown()
+
+
+if __name__ == '__main__':
+    main()
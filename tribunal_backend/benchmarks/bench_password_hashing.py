@@ -0,0 +1,112 @@
+"""Benchmark de logins em simultâneo com pesquisas: hashing na thread do pedido vs processos.
+
+Um servidor HTTP com threads (werkzeug) recebe logins contínuos de vários
+clientes enquanto outro cliente mede a latência da pesquisa de processos.
+
+Uso: python benchmarks/bench_password_hashing.py [--workers 4] [--clients 8] [--duration 10]
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from werkzeug.serving import make_server
+
+from bench_case_search import populate
+from common import create_bench_app, summarize
+
+SEARCH_URL = '/api/cases/search?party_name=silva&per_page=10'
+
+
+def request(base, path, data=None):
+    body = json.dumps(data).encode('utf-8') if data is not None else None
+    req = urllib.request.Request(base + path, data=body, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def run(db_path, workers, clients, duration):
+    app = create_bench_app(db_path, {
+        'PASSWORD_HASH_WORKERS': workers,
+        'RESPONSE_CACHE_BACKEND': None,
+    })
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+
+    idle = [timed(base, SEARCH_URL) for _ in range(50)]
+
+    stop = time.perf_counter() + duration
+    statuses = []
+
+    def login_loop():
+        while time.perf_counter() < stop:
+            statuses.append(request(base, '/api/auth/login', {'username': 'bench', 'password': 'bench-password'}))
+
+    threads = [threading.Thread(target=login_loop) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+
+    loaded = []
+    while time.perf_counter() < stop:
+        loaded.append(timed(base, SEARCH_URL))
+
+    for thread in threads:
+        thread.join()
+    server.shutdown()
+    app.extensions['password_hasher'].shutdown()
+
+    return {
+        'logins/s': statuses.count(200) / duration,
+        '503': statuses.count(503),
+        'search_idle': summarize(idle),
+        'search_loaded': summarize(loaded),
+    }
+
+
+def timed(base, path):
+    start = time.perf_counter()
+    status = request(base, path)
+    assert status == 200, status
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cases', type=int, default=10_000)
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        app = create_bench_app(db_path)
+        populate(db_path, args.cases)
+        app.test_client().post('/api/auth/register', json={
+            'username': 'bench', 'email': 'bench@tribunal.pt', 'password': 'bench-password'
+        })
+
+        print(f"{'hashing':12} {'logins/s':>9} {'503':>6} {'pesquisa p50/p99 ms (sem carga)':>32} {'pesquisa p50/p99 ms (com logins)':>34}")
+        for label, workers in (('thread', 0), (f'{args.workers} processos', args.workers)):
+            result = run(db_path, workers, args.clients, args.duration)
+            idle = result['search_idle']
+            loaded = result['search_loaded']
+            print(
+                f"{label:12} {result['logins/s']:9.1f} {result['503']:6d} "
+                f"{idle['p50']:15.2f} / {idle['p99']:<14.2f} {loaded['p50']:17.2f} / {loaded['p99']:<14.2f}"
+            )
+
+
+if __name__ == '__main__':
+    main()
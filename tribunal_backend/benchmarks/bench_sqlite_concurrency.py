@@ -0,0 +1,172 @@
+"""Benchmark de leituras durante escritas contínuas: modo por omissão vs modo de produção.
+
+Vários processos servidores (como os workers do gunicorn) partilham a mesma
+base de dados. Clientes de escrita atualizam perfis sem parar enquanto
+clientes de leitura pesquisam processos; mede-se o débito e a latência das
+leituras e quantas escritas falham (ex.: "database is locked").
+
+Uso: python benchmarks/bench_sqlite_concurrency.py [--processes 4] [--readers 8] [--writers 4] [--duration 10]
+"""
+import argparse
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import jwt
+from werkzeug.serving import make_server
+
+from bench_case_search import populate
+from common import create_bench_app, summarize
+
+SECRET_KEY = 'asdf#FGSgvasgf$5$WGT'
+
+SEARCH_URL = '/api/cases/search?party_name=silva&per_page=10'
+
+
+def app_config(mode):
+    return {
+        'DATABASE_MODE': mode,
+        'PASSWORD_HASH_WORKERS': 0,
+        'RESPONSE_CACHE_BACKEND': None,
+    }
+
+
+def serve(db_path, mode, ports):
+    """Processo servidor (um worker): aplicação própria, servidor com threads"""
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    app = create_bench_app(db_path, app_config(mode))
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    ports.put(server.server_port)
+    server.serve_forever()
+
+
+def request(url, method='GET', data=None, token=None):
+    body = json.dumps(data).encode('utf-8') if data is not None else None
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    req = urllib.request.Request(url, data=body, headers=headers, method=method)
+    try:
+        with urllib.request.urlopen(req) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        return e.code
+
+
+def create_writers(db_path, count):
+    """Utilizadores de escrita inseridos diretamente, com tokens JWT válidos"""
+    conn = sqlite3.connect(db_path)
+    tokens = []
+    for i in range(count):
+        cursor = conn.execute(
+            'INSERT INTO user (username, email, password_hash, role, created_at, is_active) '
+            "VALUES (?, ?, 'x', 'citizen', ?, 1)",
+            (f'writer{i}', f'writer{i}@tribunal.pt', datetime.datetime.utcnow())
+        )
+        tokens.append(jwt.encode({
+            'user_id': cursor.lastrowid,
+            'username': f'writer{i}',
+            'role': 'citizen',
+            'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+        }, SECRET_KEY, algorithm='HS256'))
+    conn.commit()
+    conn.close()
+    return tokens
+
+
+def run(mode, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        create_bench_app(db_path, app_config(mode)).extensions['password_hasher'].shutdown()
+        populate(db_path, args.cases)
+        tokens = create_writers(db_path, args.writers)
+
+        context = multiprocessing.get_context('fork')
+        ports = context.Queue()
+        processes = [context.Process(target=serve, args=(db_path, mode, ports), daemon=True) for _ in range(args.processes)]
+        for process in processes:
+            process.start()
+        bases = [f'http://127.0.0.1:{ports.get(timeout=60)}' for _ in processes]
+
+        try:
+            idle = read_phase(bases, args.readers, args.duration / 2, None)
+            loaded = read_phase(bases, args.readers, args.duration, tokens)
+        finally:
+            for process in processes:
+                process.terminate()
+                process.join()
+    return idle, loaded
+
+
+def read_phase(bases, readers, duration, tokens):
+    """Leituras durante `duration` segundos, com escritas contínuas se houver `tokens`"""
+    stop = time.perf_counter() + duration
+    timings = []
+    read_errors = []
+    writes = []
+
+    def read_loop(index):
+        base = bases[index % len(bases)]
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            status = request(base + SEARCH_URL)
+            timings.append((time.perf_counter() - start) * 1000)
+            if status != 200:
+                read_errors.append(status)
+
+    def write_loop(index, token):
+        base = bases[index % len(bases)]
+        n = 0
+        while time.perf_counter() < stop:
+            n += 1
+            writes.append(request(
+                base + '/api/auth/profile', 'PUT', {'email': f'writer{index}-{n}@tribunal.pt'}, token
+            ))
+
+    threads = [threading.Thread(target=read_loop, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=write_loop, args=(i, token)) for i, token in enumerate(tokens or ())]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return {
+        'reads/s': len(timings) / duration,
+        'read_errors': len(read_errors),
+        'latency': summarize(timings),
+        'writes/s': writes.count(200) / duration,
+        'write_errors': len(writes) - writes.count(200),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cases', type=int, default=20_000)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10)
+    args = parser.parse_args()
+
+    print(f"{'modo':11} {'fase':9} {'leituras/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'erros leit.':>11} {'escritas/s':>10} {'erros escr.':>11}")
+    for mode in ('default', 'production'):
+        for phase, result in zip(('sem escr.', 'com escr.'), run(mode, args)):
+            print(
+                f"{mode:11} {phase:9} {result['reads/s']:10.1f} {result['latency']['p50']:8.2f} "
+                f"{result['latency']['p99']:8.2f} {result['read_errors']:11d} "
+                f"{result['writes/s']:10.1f} {result['write_errors']:11d}"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,434 @@
+"""Benchmark de ponta a ponta da API sobre bases de dados geradas de vários tamanhos.
+
+Para cada tamanho (gerado uma vez com create_sample_data.py e guardado em
+--data-dir) e cada modo de execução:
+
+- client: cliente de teste do Flask, pedidos sequenciais num só processo;
+- server: servidor real com vários processos (pre-fork, como o gunicorn) a
+  partilhar o mesmo socket, com clientes HTTP concorrentes;
+
+mede cada cenário (endpoint e combinação de parâmetros): latência
+p50/p95/p99, pedidos por segundo, consultas SQL por pedido (no modo server,
+lidas do cabeçalho Server-Timing) e RSS máximo do processo (no modo server, o
+do maior worker).
+
+Cada execução corre num subprocesso próprio com a aplicação de src/main.py
+apontada para a base de dados gerada (DATABASE_URL).
+
+Os resultados podem ser guardados como baseline (JSON) e comparados numa
+execução posterior: o comando termina com código 1 se algum cenário piorar
+além de --threshold (latência p50/p95, débito, RSS) ou fizer mais consultas.
+
+Uso:
+    python benchmarks/bench_suite.py [--sizes small,medium] [--drivers client,server]
+        [--save-baseline benchmarks/baseline.json] [--baseline benchmarks/baseline.json]
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import re
+import resource
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, timedelta
+
+from common import summarize
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Processos sintéticos por tamanho (mais 10 audiências e 2 documentos por processo)
+SIZES = {
+    'small': 1_000,
+    'medium': 50_000,
+    'large': 1_000_000,
+}
+
+DRIVERS = ('client', 'server')
+
+# Métricas comparadas com a baseline: nome -> True se valores maiores são piores
+COMPARED_METRICS = {
+    'p50': True,
+    'p95': True,
+    'rps': False,
+    'peak_rss_mb': True,
+}
+
+def scenarios(today):
+    """(nome, método, caminho, corpo JSON, autenticado, fração das repetições)"""
+    window = f'date_from={today.isoformat()}&date_to={(today + timedelta(days=30)).isoformat()}'
+    return [
+        ('cases_search', 'GET', '/api/cases/search?per_page=10', None, False, 1),
+        ('cases_search_text', 'GET', '/api/cases/search?q=silva%20cobran%C3%A7a&per_page=10', None, False, 1),
+        ('cases_search_relevance', 'GET', '/api/cases/search?q=nhantumbo&sort=relevance&per_page=10', None, False, 1),
+        ('cases_search_party', 'GET', '/api/cases/search?party_name=maria%20santos&per_page=10', None, False, 1),
+        ('cases_search_number', 'GET', '/api/cases/search?case_number=CV/0001&per_page=10', None, False, 1),
+        ('cases_search_filters', 'GET', '/api/cases/search?case_type=civil&status=open&per_page=10&facets=case_type,status', None, False, 1),
+        ('cases_search_deep_page', 'GET', '/api/cases/search?page=50&per_page=20', None, False, 1),
+        ('case_detail', 'GET', '/api/cases/1', None, False, 1),
+        ('hearings', 'GET', '/api/hearings?per_page=20', None, False, 1),
+        ('hearings_window', 'GET', f'/api/hearings?{window}&per_page=50', None, False, 1),
+        ('hearings_courtroom', 'GET', f'/api/hearings?courtroom=Sala%201&{window}', None, False, 1),
+        ('hearing_conflicts', 'GET', f'/api/hearings/conflicts?{window}', None, True, 0.25),
+        ('courtroom_ics', 'GET', '/api/hearings/courtroom/Sala%201.ics', None, False, 1),
+        ('forms', 'GET', '/api/forms', None, False, 1),
+        ('forms_category', 'GET', '/api/forms?category=civil', None, False, 1),
+        ('forms_search', 'GET', '/api/forms?search=requerimento', None, False, 1),
+        ('autocomplete_cases', 'GET', '/api/autocomplete/cases?q=2024/cv', None, False, 1),
+        ('autocomplete_parties', 'GET', '/api/autocomplete/parties?q=mab', None, False, 1),
+        ('case_documents', 'GET', '/api/cases/5/documents', None, True, 1),
+        ('login', 'POST', '/api/auth/login', {'username': 'admin', 'password': 'admin123'}, False, 0.2),
+        ('profile', 'GET', '/api/auth/profile', None, True, 1),
+        ('static_index', 'GET', '/', None, False, 1),
+        ('static_spa_route', 'GET', '/processos/2024/CV/001', None, False, 1),
+        ('static_favicon', 'GET', '/favicon.ico', None, False, 1),
+    ]
+
+def peak_rss_mb():
+    """RSS máximo deste processo (MB)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux em KB, macOS em bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def process_peak_rss_mb(pid):
+    """RSS máximo de outro processo (MB), a partir de /proc; None fora do Linux"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def result_entry(timings, elapsed, queries=None, rss=None):
+    stats = summarize(timings)
+    return {
+        'requests': len(timings),
+        'p50': round(stats['p50'], 3),
+        'p95': round(stats['p95'], 3),
+        'p99': round(stats['p99'], 3),
+        'rps': round(len(timings) / elapsed, 1),
+        'queries': queries,
+        'peak_rss_mb': round(rss, 1) if rss is not None else None,
+    }
+
+# Execução num subprocesso (--worker): importa src.main com DATABASE_URL
+
+def load_app():
+    from src.main import app
+    return app
+
+def run_client(args):
+    from sqlalchemy import event
+    from src.models.user import db
+
+    app = load_app()
+    client = app.test_client()
+    queries = [0]
+
+    def count(*_):
+        queries[0] += 1
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', count)
+
+    token = client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'}).get_json()['token']
+    results = {}
+    for name, method, path, body, authenticated, fraction in scenarios(date.fromisoformat(args.today)):
+        headers = {'Authorization': f'Bearer {token}'} if authenticated else {}
+        repeat = max(int(args.repeat * fraction), 5)
+
+        for _ in range(args.warmup):
+            client.open(path, method=method, json=body, headers=headers).close()
+
+        timings = []
+        before = queries[0]
+        started = time.perf_counter()
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = client.open(path, method=method, json=body, headers=headers)
+            response.get_data()
+            timings.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                raise RuntimeError(f'{name}: {response.status_code} {response.get_data(as_text=True)[:200]}')
+            response.close()
+        elapsed = time.perf_counter() - started
+
+        results[name] = result_entry(timings, elapsed, round((queries[0] - before) / repeat, 2), peak_rss_mb())
+    return results
+
+def _serve_forked(app, sock):
+    """Worker do servidor pre-fork: ligações e pool de hashing próprios"""
+    from werkzeug.serving import make_server
+    from src.models.user import db
+    from src.models.passwords import init_password_hasher
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    init_password_hasher(app)
+    app.extensions['password_hasher'].start()
+
+    def stop(signum, frame):
+        raise SystemExit
+
+    signal.signal(signal.SIGTERM, stop)
+    host, port = sock.getsockname()
+    server = make_server(host, port, app, threaded=True, fd=sock.fileno())
+    try:
+        server.serve_forever()
+    finally:
+        # Os processos de hashing herdam o stdout: terminá-los antes de sair
+        app.extensions['password_hasher'].shutdown(wait=True)
+
+# Consultas SQL do pedido, no cabeçalho Server-Timing (src/models/metrics.py)
+_SERVER_TIMING_QUERIES_RE = re.compile(r'\bdb;[^,]*desc="(\d+) consulta')
+
+def _http(port, method, path, body, headers):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    try:
+        payload = json.dumps(body) if body is not None else None
+        if payload is not None:
+            headers = dict(headers, **{'Content-Type': 'application/json'})
+        connection.request(method, path, body=payload, headers=headers)
+        response = connection.getresponse()
+        data = response.read()
+        return response.status, data, response.getheader('Server-Timing')
+    finally:
+        connection.close()
+
+def run_server(args):
+    import logging
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    app = load_app()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(('127.0.0.1', 0))
+    sock.listen(128)
+    port = sock.getsockname()[1]
+
+    pids = []
+    for _ in range(args.processes):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _serve_forked(app, sock)
+            finally:
+                os._exit(0)
+        pids.append(pid)
+
+    try:
+        status, data, timing = _http(port, 'POST', '/api/auth/login', {'username': 'admin', 'password': 'admin123'}, {})
+        token = json.loads(data)['token']
+
+        results = {}
+        for name, method, path, body, authenticated, fraction in scenarios(date.fromisoformat(args.today)):
+            headers = {'Authorization': f'Bearer {token}'} if authenticated else {}
+            total = max(int(args.server_requests * fraction), args.concurrency)
+
+            # Aquecimento: cada worker constrói as suas caches e índices
+            for _ in range(args.warmup * args.processes):
+                _http(port, method, path, body, headers)
+
+            timings = []
+            queries = []
+            errors = []
+            remaining = [total]
+            lock = threading.Lock()
+
+            def client_loop():
+                while True:
+                    with lock:
+                        if remaining[0] <= 0:
+                            return
+                        remaining[0] -= 1
+                    start = time.perf_counter()
+                    status, data, timing = _http(port, method, path, body, headers)
+                    timings.append((time.perf_counter() - start) * 1000)
+                    match = _SERVER_TIMING_QUERIES_RE.search(timing or '')
+                    if match:
+                        queries.append(int(match.group(1)))
+                    if status >= 400:
+                        errors.append(status)
+
+            threads = [threading.Thread(target=client_loop) for _ in range(args.concurrency)]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+
+            if errors:
+                raise RuntimeError(f'{name}: {len(errors)} respostas com erro ({errors[0]})')
+            rss = [process_peak_rss_mb(pid) for pid in pids]
+            average = round(sum(queries) / len(queries), 2) if len(queries) == len(timings) else None
+            results[name] = result_entry(timings, elapsed, average, max(rss) if None not in rss else None)
+        return results
+    finally:
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+            except OSError:
+                pass
+        app.extensions['password_hasher'].shutdown(wait=True)
+
+# Orquestração
+
+def dataset_path(args, size):
+    return os.path.join(args.data_dir, f'{size}-{args.seed}-{args.today}.db')
+
+def ensure_dataset(args, size):
+    """Gerar a base de dados de `size` se ainda não existir (create_sample_data.py)"""
+    path = dataset_path(args, size)
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    print(f'A gerar o conjunto {size} ({SIZES[size]} processos) em {path}...', file=sys.stderr)
+    temp_path = path + '.tmp'
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    subprocess.run(
+        [
+            sys.executable, os.path.join(BACKEND_DIR, 'create_sample_data.py'),
+            '--cases', str(SIZES[size]), '--seed', str(args.seed), '--today', args.today,
+        ],
+        cwd=BACKEND_DIR,
+        env=dict(os.environ, DATABASE_URL=f'sqlite:///{temp_path}', PASSWORD_HASH_WORKERS='0'),
+        check=True,
+        stdout=sys.stderr,
+    )
+    os.replace(temp_path, path)
+    return path
+
+def run_worker(args, size, driver):
+    """Executar um modo num subprocesso; devolve os resultados por cenário"""
+    command = [
+        sys.executable, os.path.abspath(__file__), '--worker', driver,
+        '--today', args.today,
+        '--repeat', str(args.repeat),
+        '--warmup', str(args.warmup),
+        '--processes', str(args.processes),
+        '--concurrency', str(args.concurrency),
+        '--server-requests', str(args.server_requests),
+    ]
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{dataset_path(args, size)}')
+    if args.no_cache:
+        env['RESPONSE_CACHE_BACKEND'] = ''
+    output = subprocess.run(command, cwd=BACKEND_DIR, env=env, check=True, stdout=subprocess.PIPE, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def compare(results, baseline, threshold):
+    """Regressões em relação à baseline (lista de mensagens)"""
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+
+        for metric, higher_is_worse in COMPARED_METRICS.items():
+            old, new = previous.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (change > threshold) if higher_is_worse else (change < -threshold):
+                regressions.append(f'{key}: {metric} {old} -> {new} ({change:+.0%})')
+
+        old, new = previous.get('queries'), current.get('queries')
+        if old is not None and new is not None and new > old:
+            regressions.append(f'{key}: consultas SQL {old} -> {new}')
+    return regressions
+
+def print_results(results):
+    print(f"{'conjunto/modo/cenário':52} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'pedidos/s':>10} {'SQL':>6} {'RSS MB':>8}")
+    for key, entry in results.items():
+        queries = f"{entry['queries']:6.1f}" if entry['queries'] is not None else f"{'-':>6}"
+        rss = f"{entry['peak_rss_mb']:8.1f}" if entry['peak_rss_mb'] is not None else f"{'-':>8}"
+        print(
+            f"{key:52} {entry['p50']:9.2f} {entry['p95']:9.2f} {entry['p99']:9.2f} "
+            f"{entry['rps']:10.1f} {queries} {rss}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='small', help=f"Tamanhos separados por vírgulas ({', '.join(SIZES)})")
+    parser.add_argument('--drivers', default=','.join(DRIVERS), help='client, server ou ambos')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--today', default=date.today().isoformat(), help='Data de referência dos dados (AAAA-MM-DD)')
+    parser.add_argument('--data-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), '.data'))
+    parser.add_argument('--repeat', type=int, default=50, help='Pedidos por cenário no modo client')
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--processes', type=int, default=min(4, os.cpu_count() or 1), help='Workers do servidor')
+    parser.add_argument('--concurrency', type=int, default=8, help='Clientes HTTP concorrentes no modo server')
+    parser.add_argument('--server-requests', type=int, default=200, help='Pedidos por cenário no modo server')
+    parser.add_argument('--no-cache', action='store_true', help='Desativar a cache de respostas')
+    parser.add_argument('--output', help='Guardar os resultados (JSON)')
+    parser.add_argument('--save-baseline', help='Guardar os resultados como baseline (JSON)')
+    parser.add_argument('--baseline', help='Comparar com uma baseline guardada')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Variação tolerada (0.25 = 25%%)')
+    parser.add_argument('--worker', choices=DRIVERS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        results = run_client(args) if args.worker == 'client' else run_server(args)
+        print(json.dumps(results))
+        return 0
+
+    sizes = [size.strip() for size in args.sizes.split(',') if size.strip()]
+    drivers = [driver.strip() for driver in args.drivers.split(',') if driver.strip()]
+    unknown = [size for size in sizes if size not in SIZES] + [driver for driver in drivers if driver not in DRIVERS]
+    if unknown:
+        parser.error(f"Valores desconhecidos: {', '.join(unknown)}")
+
+    results = {}
+    for size in sizes:
+        ensure_dataset(args, size)
+        for driver in drivers:
+            for name, entry in run_worker(args, size, driver).items():
+                results[f'{size}/{driver}/{name}'] = entry
+
+    print_results(results)
+
+    document = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'seed': args.seed,
+            'today': args.today,
+            'processes': args.processes,
+            'concurrency': args.concurrency,
+            'response_cache': not args.no_cache,
+        },
+        'results': results,
+    }
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(document, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f'\n{len(regressions)} regressões acima de {args.threshold:.0%}:')
+            for message in regressions:
+                print(f'- {message}')
+            return 1
+        print(f'\nSem regressões acima de {args.threshold:.0%} em relação a {args.baseline}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,64 @@
+import os
+import sys
+import time
+import statistics
+
+# DON'T CHANGE THIS !!!
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from src.models.user import db, add_missing_columns, create_missing_indexes
+from src.models.database import configure_database, init_database
+from src.models.search import init_case_search
+from src.models.passwords import init_password_hasher
+from src.models.serialization import init_json_provider
+from src.routes.case import case_bp
+from src.routes.form import form_bp
+from src.routes.auth import auth_bp
+
+
+def create_bench_app(db_path, config=None):
+    """Aplicação com os mesmos blueprints de src/main.py sobre outra base de dados"""
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config.update(config or {})
+
+    app.register_blueprint(case_bp, url_prefix='/api')
+    app.register_blueprint(form_bp, url_prefix='/api')
+    app.register_blueprint(auth_bp, url_prefix='/api')
+
+    init_json_provider(app)
+    configure_database(app)
+    db.init_app(app)
+    init_database(app)
+    with app.app_context():
+        db.create_all()
+        add_missing_columns()
+        create_missing_indexes()
+        init_case_search(app)
+
+    init_password_hasher(app)
+    return app
+
+
+def measure(client, url, repeat=20):
+    """Latências (ms) de pedidos GET repetidos"""
+    client.get(url)  # aquecimento
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url)
+        timings.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.get_data(as_text=True)
+    return timings
+
+
+def summarize(timings):
+    ordered = sorted(timings)
+    return {
+        'p50': statistics.median(ordered),
+        'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        'p99': ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+    }
@@ -1,9 +1,17 @@
 from flask import Flask
-from src.models.user import db, User, Case, Form, Hearing, Document
+from src.models.user import db, User, Case, Form, Hearing, Document, DocumentIndexJob, normalize_text, create_missing_indexes
+from src.models.search import rebuild_case_search, drop_case_search_triggers
+from src.models.indexing import DOCUMENT_FTS_TABLE, init_document_search
+from src.models.cache import bump_versions
 from werkzeug.security import generate_password_hash
 from datetime import datetime, timedelta
+from array import array
+from itertools import accumulate
+import argparse
 import os
+import random
 import sys
+import time
 
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
@@ -196,14 +204,393 @@ def create_sample_data():
     print(f"Audiências criadas: {len(hearings)}")
     print(f"Formulários criados: {len(forms)}")
 
+# Gerador de dados sintéticos para testes de carga.
+#
+# Determinístico: a mesma semente e a mesma data de referência produzem sempre
+# a mesma base de dados. As linhas são inseridas com Core em lotes grandes,
+# uma transação por tabela, com os índices e os triggers do FTS5 removidos
+# durante a carga e reconstruídos no fim (bem mais rápido do que mantê-los
+# linha a linha).
+
+BATCH_SIZE = 20000
+
+# Todos os utilizadores sintéticos partilham esta password
+SYNTHETIC_PASSWORD = 'sintetico123'
+
+# Nomes próprios e apelidos com pesos aproximados da sua frequência
+MALE_NAMES = [
+    ('João', 30), ('António', 26), ('José', 26), ('Manuel', 22), ('Carlos', 16), ('Paulo', 14),
+    ('Fernando', 12), ('Armando', 10), ('Pedro', 10), ('Alberto', 9), ('Luís', 9), ('Francisco', 8),
+    ('Samuel', 7), ('Jorge', 7), ('Domingos', 6), ('Eduardo', 6), ('Celso', 5), ('Felizardo', 4),
+    ('Hélder', 4), ('Abílio', 3), ('Inácio', 3), ('Zacarias', 2), ('Ernesto', 2), ('Tomás', 2),
+]
+FEMALE_NAMES = [
+    ('Maria', 40), ('Ana', 22), ('Fátima', 14), ('Isabel', 12), ('Graça', 10), ('Joana', 10),
+    ('Luísa', 9), ('Teresa', 8), ('Rosa', 8), ('Celeste', 7), ('Inês', 7), ('Sofia', 6),
+    ('Amélia', 6), ('Helena', 5), ('Marta', 5), ('Carolina', 4), ('Esperança', 4), ('Lurdes', 4),
+    ('Beatriz', 3), ('Felismina', 3), ('Argentina', 2), ('Cacilda', 2), ('Albertina', 2),
+]
+SURNAMES = [
+    ('Silva', 30), ('Santos', 18), ('Machava', 14), ('Cossa', 14), ('Sitoe', 12), ('Langa', 12),
+    ('Tembe', 11), ('Mabunda', 10), ('Nhantumbo', 10), ('Macuácua', 9), ('Muianga', 9), ('Matsinhe', 8),
+    ('Costa', 8), ('Ferreira', 8), ('Pereira', 7), ('Mondlane', 7), ('Chissano', 6), ('Mussa', 6),
+    ('Bila', 6), ('Chambal', 5), ('Cumbe', 5), ('Mahumane', 5), ('Sousa', 5), ('Oliveira', 5),
+    ('Rodrigues', 4), ('Mucavele', 4), ('Guambe', 4), ('Zimba', 3), ('Banze', 3), ('Uamusse', 3),
+    ('Nhaca', 3), ('Manhiça', 3), ('Chilaule', 2), ('Massingue', 2), ('Ali', 2), ('Abdul', 2),
+]
+COMPANIES = [
+    'Banco Comercial de Moçambique, S.A.', 'Electricidade de Moçambique, E.P.', 'Transportes Maputo, Lda.',
+    'Construções Limpopo, Lda.', 'Seguradora Índico, S.A.', 'Águas da Região de Maputo, S.A.',
+    'Comercial Zambeze, Lda.', 'Imobiliária Sol Nascente, Lda.', 'Telecomunicações do Sul, S.A.',
+]
+
+CASE_TYPES = [('civil', 'CV', 45), ('criminal', 'CR', 30), ('family', 'FM', 17), ('probate', 'PR', 8)]
+CIVIL_ACTIONS = [
+    'Ação de Cobrança', 'Ação de Despejo', 'Ação de Indemnização', 'Execução para Pagamento de Quantia Certa',
+    'Ação de Reivindicação de Propriedade', 'Injunção', 'Ação de Anulação de Contrato',
+]
+CRIMES = [
+    'furto qualificado', 'ofensas corporais', 'condução sob influência de álcool', 'burla',
+    'abuso de confiança', 'falsificação de documentos', 'roubo', 'violência doméstica',
+]
+FAMILY_ACTIONS = ['Divórcio', 'Regulação do Poder Paternal', 'Alimentos a Menores', 'Investigação de Paternidade']
+OPEN_STATUSES = [('open', 45), ('pending', 35), ('suspended', 8), ('closed', 12)]
+OLD_STATUSES = [('closed', 85), ('open', 5), ('pending', 5), ('suspended', 5)]
+
+HEARING_TYPES = [('preliminary', 40), ('trial', 40), ('sentencing', 20)]
+PAST_HEARING_STATUSES = [('completed', 80), ('postponed', 12), ('cancelled', 8)]
+HEARING_DURATIONS = [(30, 20), (60, 50), (90, 15), (120, 15)]
+COURTROOMS = [f'Sala {number}' for number in range(1, 41)]
+
+DOCUMENT_TYPES = [('petition', 35), ('motion', 30), ('order', 20), ('judgment', 15)]
+DOCUMENT_TITLES = {
+    'petition': 'Petição Inicial', 'motion': 'Requerimento', 'order': 'Despacho', 'judgment': 'Sentença',
+}
+
+class WeightedChoice:
+    """Escolha ponderada com pesos acumulados calculados uma única vez"""
+
+    def __init__(self, pairs):
+        self.values = [value for value, _ in pairs]
+        self.cum_weights = list(accumulate(weight for _, weight in pairs))
+
+    def __call__(self, rng):
+        return rng.choices(self.values, cum_weights=self.cum_weights)[0]
+
+class NameGenerator:
+    def __init__(self, rng):
+        self.rng = rng
+        self.male = WeightedChoice(MALE_NAMES)
+        self.female = WeightedChoice(FEMALE_NAMES)
+        self.surname = WeightedChoice(SURNAMES)
+
+    def person(self):
+        rng = self.rng
+        first = self.male if rng.random() < 0.5 else self.female
+        names = [first(rng)]
+        if rng.random() < 0.35:
+            second = first(rng)
+            if second != names[0]:
+                names.append(second)
+        names.append(self.surname(rng))
+        if rng.random() < 0.6:
+            surname = self.surname(rng)
+            if surname != names[-1]:
+                names.append(surname)
+        return ' '.join(names)
+
+def _ascii(value):
+    return normalize_text(value).replace(' ', '.')
+
+def _batches(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _bulk_insert(conn, table, rows):
+    """Inserir `rows` em lotes (executemany) numa única transação; devolve o total"""
+    total = 0
+    for batch in _batches(rows):
+        conn.execute(table.insert(), batch)
+        total += len(batch)
+    conn.commit()
+    return total
+
+def _next_id(conn, table):
+    return (conn.execute(db.select(db.func.max(table.c.id))).scalar() or 0) + 1
+
+def _user_rows(rng, names, first_id, count, role, password_hash, created_from, span):
+    for offset in range(count):
+        full_name = names.person()
+        username = f'{_ascii(full_name)}.{first_id + offset}'
+        yield {
+            'id': first_id + offset,
+            'username': username[:80],
+            'email': f'{username[:100]}@exemplo.co.mz',
+            'password_hash': password_hash,
+            'role': role,
+            'created_at': created_from + timedelta(seconds=rng.random() * span),
+            'is_active': rng.random() < 0.97,
+        }
+
+def _case_rows(rng, names, first_id, count, judges, lawyers, start, today, case_judges, case_dates):
+    """Processos por ordem cronológica de entrada, com numeração sequencial por ano e tipo"""
+    case_type = WeightedChoice([((name, code), weight) for name, code, weight in CASE_TYPES])
+    open_status = WeightedChoice(OPEN_STATUSES)
+    old_status = WeightedChoice(OLD_STATUSES)
+    span = (today - start).total_seconds()
+    old_cutoff = today - timedelta(days=3 * 365)
+    sequences = {}
+
+    for offset in range(count):
+        filing_date = start + timedelta(seconds=(offset + rng.random()) * span / count)
+        kind, code = case_type(rng)
+        sequence = sequences.get((filing_date.year, code), 0) + 1
+        sequences[(filing_date.year, code)] = sequence
+
+        if kind == 'civil':
+            plaintiff = rng.choice(COMPANIES) if rng.random() < 0.25 else names.person()
+            defendant = names.person()
+            action = rng.choice(CIVIL_ACTIONS)
+            title = f'{plaintiff.split(",")[0]} vs. {defendant} - {action}'
+            description = f'{action} no valor de {rng.randrange(5, 5000) * 1000:,} MT'.replace(',', '.')
+        elif kind == 'criminal':
+            plaintiff = 'Ministério Público'
+            defendant = names.person()
+            title = f'Ministério Público vs. {defendant}'
+            description = f'Processo crime por {rng.choice(CRIMES)}'
+        elif kind == 'family':
+            plaintiff = names.person()
+            defendant = names.person()
+            action = rng.choice(FAMILY_ACTIONS)
+            title = f'{action} - {plaintiff} e {defendant}'
+            description = f'Processo de {action.lower()}'
+        else:
+            deceased = names.person()
+            plaintiff = f'Herdeiros de {deceased}'
+            defendant = 'N/A'
+            title = f'Sucessão de {deceased}'
+            description = 'Processo de inventário e partilha de bens'
+
+        status = old_status(rng) if filing_date < old_cutoff else open_status(rng)
+        judge_id = rng.choice(judges)
+        case_judges.append(judge_id)
+        case_dates.append(filing_date.timestamp())
+
+        yield {
+            'id': first_id + offset,
+            'case_number': f'{filing_date.year}/{code}/{sequence:06d}',
+            'title': title[:200],
+            'case_type': kind,
+            'status': status,
+            'plaintiff': plaintiff,
+            'defendant': defendant,
+            'judge_id': judge_id,
+            'lawyer_id': rng.choice(lawyers) if lawyers and rng.random() < 0.7 else None,
+            'filing_date': filing_date,
+            'next_hearing': (
+                today + timedelta(days=rng.randrange(1, 180), hours=rng.randrange(8, 16))
+                if status in ('open', 'pending') else None
+            ),
+            'description': description,
+            'is_public': kind != 'family' and rng.random() < 0.9,
+            'title_normalized': normalize_text(title[:200]),
+            'plaintiff_normalized': normalize_text(plaintiff),
+            'defendant_normalized': normalize_text(defendant),
+        }
+
+def _hearing_rows(rng, count, first_case_id, case_judges, case_dates, today):
+    """Audiências entre a entrada do processo e seis meses após a data de referência"""
+    hearing_type = WeightedChoice(HEARING_TYPES)
+    past_status = WeightedChoice(PAST_HEARING_STATUSES)
+    duration = WeightedChoice(HEARING_DURATIONS)
+    horizon = (today + timedelta(days=180)).timestamp()
+    cases = len(case_judges)
+
+    for _ in range(count):
+        index = rng.randrange(cases)
+        filed = case_dates[index]
+        # Dias úteis e horas certas ou meias horas, entre as 8h e as 16h
+        day = datetime.fromtimestamp(min(filed + rng.uniform(14, 720) * 86400, horizon)).date()
+        day -= timedelta(days=max(day.weekday() - 4, 0))
+        hearing_date = datetime(day.year, day.month, day.day, rng.randrange(8, 16), rng.choice((0, 30)))
+        kind = hearing_type(rng)
+
+        yield {
+            'case_id': first_case_id + index,
+            'hearing_date': hearing_date,
+            'hearing_type': kind,
+            'courtroom': rng.choice(COURTROOMS),
+            'judge_id': case_judges[index],
+            'status': past_status(rng) if hearing_date < today else 'scheduled',
+            'notes': None,
+            'duration_minutes': duration(rng),
+            'updated_at': min(hearing_date, today),
+        }
+
+def _document_rows(rng, first_id, count, first_case_id, case_judges, case_dates, lawyers, today):
+    document_type = WeightedChoice(DOCUMENT_TYPES)
+    cases = len(case_judges)
+
+    for offset in range(count):
+        index = rng.randrange(cases)
+        kind = document_type(rng)
+        upload_date = min(
+            datetime.fromtimestamp(case_dates[index] + rng.uniform(0, 720) * 86400), today
+        )
+        document_id = first_id + offset
+        yield {
+            'id': document_id,
+            'case_id': first_case_id + index,
+            'title': f'{DOCUMENT_TITLES[kind]} n.º {document_id}',
+            'document_type': kind,
+            'file_path': None,
+            'uploaded_by': case_judges[index] if kind in ('order', 'judgment') or not lawyers else rng.choice(lawyers),
+            'upload_date': upload_date,
+            'is_public': rng.random() < 0.6,
+            'sha256': f'{rng.getrandbits(256):064x}',
+            'size': rng.randrange(20_000, 5_000_000),
+            'content_type': 'application/pdf',
+            'filename': f'{kind}_{document_id}.pdf',
+        }
+
+def _drop_indexes(conn, tables):
+    for table in tables:
+        for index in table.indexes:
+            index.drop(conn, checkfirst=True)
+
+def generate_synthetic_data(cases, hearings=None, documents=None, users=None, seed=42, today=None):
+    """Gerar processos, audiências, documentos e utilizadores sintéticos.
+
+    Por omissão: 10 audiências e 2 documentos por processo e um utilizador por
+    cada 10 processos (0,5% juízes, 5% advogados, os restantes cidadãos).
+    """
+    hearings = cases * 10 if hearings is None else hearings
+    documents = cases * 2 if documents is None else documents
+    users = max(cases // 10, 10) if users is None else users
+    today = today or datetime.combine(datetime.now().date(), datetime.min.time())
+    start = datetime(today.year - 25, 1, 1)
+
+    rng = random.Random(seed)
+    names = NameGenerator(rng)
+    password_hash = generate_password_hash(SYNTHETIC_PASSWORD)
+    tables = [User.__table__, Case.__table__, Hearing.__table__, Document.__table__, DocumentIndexJob.__table__]
+
+    judge_count = max(users // 200, 1)
+    lawyer_count = max(users // 20, 1)
+    citizen_count = max(users - judge_count - lawyer_count, 0)
+    case_judges = array('I')
+    case_dates = array('d')
+    timings = []
+
+    with db.engine.connect() as conn:
+        # Carga sem fsync a cada página; a base de dados só é usada no fim
+        conn.exec_driver_sql('PRAGMA synchronous = OFF')
+        conn.exec_driver_sql('PRAGMA cache_size = -262144')
+        drop_case_search_triggers(conn)
+        _drop_indexes(conn, tables)
+        conn.commit()
+
+        def load(label, table, rows):
+            started = time.perf_counter()
+            total = _bulk_insert(conn, table, rows)
+            timings.append((label, total, time.perf_counter() - started))
+
+        user_table = User.__table__
+        first_user = _next_id(conn, user_table)
+        judges = list(range(first_user, first_user + judge_count))
+        lawyers = list(range(first_user + judge_count, first_user + judge_count + lawyer_count))
+        span = (today - start).total_seconds()
+        load('utilizadores', user_table, (
+            row
+            for role, first_id, count in (
+                ('judge', judges[0], judge_count),
+                ('lawyer', lawyers[0], lawyer_count),
+                ('citizen', first_user + judge_count + lawyer_count, citizen_count),
+            )
+            for row in _user_rows(rng, names, first_id, count, role, password_hash, start, span)
+        ))
+
+        first_case = _next_id(conn, Case.__table__)
+        load('processos', Case.__table__, _case_rows(
+            rng, names, first_case, cases, judges, lawyers, start, today, case_judges, case_dates
+        ))
+        if cases:
+            load('audiências', Hearing.__table__, _hearing_rows(
+                rng, hearings, first_case, case_judges, case_dates, today
+            ))
+
+            first_document = _next_id(conn, Document.__table__)
+            load('documentos', Document.__table__, _document_rows(
+                rng, first_document, documents, first_case, case_judges, case_dates, lawyers, today
+            ))
+            # Documentos sem ficheiro: nada a indexar pelos workers de texto
+            load('trabalhos de indexação', DocumentIndexJob.__table__, (
+                {
+                    'document_id': document_id,
+                    'status': 'skipped',
+                    'attempts': 0,
+                    'run_after': today,
+                    'last_error': 'Documento sintético sem ficheiro',
+                    'updated_at': today,
+                }
+                for document_id in range(first_document, first_document + documents)
+            ))
+
+        conn.exec_driver_sql('PRAGMA synchronous = FULL')
+        conn.commit()
+
+    started = time.perf_counter()
+    create_missing_indexes()
+    timings.append(('índices', None, time.perf_counter() - started))
+
+    started = time.perf_counter()
+    rebuild_case_search()
+    timings.append(('índice FTS5', None, time.perf_counter() - started))
+
+    bump_versions('user', 'case', 'hearing', 'document')
+    return timings
+
+def reset_database(app):
+    """Recriar as tabelas e os índices de texto (que não fazem parte dos modelos)"""
+    db.drop_all()
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql(f'DROP TABLE IF EXISTS {DOCUMENT_FTS_TABLE}')
+    db.create_all()
+    rebuild_case_search()
+    init_document_search(app)
+
 if __name__ == '__main__':
     from src.main import app
     
+    parser = argparse.ArgumentParser(description='Criar dados de exemplo e, opcionalmente, dados sintéticos em volume')
+    parser.add_argument('--cases', type=int, default=0, help='Processos sintéticos (ex.: 1000000)')
+    parser.add_argument('--hearings', type=int, help='Audiências sintéticas (por omissão 10 por processo)')
+    parser.add_argument('--documents', type=int, help='Documentos sintéticos (por omissão 2 por processo)')
+    parser.add_argument('--users', type=int, help='Utilizadores sintéticos (por omissão 1 por cada 10 processos)')
+    parser.add_argument('--seed', type=int, default=42, help='Semente do gerador')
+    parser.add_argument('--today', type=datetime.fromisoformat, help='Data de referência (AAAA-MM-DD, por omissão hoje)')
+    args = parser.parse_args()
+    
     with app.app_context():
-        # Limpar dados existentes (opcional)
-        db.drop_all()
-        db.create_all()
+        # Limpar dados existentes
+        reset_database(app)
         
         # Criar dados de exemplo
         create_sample_data()
-
+        
+        if args.cases:
+            started = time.perf_counter()
+            timings = generate_synthetic_data(
+                args.cases, args.hearings, args.documents, args.users, args.seed, args.today
+            )
+            print(f"\nDados sintéticos (semente {args.seed}, password '{SYNTHETIC_PASSWORD}'):")
+            for label, total, seconds in timings:
+                count = f'{total:>12,}'.replace(',', ' ') if total is not None else ' ' * 12
+                print(f'- {label:24} {count}  {seconds:8.1f}s')
+            print(f'Total: {time.perf_counter() - started:.1f}s')
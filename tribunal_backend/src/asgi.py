@@ -0,0 +1,15 @@
+import os
+import sys
+# DON'T CHANGE THIS !!!
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+# Ponto de entrada ASGI: uvicorn src.asgi:app (a partir de tribunal_backend/)
+from src.main import app as flask_app
+from src.models.database import init_async_database
+from src.models.asgi import ASGIApp
+
+app = ASGIApp(
+    flask_app,
+    engine=init_async_database(flask_app),
+    threads=flask_app.config['ASGI_THREADS'],
+)
@@ -3,13 +3,29 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+import click
+from flask import Flask
 from flask_cors import CORS
-from src.models.user import db
+from src.models.user import db, add_missing_columns, create_missing_indexes, backfill_normalized_names
+from src.models.database import configure_database, init_database
+from src.models.search import init_case_search, rebuild_case_search
+from src.models.cache import init_response_cache
+from src.models.passwords import init_password_hasher
+from src.models.documents import init_document_store, get_document_store
+from src.models.metrics import init_metrics
+from src.models.serialization import init_json_provider
+from src.models.assets import init_asset_manifest, get_asset_manifest, asset_response
+from src.models.indexing import init_document_search, enqueue_missing_documents, requeue_documents, run_worker_pool
+from src.models.provisioning import parse_users, bulk_register, summarize_results
 from src.routes.user import user_bp
 from src.routes.case import case_bp
 from src.routes.form import form_bp
 from src.routes.auth import auth_bp
+from src.routes.calendar import calendar_bp
+from src.routes.scheduling import scheduling_bp
+from src.routes.autocomplete import autocomplete_bp
+from src.routes.document import document_bp
+from src.routes.metrics import metrics_bp
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
@@ -22,30 +38,143 @@ app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(case_bp, url_prefix='/api')
 app.register_blueprint(form_bp, url_prefix='/api')
 app.register_blueprint(auth_bp, url_prefix='/api')
+app.register_blueprint(calendar_bp, url_prefix='/api')
+app.register_blueprint(scheduling_bp, url_prefix='/api')
+app.register_blueprint(autocomplete_bp, url_prefix='/api')
+app.register_blueprint(document_bp, url_prefix='/api')
+app.register_blueprint(metrics_bp, url_prefix='/api')
 
 # Configurar base de dados
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+    'DATABASE_URL', f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+# 'production': WAL, pool de leitura e escritor único (vários workers do gunicorn)
+app.config['DATABASE_MODE'] = os.environ.get('DATABASE_MODE', 'default')
+app.config['SQLITE_READ_POOL_SIZE'] = int(os.environ.get('SQLITE_READ_POOL_SIZE', 8))
+app.config['SQLITE_BUSY_TIMEOUT'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))
+configure_database(app)
 db.init_app(app)
+init_database(app)
+
+# Cache de respostas públicas: 'memory' (um worker) ou 'sqlite' (partilhada entre workers)
+app.config['RESPONSE_CACHE_BACKEND'] = os.environ.get('RESPONSE_CACHE_BACKEND', 'memory')
+app.config['RESPONSE_CACHE_PATH'] = os.environ.get('RESPONSE_CACHE_PATH')
+init_response_cache(app)
+
+# Cache de autenticação: com a cache de respostas 'sqlite' as alterações a
+# utilizadores chegam a todos os workers (versão da tabela) e o TTL pode ser
+# longo; caso contrário a invalidação é local e o TTL é curto (um só processo
+# pode usar AUTH_CACHE_TTL=60)
+app.config['AUTH_CACHE_TTL'] = float(os.environ.get(
+    'AUTH_CACHE_TTL', 60 if app.config['RESPONSE_CACHE_BACKEND'] == 'sqlite' else 5
+))
+
+# Hashing de passwords em processos dedicados (0 = na thread do pedido), criados
+# no primeiro hash ou no arranque do servidor ASGI, nunca ao importar a aplicação
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1)))
+init_password_hasher(app)
+
+# Downloads servidos pelo proxy: 'x-accel' (nginx) ou 'x-sendfile'; vazio = pelo Python
+app.config['FILE_OFFLOAD'] = os.environ.get('FILE_OFFLOAD')
+app.config['FILE_OFFLOAD_ROOT'] = os.environ.get('FILE_OFFLOAD_ROOT')
+app.config['FILE_OFFLOAD_PREFIX'] = os.environ.get('FILE_OFFLOAD_PREFIX', '/protected-files/')
+
+# Tamanho máximo do corpo dos pedidos (bytes); sem valor, sem limite além de DOCUMENT_MAX_SIZE
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ['MAX_CONTENT_LENGTH']) if os.environ.get('MAX_CONTENT_LENGTH') else None
+
+# Documentos submetidos, guardados por hash SHA-256
+app.config['DOCUMENT_STORAGE_PATH'] = os.environ.get(
+    'DOCUMENT_STORAGE_PATH', os.path.join(os.path.dirname(__file__), 'database', 'documents')
+)
+init_document_store(app)
+
+# Codificação JSON: 'auto' (orjson se instalado), 'orjson' ou 'stdlib'
+app.config['JSON_ENCODER'] = os.environ.get('JSON_ENCODER', 'auto')
+app.config['JSON_STREAM_MIN_ROWS'] = int(os.environ.get('JSON_STREAM_MIN_ROWS', 100))
+init_json_provider(app)
+
+# Métricas por pedido: Server-Timing, log de consultas lentas e /api/metrics
+app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '1') != '0'
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 200))
+init_metrics(app)
+
+# Modo ASGI (src/asgi.py): threads para os pedidos síncronos e ligações aiosqlite
+app.config['ASGI_THREADS'] = int(os.environ.get('ASGI_THREADS', 8))
+app.config['ASGI_ASYNC_REQUESTS'] = int(os.environ.get('ASGI_ASYNC_REQUESTS', 32))
+app.config['ASYNC_DATABASE_POOL_SIZE'] = int(os.environ.get('ASYNC_DATABASE_POOL_SIZE', 8))
+
+# Manifesto dos ficheiros estáticos (frontend), construído uma vez no arranque
+app.config['STATIC_MEMORY_LIMIT'] = int(os.environ.get('STATIC_MEMORY_LIMIT', 256 * 1024))
+init_asset_manifest(app)
 
 with app.app_context():
     db.create_all()
+    add_missing_columns()
+    backfill_normalized_names()
+    create_missing_indexes()
+    init_case_search(app)
+    init_document_search(app)
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index():
+    """Reconstruir o índice de pesquisa de processos"""
+    total = rebuild_case_search()
+    print(f"Índice de pesquisa reconstruído: {total} processos indexados")
+
+@app.cli.command('index-documents')
+@click.option('--workers', default=1, show_default=True, help='Processos de indexação')
+@click.option('--once', is_flag=True, help='Terminar quando a fila estiver vazia')
+@click.option('--retry-failed', is_flag=True, help='Voltar a agendar os trabalhos falhados')
+def index_documents(workers, once, retry_failed):
+    """Indexar o texto dos documentos submetidos (fila persistente)"""
+    if not app.config.get('DOCUMENT_FTS_ENABLED'):
+        raise click.ClickException('Índice FTS5 de documentos indisponível')
+
+    if retry_failed:
+        print(f"{requeue_documents('failed')} trabalhos falhados agendados de novo")
+    print(f"{enqueue_missing_documents()} documentos sem trabalho agendados")
+    processed = run_worker_pool(app, workers=workers, once=once)
+    if processed is not None:
+        print(f"{processed} documentos processados")
+
+@app.cli.command('sweep-uploads')
+def sweep_uploads():
+    """Apagar uploads retomáveis expirados e ficheiros temporários abandonados"""
+    print(f"{get_document_store().sweep_uploads()} ficheiros de upload apagados")
+
+@app.cli.command('import-users')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'import_format', type=click.Choice(['csv', 'json']), help='Por omissão, a extensão do ficheiro')
+@click.option('--dry-run', is_flag=True, help='Apenas validar, sem registar')
+def import_users(path, import_format, dry_run):
+    """Registar utilizadores em massa a partir de um ficheiro CSV ou JSON"""
+    import_format = import_format or os.path.splitext(path)[1].lstrip('.').lower()
+    with open(path, 'rb') as f:
+        rows = parse_users(f.read(), import_format)
+
+    results = bulk_register(rows, dry_run=dry_run)
+    for result in results:
+        if result['status'] == 'error':
+            print(f"Linha {result['row']} ({result['username']}): {result['error']}")
+
+    summary = summarize_results(results)
+    print(f"{summary['total']} linhas: {summary['created']} registadas, {summary['valid']} válidas, {summary['failed']} com erros")
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
+    manifest = get_asset_manifest()
+    if manifest is None:
             return "Static folder not configured", 404
 
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
-            return "index.html not found", 404
+    asset = manifest.resolve(path)
+    if asset is None:
+        return "index.html not found", 404
+    return asset_response(asset)
 
 
 if __name__ == '__main__':
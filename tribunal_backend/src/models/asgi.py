@@ -0,0 +1,303 @@
+import asyncio
+import io
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.util import await_only, greenlet_spawn
+from werkzeug.exceptions import ClientDisconnected, HTTPException, RequestEntityTooLarge
+from werkzeug.routing import RequestRedirect
+from werkzeug.wsgi import get_content_length
+from src.models.database import async_reads
+
+# Servidor ASGI (uvicorn) à frente da aplicação Flask.
+#
+# O event loop trata das ligações: um cliente lento a enviar o pedido ou a
+# receber a resposta, ou parado entre pedidos (keep-alive), não ocupa nenhuma
+# thread. O corpo do pedido nunca passa de MAX_CONTENT_LENGTH (413):
+#
+# - endpoints de leitura em ASYNC_ENDPOINTS (processos, audiências, lista
+#   de formulários): o corpo (raro em GET) é lido de forma assíncrona para um
+#   ficheiro temporário (em memória até ASGI_SPOOL_SIZE) e a própria view
+#   Flask corre depois no event loop, dentro de
+#   greenlet_spawn() do SQLAlchemy, com as leituras da sessão no engine
+#   aiosqlite; cada consulta cede o loop enquanto espera pela base de dados.
+#   No máximo ASGI_ASYNC_REQUESTS correm ao mesmo tempo: com mais, sob carga,
+#   todos progrediriam devagar e nenhum terminaria a tempo;
+# - restantes pedidos (escritas, autenticação, ficheiros, detalhes de
+#   formulário com o hash do ficheiro, estáticos do manifesto): num pool de
+#   ASGI_THREADS threads, como num worker WSGI. O corpo chega à view em
+#   streaming: uma tarefa no event loop passa as mensagens do receive() por
+#   uma fila limitada (ASGI_BODY_QUEUE) a um leitor bloqueante na thread, pelo
+#   que um upload grande é escrito em disco uma única vez, pela própria view.
+#
+# No event loop só pode haver I/O que cede o loop: qualquer leitura síncrona
+# bloqueia todas as ligações. Por isso, com RESPONSE_CACHE_BACKEND=sqlite
+# (cache de respostas em ficheiro, usada por quase todos estes endpoints)
+# todos os pedidos seguem pelo pool de threads.
+#
+# Em ambos os casos é a mesma aplicação WSGI que responde (mesmos
+# before/after_request, cache de respostas, métricas e formato das
+# respostas). Sem aiosqlite todos os pedidos seguem pelo pool de threads.
+
+ASYNC_ENDPOINTS = frozenset({
+    'case.search_cases',
+    'case.get_case_details',
+    'case.get_case_types',
+    'case.get_case_statuses',
+    'case.get_hearings',
+    'calendar.courtroom_calendar',
+    'calendar.judge_calendar',
+    'form.get_forms',
+    'form.get_form_categories',
+})
+
+ASGI_THREADS = 8
+
+# Views assíncronas em curso ao mesmo tempo (as restantes esperam pela vez)
+ASGI_ASYNC_REQUESTS = 32
+
+# Corpo do pedido em memória até este tamanho (bytes); acima, em disco
+ASGI_SPOOL_SIZE = 1024 * 1024
+
+# Mensagens do corpo à espera de serem lidas pela thread da aplicação
+ASGI_BODY_QUEUE = 8
+
+_TOO_LARGE_BODY = b'{"success": false, "error": "Pedido demasiado grande"}'
+
+class BodyReader(io.RawIOBase):
+    """Corpo do pedido para a thread da aplicação, lido da fila à medida que chega"""
+
+    def __init__(self, queue, loop):
+        self._queue = queue
+        self._loop = loop
+        self._buffer = b''
+        self._done = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        while not self._buffer and not self._done:
+            chunk = asyncio.run_coroutine_threadsafe(self._queue.get(), self._loop).result()
+            if chunk is None or isinstance(chunk, Exception):
+                self._done = True
+                if chunk is not None:
+                    raise chunk
+            else:
+                self._buffer = chunk
+
+        size = min(len(target), len(self._buffer))
+        target[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+class ASGIApp:
+    """Aplicação ASGI 3 que serve uma aplicação Flask (ver comentário acima)"""
+
+    def __init__(self, app, engine=None, threads=ASGI_THREADS, async_endpoints=ASYNC_ENDPOINTS):
+        self.app = app
+        self.engine = engine
+        if app.config.get('RESPONSE_CACHE_BACKEND') == 'sqlite':
+            # Cache de respostas síncrona em SQLite: bloquearia o event loop
+            async_endpoints = frozenset()
+        self.async_endpoints = async_endpoints
+        self.spool_size = app.config.get('ASGI_SPOOL_SIZE', ASGI_SPOOL_SIZE)
+        self.async_slots = asyncio.Semaphore(app.config.get('ASGI_ASYNC_REQUESTS', ASGI_ASYNC_REQUESTS))
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(f"Tipo de ligação ASGI não suportado: {scope['type']}")
+
+        environ = self._environ(scope)
+        limit = self.app.config.get('MAX_CONTENT_LENGTH')
+        if limit is not None and (get_content_length(environ) or 0) > limit:
+            await self._too_large(send)
+            return
+
+        if self.engine is not None and self._is_async(environ):
+            body = await self._read_body(receive, limit)
+            if body is None:
+                await self._too_large(send)
+                return
+            try:
+                environ['wsgi.input'] = body
+                # Pedidos sem Content-Length (chunked): o tamanho do que foi lido
+                if 'CONTENT_LENGTH' not in environ:
+                    body.seek(0, 2)
+                    environ['CONTENT_LENGTH'] = str(body.tell())
+                    body.seek(0)
+                async with self.async_slots:
+                    await greenlet_spawn(self._call_async, environ, send)
+            finally:
+                body.close()
+            return
+
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=ASGI_BODY_QUEUE)
+        feeder = asyncio.ensure_future(self._feed_body(receive, queue, limit))
+        environ['wsgi.input'] = BodyReader(queue, loop)
+        if 'CONTENT_LENGTH' not in environ:
+            # Sem Content-Length (chunked): o fim do corpo é dado pelo leitor
+            # e o Werkzeug aplica MAX_CONTENT_LENGTH à leitura
+            environ['wsgi.input_terminated'] = True
+        try:
+            await loop.run_in_executor(self.executor, self._call_threaded, environ, send, loop)
+        finally:
+            # Corpo não lido (ou não lido até ao fim) pela view
+            feeder.cancel()
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # Processos de hashing arrancados já, e não no primeiro login
+                hasher = self.app.extensions.get('password_hasher')
+                if hasher is not None:
+                    await asyncio.get_running_loop().run_in_executor(self.executor, hasher.start)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                if self.engine is not None:
+                    await self.engine.dispose()
+                hasher = self.app.extensions.get('password_hasher')
+                if hasher is not None:
+                    hasher.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _too_large(self, send):
+        await send({'type': 'http.response.start', 'status': 413, 'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(_TOO_LARGE_BODY)).encode('latin-1')),
+            (b'connection', b'close'),
+        ]})
+        await send({'type': 'http.response.body', 'body': _TOO_LARGE_BODY, 'more_body': False})
+
+    async def _read_body(self, receive, limit):
+        """Corpo completo num ficheiro temporário; None acima de `limit` bytes"""
+        body = tempfile.SpooledTemporaryFile(max_size=self.spool_size)
+        size = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if limit is not None and size > limit:
+                body.close()
+                return None
+            body.write(chunk)
+            if not message.get('more_body', False):
+                break
+        body.seek(0)
+        return body
+
+    async def _feed_body(self, receive, queue, limit):
+        """Passar o corpo do pedido à fila lida por BodyReader (None no fim)"""
+        size = 0
+        while True:
+            try:
+                message = await receive()
+            except Exception:
+                message = {'type': 'http.disconnect'}
+            if message['type'] == 'http.disconnect':
+                await queue.put(ClientDisconnected())
+                return
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if limit is not None and size > limit:
+                await queue.put(RequestEntityTooLarge())
+                return
+            if chunk:
+                await queue.put(chunk)
+            if not message.get('more_body', False):
+                await queue.put(None)
+                return
+
+    def _environ(self, scope):
+        """Ambiente WSGI (PEP 3333) a partir do scope ASGI"""
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client')
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope['query_string'].decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]) if server[1] is not None else '80',
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        if client:
+            environ['REMOTE_ADDR'] = client[0]
+            environ['REMOTE_PORT'] = str(client[1])
+
+        for name, value in scope['headers']:
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                key = name
+            else:
+                key = f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+        return environ
+
+    def _is_async(self, environ):
+        if environ['REQUEST_METHOD'] not in ('GET', 'HEAD'):
+            return False
+        try:
+            endpoint, _ = self.app.url_map.bind_to_environ(environ).match()
+        except (HTTPException, RequestRedirect):
+            return False
+        return endpoint in self.async_endpoints
+
+    def _call_async(self, environ, send):
+        # No greenlet do SQLAlchemy, no event loop: await_only() cede o loop
+        with async_reads(self.engine):
+            self._respond(environ, lambda message: await_only(send(message)))
+
+    def _call_threaded(self, environ, send, loop):
+        def send_sync(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        self._respond(environ, send_sync)
+
+    def _respond(self, environ, send_sync):
+        """Chamar a aplicação WSGI e enviar a resposta com `send_sync`"""
+        response = []
+
+        def start_response(status, headers, exc_info=None):
+            response[:] = [int(status.split(' ', 1)[0]), [
+                (name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers
+            ]]
+
+        def start():
+            send_sync({'type': 'http.response.start', 'status': response[0], 'headers': response[1]})
+
+        result = self.app(environ, start_response)
+        try:
+            started = False
+            for chunk in result:
+                if not chunk:
+                    continue
+                if not started:
+                    start()
+                    started = True
+                send_sync({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+
+            if not started:
+                start()
+            send_sync({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        finally:
+            # Termina o contexto do pedido (sessão e ligação devolvidas ao pool)
+            if hasattr(result, 'close'):
+                result.close()
@@ -0,0 +1,202 @@
+import base64
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from datetime import datetime, timezone
+from flask import current_app, request
+from werkzeug.utils import send_file
+
+# Ficheiros estáticos do frontend servidos a partir de um manifesto.
+#
+# O manifesto é construído no arranque a partir de app.static_folder: cada
+# caminho público corresponde a um StaticAsset com as suas variantes (o
+# próprio ficheiro e os .gz/.br gerados no build). Servir um pedido é uma
+# consulta a um dicionário, sem stat() nem leitura do disco para os ficheiros
+# pequenos, que ficam em memória. Caminhos desconhecidos recebem o index.html
+# (rotas do SPA).
+#
+# Um ficheiro é servido como immutable apenas se o nome contiver o início do
+# SHA-256 do próprio conteúdo, calculado aqui (em hexadecimal ou base64url, ex.:
+# assets/logo-Er-DMMvM.svg): com outro conteúdo teria outro nome. Nomes que só
+# parecem ter um hash (app-settings.js, jquery.validate.js) e os restantes
+# ficheiros (index.html, favicon.ico) são revalidados com ETag em cada navegação.
+
+INDEX_FILE = 'index.html'
+
+# Extensões das variantes pré-comprimidas, por ordem de preferência
+PRECOMPRESSED = {'br': '.br', 'gzip': '.gz'}
+
+# Ficheiros até este tamanho (bytes) ficam em memória
+MEMORY_LIMIT = 256 * 1024
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Caracteres mínimos do hash no nome
+MIN_NAME_HASH = 8
+
+# Início de uma parte do nome onde pode estar o hash
+_NAME_SEPARATOR_RE = re.compile(r'[-.]')
+
+# Tipos comprimidos com gzip no arranque quando o build não gerou o .gz
+_COMPRESSIBLE_RE = re.compile(r'^(text/|application/(javascript|json|xml|manifest\+json)|image/svg\+xml)')
+
+class AssetVariant:
+    """Uma codificação de um ficheiro estático (em memória ou no disco)"""
+
+    def __init__(self, path, etag, mtime, size, body=None, digest=None):
+        self.path = path
+        self.etag = etag
+        self.mtime = mtime
+        self.size = size
+        self.body = body
+        self.digest = digest
+
+class StaticAsset:
+    """Caminho público com as variantes por Content-Encoding"""
+
+    def __init__(self, name, mimetype, immutable):
+        self.name = name
+        self.mimetype = mimetype
+        self.immutable = immutable
+        self.variants = {}
+
+    @property
+    def encodings(self):
+        return [encoding for encoding in PRECOMPRESSED if encoding in self.variants]
+
+def _read_variant(path, encoding, memory_limit):
+    result = os.stat(path)
+    mtime = datetime.fromtimestamp(result.st_mtime, timezone.utc)
+
+    digest = hashlib.sha256()
+    body = None
+    with open(path, 'rb') as f:
+        if result.st_size <= memory_limit:
+            body = f.read()
+            digest.update(body)
+        else:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+
+    etag = digest.hexdigest()[:32]
+    if encoding != 'identity':
+        etag = f'{etag}-{encoding}'
+    return AssetVariant(path, etag, mtime, result.st_size, body, digest.digest())
+
+def is_hashed_name(name, digest):
+    """Nome com o início de `digest` (SHA-256 do conteúdo), seguro para cache imutável"""
+    encoded = (digest.hex(), base64.urlsafe_b64encode(digest).decode('ascii'))
+    stem = os.path.splitext(os.path.basename(name))[0]
+    for separator in _NAME_SEPARATOR_RE.finditer(stem):
+        tail = stem[separator.end():]
+        for value in encoded:
+            # O base64url também usa '-': o hash pode conter separadores
+            length = len(os.path.commonprefix((tail, value)))
+            if length >= MIN_NAME_HASH and (length == len(tail) or tail[length] in '-.'):
+                return True
+    return False
+
+class AssetManifest:
+    """Todos os ficheiros de `root`, indexados pelo caminho público"""
+
+    def __init__(self, root, memory_limit=MEMORY_LIMIT):
+        self.root = root
+        self.assets = {}
+
+        files = set()
+        for directory, _, names in os.walk(root):
+            for filename in names:
+                files.add(os.path.relpath(os.path.join(directory, filename), root).replace(os.sep, '/'))
+
+        for name in sorted(files):
+            # Variante de outro ficheiro (app.js.gz de app.js): tratada com ele
+            base, extension = os.path.splitext(name)
+            if extension in PRECOMPRESSED.values() and base in files:
+                continue
+
+            mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+            identity = _read_variant(os.path.join(root, name), 'identity', memory_limit)
+            asset = StaticAsset(name, mimetype, is_hashed_name(name, identity.digest))
+            asset.variants['identity'] = identity
+
+            for encoding, suffix in PRECOMPRESSED.items():
+                if name + suffix in files:
+                    asset.variants[encoding] = _read_variant(os.path.join(root, name + suffix), encoding, memory_limit)
+
+            # Ficheiros de texto pequenos sem .gz: comprimidos uma vez aqui
+            if 'gzip' not in asset.variants and identity.body is not None and _COMPRESSIBLE_RE.match(mimetype):
+                body = gzip.compress(identity.body, compresslevel=9, mtime=0)
+                if len(body) < identity.size:
+                    asset.variants['gzip'] = AssetVariant(
+                        None, f'{identity.etag[:32]}-gzip', identity.mtime, len(body), body
+                    )
+
+            self.assets[name] = asset
+
+    def __len__(self):
+        return len(self.assets)
+
+    def resolve(self, path):
+        """Ficheiro para `path`, ou o index.html (rotas do SPA); None sem index.html"""
+        asset = self.assets.get(path)
+        if asset is None:
+            asset = self.assets.get(INDEX_FILE)
+        return asset
+
+def asset_response(asset):
+    """Resposta para `asset` com a melhor codificação aceite, ETag, 304 e Range"""
+    encoding = request.accept_encodings.best_match(asset.encodings) or 'identity'
+    variant = asset.variants[encoding]
+
+    if variant.body is not None:
+        response = current_app.response_class(variant.body, mimetype=asset.mimetype)
+        response.set_etag(variant.etag)
+        response.last_modified = variant.mtime
+        response = response.make_conditional(request, accept_ranges=True, complete_length=variant.size)
+    else:
+        response = send_file(
+            variant.path,
+            request.environ,
+            mimetype=asset.mimetype,
+            download_name=os.path.basename(asset.name),
+            etag=variant.etag,
+            last_modified=variant.mtime,
+            response_class=current_app.response_class
+        )
+        response.accept_ranges = 'bytes'
+
+    if encoding != 'identity':
+        response.content_encoding = encoding
+    if asset.encodings:
+        response.vary.add('Accept-Encoding')
+
+    if asset.immutable:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+def create_asset_manifest(app):
+    if app.static_folder is None or not os.path.isdir(app.static_folder):
+        return None
+    return AssetManifest(app.static_folder, app.config.get('STATIC_MEMORY_LIMIT', MEMORY_LIMIT))
+
+def init_asset_manifest(app):
+    app.extensions['asset_manifest'] = create_asset_manifest(app)
+
+_manifest_lock = threading.Lock()
+
+def get_asset_manifest():
+    """Manifesto da aplicação; em modo debug é reconstruído a cada pedido (build em curso)"""
+    if not current_app.debug and 'asset_manifest' in current_app.extensions:
+        return current_app.extensions['asset_manifest']
+
+    with _manifest_lock:
+        init_asset_manifest(current_app)
+        return current_app.extensions['asset_manifest']
@@ -0,0 +1,302 @@
+import logging
+import re
+import threading
+from bisect import bisect_left, bisect_right
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from src.models.user import db, Case, Form, normalize_text
+from src.models.cache import get_cache_backend
+
+# Autocompletar por prefixo (número do processo, nome das partes, título dos
+# formulários) a partir de índices em memória.
+#
+# Cada índice é uma lista ordenada de chaves normalizadas (sem acentos nem
+# maiúsculas), uma por início de palavra, pesquisada com bisect. As escritas
+# feitas pelo ORM neste processo são aplicadas de forma incremental após o
+# commit; alterações vindas de outro processo (ou de inserções com Core) são
+# detetadas pela versão da tabela na cache de respostas e levam à reconstrução
+# numa thread em segundo plano. Enquanto decorre, os pedidos continuam a usar o
+# índice anterior; só a primeira construção é feita no próprio pedido.
+
+logger = logging.getLogger(__name__)
+
+MAX_SUGGESTIONS = 50
+
+_WORD_START_RE = re.compile(r'(?:^|(?<=[\s/\-.]))\w', re.UNICODE)
+
+def index_keys(text):
+    """Chaves de um texto: o texto normalizado a partir de cada início de palavra"""
+    normalized = normalize_text(text)
+    if not normalized:
+        return set()
+    return {normalized[match.start():] for match in _WORD_START_RE.finditer(normalized)}
+
+class PrefixIndex:
+    """Chaves ordenadas (listas paralelas chave/valor) com pesquisa por prefixo.
+
+    As listas nunca são alteradas no lugar: add() e remove() constroem cópias e
+    substituem o par (chaves, valores) de uma só vez, pelo que search() pode
+    correr sem lock ao mesmo tempo que uma alteração noutra thread.
+    """
+
+    def __init__(self, entries=()):
+        pairs = sorted(entries)
+        self._entries = ([key for key, _ in pairs], [value for _, value in pairs])
+
+    def __len__(self):
+        return len(self._entries[0])
+
+    def add(self, text, value):
+        keys, values = list(self._entries[0]), list(self._entries[1])
+        for key in index_keys(text):
+            position = bisect_right(keys, key)
+            keys.insert(position, key)
+            values.insert(position, value)
+        self._entries = (keys, values)
+
+    def remove(self, text, value):
+        keys, values = list(self._entries[0]), list(self._entries[1])
+        for key in index_keys(text):
+            position = bisect_left(keys, key)
+            while position < len(keys) and keys[position] == key:
+                if values[position] == value:
+                    del keys[position]
+                    del values[position]
+                    break
+                position += 1
+        self._entries = (keys, values)
+
+    def search(self, prefix, limit):
+        """Até `limit` valores distintos cujas chaves começam por `prefix`"""
+        prefix = normalize_text(prefix)
+        if not prefix:
+            return []
+
+        keys, values = self._entries
+        results = []
+        seen = set()
+        position = bisect_left(keys, prefix)
+        while position < len(keys) and len(results) < limit:
+            if not keys[position].startswith(prefix):
+                break
+            value = values[position]
+            if value not in seen:
+                seen.add(value)
+                results.append(value)
+            position += 1
+        return results
+
+def _party_names(plaintiff, defendant):
+    """Partes distintas de um processo (o mesmo nome como autor e réu conta uma vez)"""
+    names = {}
+    for name in (plaintiff, defendant):
+        names.setdefault(normalize_text(name), name)
+    return names.values()
+
+def _entries(rows, text, value):
+    for row in rows:
+        for key in index_keys(text(row)):
+            yield key, value(row)
+
+class CaseIndexes:
+    """Números de processo e nomes das partes dos processos públicos"""
+
+    table = 'case'
+
+    def __init__(self):
+        rows = db.session.execute(
+            db.select(Case.id, Case.case_number, Case.plaintiff, Case.defendant)
+            .where(Case.is_public == True)
+        ).all()
+
+        # Processo -> (número, autor, réu), para remover as chaves antigas numa alteração
+        self._cases = {row.id: (row.case_number, row.plaintiff, row.defendant) for row in rows}
+
+        # Nome normalizado -> [nome apresentado, número de processos]
+        self._parties = {}
+        for _, plaintiff, defendant in self._cases.values():
+            for name in _party_names(plaintiff, defendant):
+                self._count_party(name, 1)
+
+        self.numbers = PrefixIndex(_entries(rows, lambda row: row.case_number, lambda row: (row.case_number, row.id)))
+        self.parties = PrefixIndex(
+            (key, name) for name, _ in self._parties.values() for key in index_keys(name)
+        )
+
+    def _count_party(self, name, delta):
+        """Atualizar a contagem de um nome; devolve o nome apresentado se entrou ou saiu do índice"""
+        normalized = normalize_text(name)
+        if not normalized:
+            return None
+
+        entry = self._parties.get(normalized)
+        if entry is None:
+            if delta < 0:
+                return None
+            self._parties[normalized] = [name, delta]
+            return name
+
+        entry[1] += delta
+        if entry[1] <= 0:
+            del self._parties[normalized]
+            return entry[0]
+        return None
+
+    def discard(self, case_id):
+        previous = self._cases.pop(case_id, None)
+        if previous is None:
+            return
+
+        case_number, plaintiff, defendant = previous
+        self.numbers.remove(case_number, (case_number, case_id))
+        for name in _party_names(plaintiff, defendant):
+            removed = self._count_party(name, -1)
+            if removed is not None:
+                self.parties.remove(removed, removed)
+
+    def apply(self, case_id, values):
+        self.discard(case_id)
+        if values is None or not values['is_public']:
+            return
+
+        self._cases[case_id] = (values['case_number'], values['plaintiff'], values['defendant'])
+        self.numbers.add(values['case_number'], (values['case_number'], case_id))
+        for name in _party_names(values['plaintiff'], values['defendant']):
+            added = self._count_party(name, 1)
+            if added is not None:
+                self.parties.add(added, added)
+
+    def party_count(self, name):
+        entry = self._parties.get(normalize_text(name))
+        return entry[1] if entry is not None else 0
+
+class FormIndexes:
+    """Títulos dos formulários ativos"""
+
+    table = 'form'
+
+    def __init__(self):
+        rows = db.session.execute(
+            db.select(Form.id, Form.title, Form.category).where(Form.is_active == True)
+        ).all()
+        self._forms = {row.id: (row.title, row.category) for row in rows}
+        self.titles = PrefixIndex(_entries(rows, lambda row: row.title, lambda row: (row.title, row.id, row.category)))
+
+    def discard(self, form_id):
+        previous = self._forms.pop(form_id, None)
+        if previous is not None:
+            title, category = previous
+            self.titles.remove(title, (title, form_id, category))
+
+    def apply(self, form_id, values):
+        self.discard(form_id)
+        if values is None or not values['is_active']:
+            return
+
+        self._forms[form_id] = (values['title'], values['category'])
+        self.titles.add(values['title'], (values['title'], form_id, values['category']))
+
+_builders = {'case': CaseIndexes, 'form': FormIndexes}
+_indexes = {}
+# Versão da tabela refletida em cada índice e commits locais aplicados desde então
+_versions = {}
+_local_commits = {}
+_rebuilding = set()
+_lock = threading.Lock()
+
+def _current_version(table):
+    backend = get_cache_backend()
+    return backend.get_versions((table,))[0] if backend is not None else None
+
+def _install(table, indexes, version):
+    with _lock:
+        _indexes[table] = indexes
+        _versions[table] = version
+        _local_commits[table] = 0
+
+def _rebuild(app, table, version):
+    try:
+        with app.app_context():
+            indexes = _builders[table]()
+        _install(table, indexes, version)
+    except Exception:
+        logger.exception('Falha ao reconstruir o índice de autocompletar (%s)', table)
+    finally:
+        with _lock:
+            _rebuilding.discard(table)
+
+def get_indexes(table):
+    """Índices de `table` ('case' ou 'form'), construídos no primeiro uso.
+
+    Quando a versão da tabela avançou mais do que os commits deste processo
+    (escritas de outro processo), o índice atual continua a ser servido e é
+    reconstruído em segundo plano.
+    """
+    version = _current_version(table)
+    with _lock:
+        indexes = _indexes.get(table)
+        if indexes is not None:
+            previous = _versions.get(table)
+            if version is None or previous is None or version == previous + _local_commits.get(table, 0):
+                # Sem escritas de fora (ou só as deste processo, já aplicadas)
+                _versions[table] = version
+                _local_commits[table] = 0
+            elif table not in _rebuilding:
+                _rebuilding.add(table)
+                threading.Thread(
+                    target=_rebuild, args=(current_app._get_current_object(), table, version),
+                    name=f'autocomplete-{table}', daemon=True
+                ).start()
+            return indexes
+
+    # Primeira construção: no próprio pedido, fora do lock
+    indexes = _builders[table]()
+    _install(table, indexes, version)
+    return indexes
+
+# Atualização incremental: os valores novos são recolhidos em cada flush e
+# aplicados apenas após o commit.
+
+_TRACKED = {
+    Case: ('case', ('case_number', 'plaintiff', 'defendant', 'is_public')),
+    Form: ('form', ('title', 'category', 'is_active')),
+}
+
+@event.listens_for(Session, 'after_flush')
+def _collect_autocomplete_changes(session, flush_context):
+    changes = None
+    for deleted, instances in ((False, (*session.new, *session.dirty)), (True, session.deleted)):
+        for instance in instances:
+            tracked = _TRACKED.get(type(instance))
+            if tracked is None:
+                continue
+            table, columns = tracked
+            values = None if deleted else {name: getattr(instance, name) for name in columns}
+            if changes is None:
+                changes = session.info.setdefault('autocomplete_changes', {})
+            changes[(table, instance.id)] = values
+
+@event.listens_for(Session, 'after_commit')
+def _apply_autocomplete_changes(session):
+    changes = session.info.pop('autocomplete_changes', None)
+    if not changes:
+        return
+
+    # Cada commit incrementa a versão da tabela uma vez (cache de respostas);
+    # get_indexes() desconta estes commits ao comparar versões, pelo que a
+    # ordem dos listeners de after_commit não importa.
+    with _lock:
+        for table in {table for table, _ in changes}:
+            indexes = _indexes.get(table)
+            if indexes is None:
+                continue
+
+            for (change_table, entity_id), values in changes.items():
+                if change_table == table:
+                    indexes.apply(entity_id, values)
+            _local_commits[table] = _local_commits.get(table, 0) + 1
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_autocomplete_changes(session):
+    session.info.pop('autocomplete_changes', None)
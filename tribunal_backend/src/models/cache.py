@@ -0,0 +1,284 @@
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+from flask import current_app, request, make_response, Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Cache de respostas dos endpoints públicos de leitura.
+#
+# Cada entrada guarda o JSON já codificado (bytes). A chave inclui a versão
+# atual de cada tabela de que a resposta depende; um commit que altere uma
+# dessas tabelas incrementa a versão, pelo que as entradas antigas deixam de
+# ser encontradas e acabam por sair por LRU.
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class MemoryCacheBackend:
+    """Cache LRU em memória, limitada em bytes (um único processo)"""
+
+    # Versões próprias do processo, que recomeçam em 0 a cada arranque
+    shared = False
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get_versions(self, tables):
+        with self._lock:
+            return tuple(self._versions.get(table, 0) for table in tables)
+
+    def bump(self, tables):
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+
+            self._entries[key] = value
+            self._size += size
+
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+class SQLiteCacheBackend:
+    """Cache partilhada num ficheiro SQLite, visível por todos os workers.
+
+    As versões das tabelas ficam no mesmo ficheiro, pelo que uma invalidação
+    feita num worker é vista imediatamente pelos restantes.
+    """
+
+    # Intervalo mínimo (segundos) entre atualizações de last_used da mesma entrada
+    TOUCH_INTERVAL = 5
+
+    # Versões comuns a todos os workers e mantidas entre arranques
+    shared = True
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+
+        conn = self._connection()
+        with conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache_version ('
+                'name TEXT PRIMARY KEY, version INTEGER NOT NULL)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache_entry ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, '
+                'last_used REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_cache_entry_last_used ON cache_entry (last_used)')
+            # Identificador do ficheiro: com um ficheiro novo as versões recomeçam,
+            # e o que delas deriva (ex.: ETags) não deve coincidir com o anterior
+            conn.execute(
+                "INSERT OR IGNORE INTO cache_version (name, version) VALUES ('#epoch', ?)",
+                (secrets.randbits(62),)
+            )
+        self.epoch = conn.execute("SELECT version FROM cache_version WHERE name = '#epoch'").fetchone()[0]
+
+    def _connection(self):
+        # Uma ligação por thread (e por processo, após o fork do gunicorn)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get_versions(self, tables):
+        rows = dict(self._connection().execute(
+            f"SELECT name, version FROM cache_version WHERE name IN ({','.join('?' * len(tables))})",
+            tables
+        ).fetchall())
+        return tuple(rows.get(table, 0) for table in tables)
+
+    def bump(self, tables):
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                'INSERT INTO cache_version (name, version) VALUES (?, 1) '
+                'ON CONFLICT(name) DO UPDATE SET version = version + 1',
+                [(table,) for table in tables]
+            )
+
+    def get(self, key):
+        conn = self._connection()
+        row = conn.execute('SELECT value, last_used FROM cache_entry WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+
+        now = time.time()
+        if now - row[1] > self.TOUCH_INTERVAL:
+            conn.execute('UPDATE cache_entry SET last_used = ? WHERE key = ?', (now, key))
+        return row[0]
+
+    def set(self, key, value):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO cache_entry (key, value, size, last_used) VALUES (?, ?, ?, ?)',
+                (key, value, size, time.time())
+            )
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM cache_entry').fetchone()[0]
+            if total > self.max_bytes:
+                self._evict(conn, total - self.max_bytes)
+
+    def _evict(self, conn, excess):
+        freed = 0
+        evicted = []
+        for key, size in conn.execute('SELECT key, size FROM cache_entry ORDER BY last_used ASC'):
+            evicted.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany('DELETE FROM cache_entry WHERE key = ?', evicted)
+
+    def clear(self):
+        conn = self._connection()
+        with conn:
+            conn.execute('DELETE FROM cache_entry')
+
+
+def create_cache_backend(app):
+    """Backend configurado em RESPONSE_CACHE_BACKEND ('memory', 'sqlite' ou None)"""
+    name = app.config.get('RESPONSE_CACHE_BACKEND', 'memory')
+    max_bytes = app.config.get('RESPONSE_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)
+
+    if not name:
+        return None
+    if name == 'memory':
+        return MemoryCacheBackend(max_bytes)
+    if name == 'sqlite':
+        path = app.config.get('RESPONSE_CACHE_PATH') or os.path.join(app.instance_path, 'response_cache.db')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return SQLiteCacheBackend(path, max_bytes)
+    raise ValueError(f'Backend de cache desconhecido: {name}')
+
+
+def init_response_cache(app):
+    """Ativar a cache de respostas na aplicação"""
+    app.extensions['response_cache'] = create_cache_backend(app)
+
+
+def get_cache_backend():
+    return current_app.extensions.get('response_cache')
+
+
+def bump_versions(*tables):
+    """Invalidar as respostas que dependem das tabelas indicadas.
+
+    Útil após escritas feitas fora do ORM (ex.: inserções em massa com Core).
+    """
+    backend = get_cache_backend()
+    if backend is not None:
+        backend.bump(tables)
+
+
+def cached_response(*tables, vary=None):
+    """Guardar em cache a resposta JSON do endpoint, dependente de `tables`.
+
+    `vary` é uma função opcional cujo resultado entra na chave, para respostas
+    que dependem de algo além dos parâmetros (ex.: a data de hoje).
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            backend = get_cache_backend()
+            if backend is None:
+                return f(*args, **kwargs)
+
+            # Chave normalizada: caminho + parâmetros ordenados (com os valores
+            # escapados, para que '&' ou '=' num valor não se confundam com
+            # outro parâmetro) + versões das tabelas
+            params = urlencode(sorted(request.args.items(multi=True)))
+            versions = ','.join(map(str, backend.get_versions(tables)))
+            key = f'{request.path}?{params}#{versions}'
+            if vary is not None:
+                key = f'{key}#{vary()}'
+
+            body = backend.get(key)
+            if body is not None:
+                response = Response(body, mimetype='application/json')
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            response = make_response(f(*args, **kwargs))
+            # Respostas em streaming (listas grandes) não são guardadas
+            if response.status_code == 200 and response.mimetype == 'application/json' and not response.is_streamed:
+                backend.set(key, response.get_data())
+            response.headers['X-Cache'] = 'MISS'
+            return response
+
+        return decorated
+    return decorator
+
+
+# Invalidação: as tabelas alteradas numa sessão são recolhidas em cada flush
+# e as respetivas versões incrementadas apenas após o commit.
+
+TRACKED_TABLES = {'case', 'hearing', 'form', 'user'}
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_tables(session, flush_context):
+    changed = session.info.setdefault('changed_tables', set())
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        table = getattr(instance, '__tablename__', None)
+        if table in TRACKED_TABLES:
+            changed.add(table)
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_changed_tables(session):
+    changed = session.info.pop('changed_tables', None)
+    if changed:
+        try:
+            bump_versions(*sorted(changed))
+        except RuntimeError:
+            # Commit fora de um contexto de aplicação (sem cache ativa)
+            pass
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changed_tables(session):
+    session.info.pop('changed_tables', None)
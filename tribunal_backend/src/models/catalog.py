@@ -0,0 +1,131 @@
+import gzip
+import hashlib
+from flask import current_app
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+from src.models.user import db, Form, normalize_text
+from src.models.cache import get_cache_backend
+
+try:
+    import brotli
+except ImportError:  # opcional: sem brotli são servidas apenas as variantes gzip
+    brotli = None
+
+# Catálogo de formulários pré-serializado.
+#
+# O catálogo muda raramente, por isso a resposta completa e a de cada
+# categoria são codificadas uma única vez (JSON em bytes, com variantes gzip e
+# brotli) e servidas da memória. É reconstruído apenas quando a assinatura dos
+# formulários muda:
+#
+# - commits neste processo que alterem um formulário (contador local);
+# - número de formulários ativos e maior updated_date (escritas noutros
+#   workers ou fora do ORM);
+# - versão da tabela de formulários na cache de respostas, quando ativa.
+
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+class CatalogVariant:
+    """Uma resposta do catálogo já codificada, com as variantes comprimidas"""
+
+    def __init__(self, body):
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.bodies = {'identity': body, 'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.bodies['br'] = brotli.compress(body, quality=11)
+
+    def representation(self, accept_encodings):
+        """(codificação, corpo, ETag) mais adequados ao Accept-Encoding do pedido"""
+        encoding = accept_encodings.best_match(ENCODINGS) or 'identity'
+        etag = self.etag if encoding == 'identity' else f'{self.etag}-{encoding}'
+        return encoding, self.bodies[encoding], etag
+
+def _payload(forms):
+    forms_by_category = {}
+    for form in forms:
+        forms_by_category.setdefault(form['category'], []).append(form)
+    return {
+        'success': True,
+        'forms': forms_by_category,
+        'total': len(forms)
+    }
+
+def encode_payload(payload):
+    return current_app.json.response(payload).get_data()
+
+class FormCatalog:
+    """Formulários ativos, respostas pré-codificadas e índice de títulos"""
+
+    def __init__(self, forms):
+        self.forms = [form.to_dict() for form in forms]
+        self.categories = sorted({form['category'] for form in self.forms})
+
+        self.variants = {None: CatalogVariant(encode_payload(_payload(self.forms)))}
+        for category in self.categories:
+            subset = [form for form in self.forms if form['category'] == category]
+            self.variants[category] = CatalogVariant(encode_payload(_payload(subset)))
+
+        # Índice de títulos normalizados (sem acentos nem maiúsculas), pela ordem do catálogo
+        self._titles = [(normalize_text(form['title']), form) for form in self.forms]
+
+    def search(self, category, term):
+        """Resposta (dict) para uma pesquisa no título, como o antigo ILIKE '%termo%'"""
+        term = normalize_text(term)
+        forms = [
+            form for title, form in self._titles
+            if term in title and (not category or form['category'] == category)
+        ]
+        return _payload(forms)
+
+# (assinatura, catálogo), substituído de uma só vez
+_catalog = (None, None)
+
+# Commits deste processo que alteraram formulários
+_local_version = 0
+
+def _signature():
+    count, updated = db.session.execute(
+        db.select(func.count(Form.id), func.max(Form.updated_date)).where(Form.is_active == True)
+    ).one()
+    backend = get_cache_backend()
+    versions = backend.get_versions(('form',)) if backend is not None else None
+    return _local_version, count, updated, versions
+
+def _load_catalog():
+    forms = db.session.execute(
+        db.select(Form)
+        .where(Form.is_active == True)
+        .order_by(Form.category.asc(), Form.title.asc())
+    ).scalars().all()
+    return FormCatalog(forms)
+
+def form_catalog():
+    """Catálogo atual, reconstruído quando a assinatura dos formulários muda.
+
+    A leitura não é feita sob um lock: no modo ASGI a consulta cede o event loop
+    a outros pedidos, que ficariam bloqueados no lock. Dois pedidos podem assim
+    reconstruir o catálogo ao mesmo tempo, com o mesmo resultado.
+    """
+    global _catalog
+
+    signature = _signature()
+    current_signature, catalog = _catalog
+    if catalog is None or current_signature != signature:
+        catalog = _load_catalog()
+        _catalog = (signature, catalog)
+    return catalog
+
+@event.listens_for(Session, 'after_flush')
+def _collect_form_changes(session, flush_context):
+    if any(isinstance(instance, Form) for instance in (*session.new, *session.dirty, *session.deleted)):
+        session.info['forms_changed'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _bump_local_version(session):
+    global _local_version
+    if session.info.pop('forms_changed', False):
+        _local_version += 1
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_form_changes(session):
+    session.info.pop('forms_changed', None)
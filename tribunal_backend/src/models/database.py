@@ -0,0 +1,186 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+try:
+    import aiosqlite
+except ImportError:  # opcional: sem aiosqlite o modo ASGI lê em threads
+    aiosqlite = None
+
+# Modo de produção da base de dados SQLite (DATABASE_MODE = 'production').
+#
+# Com vários workers do gunicorn, o modo por omissão (journal rollback) faz
+# com que uma escrita bloqueie todas as leituras e as escritas concorrentes
+# falhem com "database is locked". Neste modo:
+#
+# - o ficheiro fica em WAL: leitores e o escritor não se bloqueiam;
+# - cada ligação espera pelo lock (busy_timeout) em vez de falhar, com
+#   synchronous=NORMAL, mmap e uma cache de páginas maior;
+# - as leituras da sessão usam um pool de ligações só de leitura (bind 'read',
+#   PRAGMA query_only);
+# - as escritas passam por um único escritor por processo (pool de uma
+#   ligação) que abre a transação com BEGIN IMMEDIATE. O lock de escrita é
+#   pedido à cabeça, pelo que nunca há o erro de upgrade de uma transação de
+#   leitura (SQLITE_BUSY_SNAPSHOT), e fica retido apenas do flush ao commit.
+#
+# A sessão (RoutingSession) escolhe a ligação: consultas vão para o pool de
+# leitura até ao primeiro flush ou instrução DML da transação; a partir daí,
+# até ao commit/rollback, tudo vai para o escritor (para ler o que já foi
+# escrito e ainda não confirmado).
+#
+# No modo ASGI (src/asgi.py) as leituras dos endpoints assíncronos usam um
+# engine aiosqlite: a sessão recebe-o em async_reads() e cada consulta cede o
+# event loop enquanto espera pela base de dados.
+
+DATABASE_MODES = ('default', 'production')
+
+READ_BIND = 'read'
+
+_WRITING = 'database_writing'
+
+# Engine das leituras do pedido atual no modo ASGI (a fachada síncrona do
+# AsyncEngine), definido por async_reads()
+_async_reader = ContextVar('database_async_reader', default=None)
+
+# Ligações do engine assíncrono (cada uma com a sua thread do aiosqlite)
+ASYNC_POOL_SIZE = 8
+
+DEFAULT_PRAGMAS = {
+    'busy_timeout': 5000,
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # KiB (negativo), por ligação
+    'temp_store': 'MEMORY',
+}
+
+class RoutingSession(Session):
+    """Sessão que envia as leituras para o bind 'read', quando configurado"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is not None:
+            return engine
+
+        engines = self._db.engines
+        read_engine = _async_reader.get() or engines.get(READ_BIND)
+        if read_engine is None or engine is not engines.get(None):
+            return engine
+
+        if self._flushing or self.info.get(_WRITING) or getattr(clause, 'is_dml', False):
+            self.info[_WRITING] = True
+            return engine
+        return read_engine
+
+@event.listens_for(RoutingSession, 'after_transaction_end')
+def _end_writing(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(_WRITING, None)
+
+def _pragmas(app):
+    pragmas = dict(DEFAULT_PRAGMAS)
+    for name in pragmas:
+        value = app.config.get(f'SQLITE_{name.upper()}')
+        if value is not None:
+            pragmas[name] = value
+    return pragmas
+
+def _is_file_database(uri):
+    return uri.startswith('sqlite:///') and uri[len('sqlite:///'):] not in ('', ':memory:')
+
+def configure_database(app):
+    """Opções dos engines conforme DATABASE_MODE (antes de db.init_app)"""
+    mode = app.config.setdefault('DATABASE_MODE', 'default')
+    if mode not in DATABASE_MODES:
+        raise ValueError(f'DATABASE_MODE inválido (opções: {", ".join(DATABASE_MODES)})')
+
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    if mode != 'production' or not _is_file_database(uri):
+        return
+
+    timeout = _pragmas(app)['busy_timeout'] / 1000
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': 1,
+        'max_overflow': 0,
+        'pool_timeout': app.config.get('SQLITE_WRITE_TIMEOUT', 30),
+        'connect_args': {'timeout': timeout},
+    }
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    binds[READ_BIND] = {
+        'url': uri,
+        'pool_size': app.config.get('SQLITE_READ_POOL_SIZE', 8),
+        'max_overflow': 0,
+        'connect_args': {'timeout': timeout},
+    }
+    app.config['SQLALCHEMY_BINDS'] = binds
+
+def _apply_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+    cursor.close()
+
+def init_database(app):
+    """Pragmas e transações dos engines do modo de produção (depois de db.init_app)"""
+    if app.config.get('DATABASE_MODE') != 'production':
+        return
+
+    db = app.extensions['sqlalchemy']
+    with app.app_context():
+        engines = db.engines
+    if READ_BIND not in engines:
+        return
+
+    pragmas = _pragmas(app)
+    writer = engines[None]
+
+    @event.listens_for(writer, 'connect')
+    def _connect_writer(dbapi_connection, connection_record):
+        _apply_pragmas(dbapi_connection, dict(pragmas, journal_mode='WAL'))
+        # Transações controladas pelo SQLAlchemy (evento 'begin' abaixo)
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(writer, 'begin')
+    def _begin_writer(conn):
+        conn.exec_driver_sql('BEGIN IMMEDIATE')
+
+    @event.listens_for(engines[READ_BIND], 'connect')
+    def _connect_reader(dbapi_connection, connection_record):
+        _apply_pragmas(dbapi_connection, dict(pragmas, query_only='ON'))
+
+def init_async_database(app):
+    """Engine aiosqlite só de leitura para o modo ASGI (None sem aiosqlite)"""
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    if aiosqlite is None or not _is_file_database(uri):
+        app.extensions['async_database'] = None
+        return None
+
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    pragmas = _pragmas(app)
+    engine = create_async_engine(
+        'sqlite+aiosqlite:///' + uri[len('sqlite:///'):],
+        pool_size=app.config.get('ASYNC_DATABASE_POOL_SIZE', ASYNC_POOL_SIZE),
+        max_overflow=0,
+        connect_args={'timeout': pragmas['busy_timeout'] / 1000},
+    )
+
+    @event.listens_for(engine.sync_engine, 'connect')
+    def _connect_async_reader(dbapi_connection, connection_record):
+        _apply_pragmas(dbapi_connection, dict(pragmas, query_only='ON'))
+
+    app.extensions['async_database'] = engine
+    return engine
+
+@contextmanager
+def async_reads(engine):
+    """Enviar as leituras da sessão para `engine` (AsyncEngine) neste contexto.
+
+    Só pode ser usado dentro de greenlet_spawn(): as consultas esperam pelo
+    aiosqlite com await_only(). As escritas continuam no engine principal.
+    """
+    token = _async_reader.set(engine.sync_engine)
+    try:
+        yield
+    finally:
+        _async_reader.reset(token)
@@ -0,0 +1,266 @@
+import hashlib
+import json
+import os
+import re
+import secrets
+import tempfile
+import time
+from datetime import datetime, timezone
+from flask import current_app
+from src.models.files import FileInfo
+
+try:
+    import fcntl
+except ImportError:  # opcional: sem fcntl (Windows) os blocos não são serializados
+    fcntl = None
+
+# Armazenamento de documentos por conteúdo (SHA-256).
+#
+# Cada ficheiro é escrito em disco à medida que chega (sem guardar o corpo do
+# pedido em memória) e calculado o hash em simultâneo; no fim é movido para
+# blobs/<aa>/<bb>/<sha256>. Um ficheiro já existente não é escrito de novo,
+# pelo que peças processuais repetidas ocupam espaço uma única vez.
+#
+# Os uploads retomáveis ficam em uploads/<id> (com os metadados em
+# uploads/<id>.json) até serem concluídos. Cada bloco é escrito com o ficheiro
+# bloqueado (flock), pelo que dois PATCH simultâneos no mesmo upload não se
+# intercalam: o segundo recebe 409 com o offset atual. Uploads abandonados (e
+# ficheiros temporários de envios interrompidos) são apagados por
+# sweep_uploads(), chamado ao criar uploads e pelo comando flask sweep-uploads.
+
+CHUNK_SIZE = 1024 * 1024
+
+DEFAULT_MAX_SIZE = 2 * 1024 * 1024 * 1024
+
+# Uploads retomáveis não concluídos são apagados ao fim deste tempo (segundos)
+UPLOAD_EXPIRY = 24 * 60 * 60
+
+# Intervalo mínimo entre limpezas feitas ao criar um upload (segundos)
+SWEEP_INTERVAL = 60 * 60
+
+_UPLOAD_ID_RE = re.compile(r'^[A-Za-z0-9_-]{16,64}$')
+
+class DocumentTooLarge(ValueError):
+    """Documento acima do tamanho máximo configurado"""
+
+class UploadOffsetMismatch(ValueError):
+    """O bloco enviado não começa no fim do que já foi recebido"""
+
+    def __init__(self, offset):
+        super().__init__(f'Offset inválido, recebidos {offset} bytes')
+        self.offset = offset
+
+class UploadBusy(UploadOffsetMismatch):
+    """Outro pedido está a escrever no mesmo upload"""
+
+    def __init__(self, offset):
+        ValueError.__init__(self, f'Upload em curso noutro pedido, recebidos {offset} bytes')
+        self.offset = offset
+
+def _try_lock(f):
+    """Bloquear o ficheiro sem esperar; False se outro pedido o tiver bloqueado"""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+class DocumentStore:
+    """Blobs endereçados por SHA-256 num diretório local"""
+
+    def __init__(self, root, max_size=DEFAULT_MAX_SIZE):
+        self.root = root
+        self.max_size = max_size
+        self._last_sweep = 0
+        for name in ('blobs', 'tmp', 'uploads'):
+            os.makedirs(os.path.join(root, name), exist_ok=True)
+
+    def blob_path(self, sha256):
+        return os.path.join(self.root, 'blobs', sha256[:2], sha256[2:4], sha256)
+
+    def _commit(self, temp_path, sha256):
+        path = self.blob_path(sha256)
+        if os.path.exists(path):
+            # Conteúdo duplicado: reutilizar o blob existente
+            os.remove(temp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(temp_path, path)
+        return path
+
+    def _copy(self, stream, target, digest, size):
+        """Copiar `stream` para `target` em blocos, a atualizar o hash e o tamanho"""
+        while True:
+            block = stream.read(CHUNK_SIZE)
+            if not block:
+                return size
+            size += len(block)
+            if size > self.max_size:
+                raise DocumentTooLarge(f'Documento acima do limite de {self.max_size} bytes')
+            if digest is not None:
+                digest.update(block)
+            target.write(block)
+
+    def save_stream(self, stream):
+        """Guardar o conteúdo de `stream`; devolve (sha256, tamanho, caminho)"""
+        fd, temp_path = tempfile.mkstemp(dir=os.path.join(self.root, 'tmp'))
+        digest = hashlib.sha256()
+        try:
+            with os.fdopen(fd, 'wb') as target:
+                size = self._copy(stream, target, digest, 0)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+        sha256 = digest.hexdigest()
+        return sha256, size, self._commit(temp_path, sha256)
+
+    # Uploads retomáveis (blocos sucessivos com offset)
+
+    def _upload_path(self, upload_id):
+        if not _UPLOAD_ID_RE.match(upload_id or ''):
+            return None
+        return os.path.join(self.root, 'uploads', upload_id)
+
+    def create_upload(self, meta):
+        if time.time() - self._last_sweep > SWEEP_INTERVAL:
+            self.sweep_uploads()
+        upload_id = secrets.token_urlsafe(24)
+        path = self._upload_path(upload_id)
+        open(path, 'wb').close()
+        with open(path + '.json', 'w') as f:
+            json.dump(dict(meta, created=time.time()), f)
+        return upload_id
+
+    def upload_meta(self, upload_id):
+        """Metadados e bytes recebidos de um upload (None se não existir ou tiver expirado)"""
+        path = self._upload_path(upload_id)
+        if path is None:
+            return None
+        try:
+            with open(path + '.json') as f:
+                meta = json.load(f)
+            offset = os.path.getsize(path)
+        except (OSError, ValueError):
+            return None
+
+        if time.time() - meta['created'] > UPLOAD_EXPIRY:
+            self.discard_upload(upload_id)
+            return None
+        return meta, offset
+
+    def append_upload(self, upload_id, offset, stream):
+        """Acrescentar um bloco no `offset` indicado; devolve o novo total"""
+        path = self._upload_path(upload_id)
+        with open(path, 'ab') as target:
+            if not _try_lock(target):
+                raise UploadBusy(os.fstat(target.fileno()).st_size)
+            # Tamanho lido já com o ficheiro bloqueado
+            current = os.fstat(target.fileno()).st_size
+            if offset != current:
+                raise UploadOffsetMismatch(current)
+            try:
+                return self._copy(stream, target, None, current)
+            except DocumentTooLarge:
+                target.truncate(current)
+                raise
+
+    def complete_upload(self, upload_id):
+        """Concluir um upload: calcular o hash e mover para os blobs"""
+        path = self._upload_path(upload_id)
+        digest = hashlib.sha256()
+        size = 0
+        with open(path, 'rb') as f:
+            if not _try_lock(f):
+                raise UploadBusy(os.fstat(f.fileno()).st_size)
+            for block in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(block)
+                size += len(block)
+
+        sha256 = digest.hexdigest()
+        os.remove(path + '.json')
+        return sha256, size, self._commit(path, sha256)
+
+    def discard_upload(self, upload_id):
+        path = self._upload_path(upload_id)
+        for name in (path, path + '.json'):
+            try:
+                os.remove(name)
+            except OSError:
+                pass
+
+    def sweep_uploads(self, expiry=UPLOAD_EXPIRY):
+        """Apagar uploads expirados e ficheiros temporários abandonados; devolve quantos"""
+        self._last_sweep = time.time()
+        cutoff = self._last_sweep - expiry
+        removed = 0
+
+        uploads = os.path.join(self.root, 'uploads')
+        for upload_id in {name.removesuffix('.json') for name in os.listdir(uploads)}:
+            path = self._upload_path(upload_id)
+            if path is None:
+                continue
+            try:
+                with open(path + '.json') as f:
+                    created = json.load(f)['created']
+            except (OSError, ValueError, KeyError):
+                # Dados sem metadados válidos: pela data de alteração
+                try:
+                    created = os.path.getmtime(path)
+                except OSError:
+                    created = 0
+            if created > cutoff:
+                continue
+
+            try:
+                with open(path, 'rb') as f:
+                    if not _try_lock(f):
+                        # Bloco a ser escrito neste momento
+                        continue
+                    self.discard_upload(upload_id)
+            except FileNotFoundError:
+                self.discard_upload(upload_id)
+            removed += 1
+
+        tmp = os.path.join(self.root, 'tmp')
+        for name in os.listdir(tmp):
+            path = os.path.join(tmp, name)
+            try:
+                if os.path.getmtime(path) <= cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+def create_document_store(app):
+    """Armazenamento em DOCUMENT_STORAGE_PATH (por omissão instance/documents)"""
+    root = app.config.get('DOCUMENT_STORAGE_PATH') or os.path.join(app.instance_path, 'documents')
+    return DocumentStore(root, app.config.get('DOCUMENT_MAX_SIZE') or DEFAULT_MAX_SIZE)
+
+def init_document_store(app):
+    app.extensions['document_store'] = create_document_store(app)
+
+def get_document_store():
+    store = current_app.extensions.get('document_store')
+    if store is None:
+        store = create_document_store(current_app)
+        current_app.extensions['document_store'] = store
+    return store
+
+def document_file_info(document):
+    """FileInfo de um documento, com o hash guardado como ETag (sem reler o ficheiro)"""
+    if not document.file_path or not document.sha256:
+        return None
+    try:
+        result = os.stat(document.file_path)
+    except OSError:
+        return None
+    return FileInfo(
+        document.file_path,
+        result.st_size,
+        datetime.fromtimestamp(result.st_mtime, timezone.utc),
+        document.sha256
+    )
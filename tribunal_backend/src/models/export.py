@@ -0,0 +1,87 @@
+import csv
+import io
+from datetime import datetime
+from flask import Response, current_app, stream_with_context
+
+# Exportação em streaming: as linhas são lidas da base de dados em lotes
+# (yield_per) e escritas na resposta à medida que chegam, pelo que a memória
+# usada não depende do número de resultados.
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+# Linhas lidas do cursor da base de dados de cada vez
+EXPORT_BATCH_SIZE = 1000
+
+# Tamanho aproximado (bytes) de cada bloco enviado ao cliente
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+
+def _ndjson_chunks(rows, fields):
+    dumps = current_app.json.dumps
+    buffer = []
+    size = 0
+    first = True
+
+    for row in rows:
+        line = dumps(row.to_dict(fields)) + '\n'
+        buffer.append(line)
+        size += len(line)
+
+        # A primeira linha segue de imediato; as restantes em blocos
+        if first or size >= EXPORT_CHUNK_SIZE:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+            first = False
+
+    if buffer:
+        yield ''.join(buffer)
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    # Datas no mesmo formato ISO 8601 do JSON
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _csv_chunks(rows, fields):
+    output = io.StringIO()
+    writer = csv.writer(output)
+
+    writer.writerow(fields)
+    yield output.getvalue()
+    output.seek(0)
+    output.truncate()
+
+    for row in rows:
+        data = row.to_dict(fields)
+        writer.writerow([_csv_value(data[name]) for name in fields])
+
+        if output.tell() >= EXPORT_CHUNK_SIZE:
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate()
+
+    if output.tell():
+        yield output.getvalue()
+
+
+def stream_export(query, model, fields, export_format, filename):
+    """Resposta em streaming (NDJSON ou CSV) com os resultados de `query`"""
+    fields = fields or list(model.__fields__)
+    rows = query.yield_per(EXPORT_BATCH_SIZE)
+
+    if export_format == 'csv':
+        chunks = _csv_chunks(rows, fields)
+    else:
+        chunks = _ndjson_chunks(rows, fields)
+
+    return Response(
+        stream_with_context(chunks),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}.{export_format}"'}
+    )
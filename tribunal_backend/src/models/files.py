@@ -0,0 +1,119 @@
+import hashlib
+import os
+import stat
+import threading
+import unicodedata
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timezone
+from urllib.parse import quote
+from flask import current_app, request
+from werkzeug.utils import send_file
+
+# Envio de ficheiros com validação condicional e pedidos parciais.
+#
+# O ETag (forte) é o hash SHA-256 do conteúdo e o Last-Modified a data do
+# ficheiro. O hash fica em memória e só é recalculado quando o tamanho ou a
+# data do ficheiro mudam, pelo que cada download custa apenas um stat().
+#
+# Com FILE_OFFLOAD = 'x-accel' (nginx) ou 'x-sendfile' (Apache, lighttpd) o
+# Python responde só com os cabeçalhos e é o proxy que envia os bytes.
+
+FileInfo = namedtuple('FileInfo', ['path', 'size', 'mtime', 'etag'])
+
+OFFLOAD_MODES = ('x-accel', 'x-sendfile')
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+FILE_INFO_CACHE_SIZE = 10000
+_file_info_cache = OrderedDict()
+_file_info_lock = threading.Lock()
+
+def _content_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def file_info(path):
+    """Metadados de um ficheiro regular (None se não existir)"""
+    try:
+        result = os.stat(path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(result.st_mode):
+        return None
+
+    key = (result.st_size, result.st_mtime_ns)
+    with _file_info_lock:
+        cached = _file_info_cache.get(path)
+        if cached is not None and cached[0] == key:
+            _file_info_cache.move_to_end(path)
+            return cached[1]
+
+    info = FileInfo(
+        path,
+        result.st_size,
+        datetime.fromtimestamp(result.st_mtime, timezone.utc),
+        _content_hash(path)
+    )
+    with _file_info_lock:
+        _file_info_cache[path] = (key, info)
+        while len(_file_info_cache) > FILE_INFO_CACHE_SIZE:
+            _file_info_cache.popitem(last=False)
+    return info
+
+def _content_disposition(download_name):
+    try:
+        download_name.encode('ascii')
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+        return {'filename': simple, 'filename*': "UTF-8''" + quote(download_name, safe="!#$&+-.^_`|~")}
+    return {'filename': download_name}
+
+def _offload_location(path, mode):
+    if mode == 'x-sendfile':
+        return os.path.abspath(path)
+
+    # X-Accel-Redirect: caminho relativo a FILE_OFFLOAD_ROOT sob a location interna do nginx
+    root = current_app.config.get('FILE_OFFLOAD_ROOT')
+    if not root:
+        return None
+    relative = os.path.relpath(os.path.abspath(path), os.path.abspath(root))
+    if relative.startswith('..'):
+        return None
+    prefix = current_app.config.get('FILE_OFFLOAD_PREFIX', '/protected-files/')
+    return prefix.rstrip('/') + '/' + quote(relative.replace(os.sep, '/'))
+
+def send_file_response(info, download_name, mimetype=None):
+    """Resposta para `info` com ETag, Last-Modified, 304 e Range"""
+    mode = current_app.config.get('FILE_OFFLOAD')
+    location = _offload_location(info.path, mode) if mode in OFFLOAD_MODES else None
+
+    if location is None:
+        response = send_file(
+            info.path,
+            request.environ,
+            mimetype=mimetype,
+            as_attachment=True,
+            download_name=download_name,
+            etag=info.etag,
+            last_modified=info.mtime,
+            response_class=current_app.response_class
+        )
+        # Anunciar downloads retomáveis também na resposta completa
+        response.accept_ranges = 'bytes'
+        return response
+
+    # O proxy trata dos pedidos parciais; aqui só a validação condicional
+    response = current_app.response_class(mimetype=mimetype or 'application/octet-stream')
+    response.headers['X-Accel-Redirect' if mode == 'x-accel' else 'X-Sendfile'] = location
+    response.headers.set('Content-Disposition', 'attachment', **_content_disposition(download_name))
+    response.set_etag(info.etag)
+    response.last_modified = info.mtime
+    response.cache_control.no_cache = True
+    response = response.make_conditional(request)
+    if response.status_code == 304:
+        response.headers.pop('X-Accel-Redirect', None)
+        response.headers.pop('X-Sendfile', None)
+    return response
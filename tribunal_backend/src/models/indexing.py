@@ -0,0 +1,394 @@
+import logging
+import multiprocessing
+import re
+import time
+import zlib
+from datetime import datetime, timedelta
+from sqlalchemy import text, table, column, literal, literal_column, func, select, update, insert, delete
+from src.models.user import db, Case, Document, DocumentIndexJob
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # opcional: sem pypdf usa-se o extrator simples abaixo
+    PdfReader = None
+
+# Indexação de texto integral dos documentos, fora do caminho dos pedidos.
+#
+# Cada documento submetido cria um trabalho na tabela document_index_job (na
+# mesma transação). Os workers (flask index-documents) reclamam trabalhos um a
+# um, extraem o texto (texto simples ou camada de texto dos PDF), dividem-no em
+# blocos e gravam-nos no índice FTS5 document_fts, associados ao documento e
+# ao processo. Falhas são repetidas com espera crescente até MAX_ATTEMPTS.
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_FTS_TABLE = 'document_fts'
+
+DOCUMENT_FTS_DDL = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {DOCUMENT_FTS_TABLE} USING fts5(
+        body,
+        document_id UNINDEXED,
+        case_id UNINDEXED,
+        tokenize='unicode61 remove_diacritics 2'
+    )
+"""
+
+document_fts = table(
+    DOCUMENT_FTS_TABLE, column('rowid'), column('body'), column('document_id'), column('case_id')
+)
+
+# Os blocos de um documento ocupam os rowid [document_id * MAX_CHUNKS, ...),
+# o que permite apagá-los por intervalo de rowid (sem varrer o índice)
+MAX_CHUNKS = 100000
+
+# Tamanho aproximado (caracteres) de cada bloco indexado
+CHUNK_CHARS = 2000
+
+# Texto simples lido no máximo (bytes)
+MAX_TEXT_BYTES = 64 * 1024 * 1024
+
+MAX_ATTEMPTS = 5
+RETRY_DELAY = 30
+
+# Trabalhos em execução há mais tempo do que isto (segundos) são retomados
+JOB_TIMEOUT = 10 * 60
+
+POLL_INTERVAL = 2
+
+# Blocos com melhor pontuação considerados numa pesquisa
+MAX_MATCHED_CHUNKS = 5000
+
+TEXT_EXTENSIONS = ('.txt', '.md', '.csv')
+
+def init_document_search(app):
+    """Criar o índice de texto dos documentos (SQLite com FTS5)"""
+    app.config['DOCUMENT_FTS_ENABLED'] = False
+
+    if db.engine.dialect.name != 'sqlite':
+        return False
+
+    try:
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql(DOCUMENT_FTS_DDL)
+    except Exception as e:
+        app.logger.warning('Índice FTS5 de documentos indisponível: %s', e)
+        return False
+
+    app.config['DOCUMENT_FTS_ENABLED'] = True
+    return True
+
+def enqueue_document(document_id):
+    """Agendar a indexação de um documento novo (gravada com o commit do chamador)"""
+    db.session.add(DocumentIndexJob(document_id=document_id))
+
+def enqueue_missing_documents():
+    """Agendar os documentos que ainda não têm trabalho de indexação"""
+    now = datetime.utcnow()
+    with db.engine.begin() as conn:
+        result = conn.execute(
+            insert(DocumentIndexJob).from_select(
+                ['document_id', 'status', 'attempts', 'run_after', 'updated_at'],
+                select(Document.id, literal('pending'), literal(0), literal(now), literal(now))
+                .where(~Document.id.in_(select(DocumentIndexJob.document_id)))
+            )
+        )
+        return result.rowcount
+
+def requeue_documents(status=None):
+    """Voltar a agendar trabalhos (todos, ou apenas os com `status`)"""
+    statement = update(DocumentIndexJob).values(
+        status='pending', attempts=0, run_after=datetime.utcnow(), last_error=None
+    )
+    if status:
+        statement = statement.where(DocumentIndexJob.status == status)
+    with db.engine.begin() as conn:
+        return conn.execute(statement).rowcount
+
+# Extração de texto
+
+def _decode_text(data):
+    for encoding in ('utf-8-sig', 'cp1252'):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode('latin-1')
+
+_STREAM_RE = re.compile(rb'stream\r?\n(.*?)\r?\nendstream', re.DOTALL)
+_TEXT_OP_RE = re.compile(rb'\[((?:[^\]\\]|\\.)*)\]\s*TJ|(\((?:[^()\\]|\\.)*\))\s*(?:Tj|\'|")|(BT|ET|T\*|Td|TD)', re.DOTALL)
+_LITERAL_RE = re.compile(rb'\((?:[^()\\]|\\.)*\)', re.DOTALL)
+_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f'}
+
+def _literal(value):
+    """Conteúdo de uma string literal PDF "(...)" sem as sequências de escape"""
+    value = value[1:-1]
+    out = bytearray()
+    i = 0
+    while i < len(value):
+        char = value[i:i + 1]
+        if char == b'\\' and i + 1 < len(value):
+            nxt = value[i + 1:i + 2]
+            if nxt in _ESCAPES:
+                out += _ESCAPES[nxt]
+                i += 2
+            elif nxt.isdigit():
+                octal = re.match(rb'[0-7]{1,3}', value[i + 1:i + 4]).group()
+                out.append(int(octal, 8) & 0xFF)
+                i += 1 + len(octal)
+            else:
+                out += nxt
+                i += 2
+        else:
+            out += char
+            i += 1
+    return bytes(out).decode('cp1252', errors='replace')
+
+def _pdf_text_simple(data):
+    """Extrator mínimo: operadores de texto com strings literais nos content streams.
+
+    Cobre PDFs gerados com fontes simples (não incorporadas em CID); para os
+    restantes deve instalar-se o pypdf.
+    """
+    parts = []
+    for match in _STREAM_RE.finditer(data):
+        stream = match.group(1)
+        try:
+            stream = zlib.decompress(stream)
+        except zlib.error:
+            pass
+        if b'BT' not in stream:
+            continue
+
+        for array, literal, operator in _TEXT_OP_RE.findall(stream):
+            if operator:
+                parts.append('\n' if operator in (b'ET', b'T*') else ' ')
+            elif literal:
+                parts.append(_literal(literal))
+            else:
+                parts.append(''.join(_literal(item) for item in _LITERAL_RE.findall(array)))
+    return ''.join(parts)
+
+def _pdf_text(path):
+    if PdfReader is not None:
+        reader = PdfReader(path)
+        return '\n'.join(page.extract_text() or '' for page in reader.pages)
+
+    with open(path, 'rb') as f:
+        return _pdf_text_simple(f.read())
+
+def extract_text(path, content_type=None, filename=None):
+    """Texto de um documento, ou None se o formato não tiver texto extraível"""
+    with open(path, 'rb') as f:
+        head = f.read(5)
+
+    if head == b'%PDF-' or content_type == 'application/pdf':
+        return _pdf_text(path)
+
+    name = (filename or '').lower()
+    if (content_type or '').startswith('text/') or name.endswith(TEXT_EXTENSIONS):
+        with open(path, 'rb') as f:
+            return _decode_text(f.read(MAX_TEXT_BYTES))
+
+    return None
+
+def chunk_text(value, size=CHUNK_CHARS):
+    """Dividir o texto em blocos de cerca de `size` caracteres, em fronteiras de palavra"""
+    value = re.sub(r'\s+', ' ', value or '').strip()
+    chunks = []
+    start = 0
+    while start < len(value) and len(chunks) < MAX_CHUNKS:
+        end = start + size
+        if end < len(value):
+            cut = value.rfind(' ', start, end)
+            if cut > start:
+                end = cut
+        chunk = value[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        start = end
+    return chunks
+
+# Processamento dos trabalhos
+
+def _rowid_range(document_id):
+    base = document_id * MAX_CHUNKS
+    return base, base + MAX_CHUNKS - 1
+
+def _replace_chunks(conn, document_id, case_id, chunks):
+    low, high = _rowid_range(document_id)
+    conn.execute(delete(document_fts).where(document_fts.c.rowid.between(low, high)))
+    if chunks:
+        conn.execute(insert(document_fts), [
+            {'rowid': low + number, 'body': chunk, 'document_id': document_id, 'case_id': case_id}
+            for number, chunk in enumerate(chunks)
+        ])
+
+def _copy_chunks(conn, source_id, document_id, case_id):
+    """Reutilizar os blocos de outro documento com o mesmo conteúdo"""
+    source_low, source_high = _rowid_range(source_id)
+    low, high = _rowid_range(document_id)
+    conn.execute(delete(document_fts).where(document_fts.c.rowid.between(low, high)))
+    return conn.execute(
+        insert(document_fts).from_select(
+            ['rowid', 'body', 'document_id', 'case_id'],
+            select(
+                document_fts.c.rowid - source_low + low,
+                document_fts.c.body,
+                literal_column(str(int(document_id))),
+                literal_column(str(int(case_id)))
+            ).where(document_fts.c.rowid.between(source_low, source_high))
+        )
+    ).rowcount
+
+def claim_job():
+    """Reclamar o próximo trabalho pendente (ou abandonado); devolve (id, document_id, tentativas)"""
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=JOB_TIMEOUT)
+    next_job = (
+        select(DocumentIndexJob.id)
+        .where(db.or_(
+            db.and_(DocumentIndexJob.status == 'pending', DocumentIndexJob.run_after <= now),
+            db.and_(DocumentIndexJob.status == 'running', DocumentIndexJob.locked_at < stale)
+        ))
+        .order_by(DocumentIndexJob.run_after, DocumentIndexJob.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    with db.engine.begin() as conn:
+        return conn.execute(
+            update(DocumentIndexJob)
+            .where(DocumentIndexJob.id == next_job)
+            .values(status='running', locked_at=now, attempts=DocumentIndexJob.attempts + 1, updated_at=now)
+            .returning(DocumentIndexJob.id, DocumentIndexJob.document_id, DocumentIndexJob.attempts)
+        ).first()
+
+def _finish(conn, job_id, **values):
+    conn.execute(
+        update(DocumentIndexJob)
+        .where(DocumentIndexJob.id == job_id)
+        .values(locked_at=None, updated_at=datetime.utcnow(), **values)
+    )
+
+def process_job(job_id, document_id, attempts):
+    """Indexar um documento; devolve o estado final do trabalho"""
+    try:
+        with db.engine.connect() as conn:
+            document = conn.execute(
+                select(
+                    Document.id, Document.case_id, Document.file_path, Document.content_type,
+                    Document.filename, Document.sha256
+                ).where(Document.id == document_id)
+            ).first()
+
+            # Mesmo conteúdo já indexado noutro documento: copiar os blocos
+            source_id = None
+            if document is not None and document.sha256:
+                source_id = conn.execute(
+                    select(Document.id)
+                    .join(DocumentIndexJob, DocumentIndexJob.document_id == Document.id)
+                    .where(
+                        Document.sha256 == document.sha256,
+                        Document.id != document.id,
+                        DocumentIndexJob.status == 'done'
+                    )
+                    .limit(1)
+                ).scalar()
+
+        if document is None:
+            with db.engine.begin() as conn:
+                _finish(conn, job_id, status='skipped', last_error='Documento removido')
+            return 'skipped'
+
+        if source_id is not None:
+            with db.engine.begin() as conn:
+                count = _copy_chunks(conn, source_id, document.id, document.case_id)
+                _finish(conn, job_id, status='done', chunks=count, last_error=None)
+            return 'done'
+
+        # Extração fora de qualquer transação: a base de dados fica livre
+        content = extract_text(document.file_path, document.content_type, document.filename)
+        if content is None:
+            with db.engine.begin() as conn:
+                _finish(conn, job_id, status='skipped', last_error='Formato sem texto extraível')
+            return 'skipped'
+
+        chunks = chunk_text(content)
+        with db.engine.begin() as conn:
+            _replace_chunks(conn, document.id, document.case_id, chunks)
+            _finish(conn, job_id, status='done', chunks=len(chunks), last_error=None)
+        return 'done'
+
+    except Exception as e:
+        logger.warning('Falha ao indexar o documento %s (tentativa %s): %s', document_id, attempts, e)
+        if attempts >= MAX_ATTEMPTS:
+            values = {'status': 'failed'}
+        else:
+            delay = RETRY_DELAY * 2 ** (attempts - 1)
+            values = {'status': 'pending', 'run_after': datetime.utcnow() + timedelta(seconds=delay)}
+        with db.engine.begin() as conn:
+            _finish(conn, job_id, last_error=str(e), **values)
+        return values['status']
+
+def run_worker(app, once=False, poll_interval=POLL_INTERVAL):
+    """Processar trabalhos até a fila esvaziar (`once`) ou indefinidamente"""
+    processed = 0
+    with app.app_context():
+        while True:
+            job = claim_job()
+            if job is None:
+                if once:
+                    return processed
+                time.sleep(poll_interval)
+                continue
+            process_job(*job)
+            processed += 1
+
+def _worker_process(app, once):
+    with app.app_context():
+        # Ligações herdadas do processo pai não são partilhadas
+        db.engine.dispose(close=False)
+    run_worker(app, once)
+
+def run_worker_pool(app, workers=1, once=False):
+    """Executar `workers` processos de indexação (cada um com a sua ligação)"""
+    if workers <= 1:
+        return run_worker(app, once)
+
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=_worker_process, args=(app, once)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+# Pesquisa
+
+def document_matches(expression, *conditions):
+    """Melhor bloco (rank, excerto) de cada documento que satisfaz `expression`.
+
+    `conditions` (sobre Document e Case, ex.: a visibilidade) são aplicadas na
+    própria consulta FTS, antes do limite de MAX_MATCHED_CHUNKS blocos: blocos
+    de documentos inacessíveis não ocupam o lugar dos visíveis.
+    """
+    fts = literal_column(DOCUMENT_FTS_TABLE)
+    chunks = (
+        select(
+            document_fts.c.document_id.label('document_id'),
+            func.bm25(fts).label('rank'),
+            func.snippet(fts, 0, '[', ']', '…', 16).label('snippet')
+        )
+        .select_from(document_fts)
+        .join(Document, Document.id == document_fts.c.document_id)
+        .join(Case, Case.id == Document.case_id)
+        .where(fts.op('MATCH')(expression), *conditions)
+        .order_by(text('rank'))
+        .limit(MAX_MATCHED_CHUNKS)
+        # Materializada: bm25/snippet só podem ser avaliados na consulta FTS
+        .cte('document_chunks')
+        .prefix_with('MATERIALIZED')
+    )
+    return (
+        select(chunks.c.document_id, func.min(chunks.c.rank).label('rank'), chunks.c.snippet)
+        .group_by(chunks.c.document_id)
+        .subquery()
+    )
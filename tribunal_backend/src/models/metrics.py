@@ -0,0 +1,288 @@
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from flask import current_app, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Métricas por pedido, pensadas para ficarem ativas em produção.
+#
+# Os eventos do SQLAlchemy (before/after_cursor_execute) contam e medem as
+# consultas de cada pedido; o tempo de serialização JSON é medido no
+# JSONProvider (timed_serialization). No fim do pedido:
+#
+# - a resposta recebe o cabeçalho Server-Timing (db, serialize, total);
+# - as consultas acima de SLOW_QUERY_MS são registadas no log com o SQL
+#   normalizado (sem valores) e a rota;
+# - os totais entram no registo do processo, exposto em /api/metrics no
+#   formato de texto do Prometheus (histogramas de latência por blueprint,
+#   consultas, taxas de acerto das caches).
+#
+# O custo por consulta é um perf_counter() e uma leitura de ContextVar; o
+# registo é atualizado uma vez por pedido. Com vários workers do gunicorn cada
+# processo tem o seu registo: cada scrape vê apenas o worker que respondeu.
+
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Limites (segundos) dos buckets do histograma de latência
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+SLOW_QUERY_MS = 200
+
+# Blueprint dos pedidos servidos pela aplicação (ficheiros estáticos, 404)
+APP_LABEL = 'app'
+
+_current = ContextVar('request_metrics', default=None)
+
+_QUERY_START = 'metrics_query_start'
+
+class RequestMetrics:
+    """Tempos acumulados de um pedido"""
+
+    __slots__ = ('registry', 'request', 'slow_query', 'start', 'queries', 'db_time', 'serialize_time', 'slow_queries')
+
+    def __init__(self, registry, request, slow_query):
+        self.registry = registry
+        self.request = request
+        self.slow_query = slow_query
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.slow_queries = 0
+
+class Histogram:
+    """Histograma com buckets fixos (contagens não cumulativas; +Inf no fim)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class MetricsRegistry:
+    """Contadores e histogramas do processo, agregados por blueprint"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latency = {}
+        self._requests = {}
+        self._queries = {}
+        self._cache = {}
+
+    def observe_request(self, blueprint, method, status, metrics, elapsed, cache_result=None):
+        with self._lock:
+            histogram = self._latency.get(blueprint)
+            if histogram is None:
+                histogram = self._latency[blueprint] = Histogram()
+            histogram.observe(elapsed)
+
+            key = (blueprint, method, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+
+            totals = self._queries.get(blueprint)
+            if totals is None:
+                totals = self._queries[blueprint] = [0, 0.0, 0, 0.0]
+            totals[0] += metrics.queries
+            totals[1] += metrics.db_time
+            totals[2] += metrics.slow_queries
+            totals[3] += metrics.serialize_time
+
+            if cache_result is not None:
+                key = (blueprint, cache_result)
+                self._cache[key] = self._cache.get(key, 0) + 1
+
+    def render(self, caches=None):
+        """Texto no formato de exposição do Prometheus.
+
+        `caches` acrescenta caches externas ao registo, como
+        {'auth': {'hits': 10, 'misses': 2, 'entries': 5}}.
+        """
+        with self._lock:
+            latency = {blueprint: (list(h.counts), h.sum, h.count) for blueprint, h in self._latency.items()}
+            requests = dict(self._requests)
+            queries = {blueprint: list(totals) for blueprint, totals in self._queries.items()}
+            cache = dict(self._cache)
+
+        lines = []
+
+        def header(name, kind, description):
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        header('tribunal_http_request_duration_seconds', 'histogram', 'Duração dos pedidos HTTP por blueprint')
+        for blueprint, (counts, total, count) in sorted(latency.items()):
+            cumulative = 0
+            for bound, n in zip((*LATENCY_BUCKETS, '+Inf'), counts):
+                cumulative += n
+                lines.append(
+                    f'tribunal_http_request_duration_seconds_bucket{{blueprint="{blueprint}",le="{bound}"}} {cumulative}'
+                )
+            lines.append(f'tribunal_http_request_duration_seconds_sum{{blueprint="{blueprint}"}} {total:.6f}')
+            lines.append(f'tribunal_http_request_duration_seconds_count{{blueprint="{blueprint}"}} {count}')
+
+        header('tribunal_http_requests_total', 'counter', 'Pedidos HTTP por blueprint, método e estado')
+        for (blueprint, method, status), count in sorted(requests.items()):
+            lines.append(
+                f'tribunal_http_requests_total{{blueprint="{blueprint}",method="{method}",status="{status}"}} {count}'
+            )
+
+        for index, (name, kind, description) in enumerate((
+            ('tribunal_db_queries_total', 'counter', 'Consultas SQL por blueprint'),
+            ('tribunal_db_query_seconds_total', 'counter', 'Tempo total das consultas SQL por blueprint'),
+            ('tribunal_db_slow_queries_total', 'counter', 'Consultas acima de SLOW_QUERY_MS por blueprint'),
+            ('tribunal_serialize_seconds_total', 'counter', 'Tempo de serialização JSON por blueprint'),
+        )):
+            header(name, kind, description)
+            for blueprint, totals in sorted(queries.items()):
+                value = totals[index]
+                value = f'{value:.6f}' if isinstance(value, float) else value
+                lines.append(f'{name}{{blueprint="{blueprint}"}} {value}')
+
+        # Cache de respostas (cabeçalho X-Cache) por blueprint e caches externas
+        hit_counts = {}
+        header('tribunal_cache_requests_total', 'counter', 'Consultas às caches por resultado (hit/miss)')
+        for (blueprint, result), count in sorted(cache.items()):
+            lines.append(f'tribunal_cache_requests_total{{cache="response",blueprint="{blueprint}",result="{result}"}} {count}')
+            totals = hit_counts.setdefault('response', [0, 0])
+            totals[result != 'hit'] += count
+        for name, stats in sorted((caches or {}).items()):
+            lines.append(f'tribunal_cache_requests_total{{cache="{name}",result="hit"}} {stats["hits"]}')
+            lines.append(f'tribunal_cache_requests_total{{cache="{name}",result="miss"}} {stats["misses"]}')
+            hit_counts[name] = [stats['hits'], stats['misses']]
+
+        header('tribunal_cache_hit_ratio', 'gauge', 'Fração de acertos desde o arranque do processo')
+        for name, (hits, misses) in sorted(hit_counts.items()):
+            ratio = hits / (hits + misses) if hits + misses else 0.0
+            lines.append(f'tribunal_cache_hit_ratio{{cache="{name}"}} {ratio:.4f}')
+
+        header('tribunal_cache_entries', 'gauge', 'Entradas em memória por cache')
+        for name, stats in sorted((caches or {}).items()):
+            if 'entries' in stats:
+                lines.append(f'tribunal_cache_entries{{cache="{name}"}} {stats["entries"]}')
+
+        return '\n'.join(lines) + '\n'
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACE_RE = re.compile(r'\s+')
+
+@lru_cache(maxsize=256)
+def normalize_sql(statement):
+    """SQL sem valores literais nem espaços repetidos (agrupável no log)"""
+    statement = _STRING_RE.sub('?', statement)
+    statement = _NUMBER_RE.sub('?', statement)
+    statement = _IN_LIST_RE.sub('(?, ...)', statement)
+    return _SPACE_RE.sub(' ', statement).strip()
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info[_QUERY_START] = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    metrics = _current.get()
+    start = conn.info.pop(_QUERY_START, None)
+    if metrics is None or start is None:
+        return
+
+    elapsed = time.perf_counter() - start
+    metrics.queries += 1
+    metrics.db_time += elapsed
+    if elapsed >= metrics.slow_query:
+        metrics.slow_queries += 1
+        rule = metrics.request.url_rule
+        logger.warning(
+            'Consulta lenta (%.1f ms) em %s %s: %s',
+            elapsed * 1000, metrics.request.method, rule.rule if rule is not None else metrics.request.path,
+            normalize_sql(statement)
+        )
+
+@contextmanager
+def timed_serialization():
+    """Somar o tempo do bloco à serialização do pedido atual"""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serialize_time += time.perf_counter() - start
+
+def _start_request():
+    app = current_app._get_current_object()
+    _current.set(RequestMetrics(
+        app.extensions['metrics'], request._get_current_object(), app.config['SLOW_QUERY_MS'] / 1000
+    ))
+
+def _observe(metrics, response):
+    req = metrics.request
+    cache_result = response.headers.get('X-Cache')
+    metrics.registry.observe_request(
+        req.blueprint or APP_LABEL,
+        req.method,
+        response.status_code,
+        metrics,
+        time.perf_counter() - metrics.start,
+        cache_result.lower() if cache_result else None,
+    )
+
+def _finish_request(response):
+    metrics = _current.get()
+    if metrics is None:
+        return response
+
+    elapsed = time.perf_counter() - metrics.start
+    queries = f'{metrics.queries} consulta' if metrics.queries == 1 else f'{metrics.queries} consultas'
+    server_timing = (
+        f'db;dur={metrics.db_time * 1000:.2f};desc="{queries}", '
+        f'serialize;dur={metrics.serialize_time * 1000:.2f}, '
+        f'total;dur={elapsed * 1000:.2f}'
+    )
+
+    if response.is_streamed:
+        # O corpo (consultas e codificação das linhas) só é gerado durante o
+        # envio: o cabeçalho leva apenas o trabalho feito até aqui, marcado
+        # com `stream`, e o registo recebe os totais no fim do envio.
+        response.headers['Server-Timing'] = f'{server_timing}, stream;desc="valores até ao início do corpo"'
+        response.call_on_close(lambda: _observe(metrics, response))
+        return response
+
+    response.headers['Server-Timing'] = server_timing
+    _observe(metrics, response)
+    return response
+
+def _clear_request(exc):
+    _current.set(None)
+
+def init_metrics(app):
+    """Ativar as métricas por pedido (METRICS_ENABLED)"""
+    app.config.setdefault('SLOW_QUERY_MS', SLOW_QUERY_MS)
+    if not app.config.setdefault('METRICS_ENABLED', True):
+        app.extensions['metrics'] = None
+        return
+
+    app.extensions['metrics'] = MetricsRegistry()
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_clear_request)
+
+def get_metrics():
+    return current_app.extensions.get('metrics')
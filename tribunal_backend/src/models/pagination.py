@@ -0,0 +1,145 @@
+import base64
+import json
+import time
+from datetime import datetime
+from sqlalchemy import or_
+
+# Paginação por cursor (keyset): em vez de OFFSET, a página seguinte começa
+# imediatamente depois da última chave devolvida, pelo que a página 5000 custa
+# o mesmo que a página 1 (desde que exista um índice sobre as colunas da chave).
+
+TOTAL_MODES = ('exact', 'estimate', 'cached', 'none')
+
+# Limite de linhas contadas no modo "estimate"
+ESTIMATE_LIMIT = 10000
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(*values):
+    """Cursor opaco (base64 url-safe) a partir dos valores da chave"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """Descodificar um cursor com `size` valores (o primeiro é uma data)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(payload, list) or len(payload) != size:
+            raise ValueError
+        if payload[0] is not None:
+            payload[0] = datetime.fromisoformat(payload[0])
+        return payload
+    except (ValueError, TypeError, UnicodeError):
+        raise InvalidCursor('Cursor inválido')
+
+
+def keyset_rows(query, date_column, id_column, after, limit, descending=True):
+    """Até `limit` linhas depois da chave `after` = (data, id), ou desde o início.
+
+    A condição (data <= X AND (data < X OR id < Y)) permite ao SQLite procurar
+    diretamente no índice (data, id). Os NULL (últimos em DESC, primeiros em ASC,
+    como no SQLite) são lidos numa segunda consulta quando o intervalo acaba.
+    """
+    if descending:
+        order = (date_column.desc(), id_column.desc())
+    else:
+        order = (date_column.asc(), id_column.asc())
+
+    if after is None:
+        return query.order_by(*order).limit(limit).all()
+
+    last_date, last_id = after
+    nulls = query.filter(date_column.is_(None))
+
+    if descending:
+        if last_date is None:
+            return nulls.filter(id_column < last_id).order_by(id_column.desc()).limit(limit).all()
+
+        rows = query.filter(
+            date_column <= last_date,
+            or_(date_column < last_date, id_column < last_id)
+        ).order_by(*order).limit(limit).all()
+        if len(rows) < limit:
+            rows += nulls.order_by(id_column.desc()).limit(limit - len(rows)).all()
+        return rows
+
+    if last_date is None:
+        rows = nulls.filter(id_column > last_id).order_by(id_column.asc()).limit(limit).all()
+        if len(rows) < limit:
+            rows += query.filter(date_column.isnot(None)).order_by(*order).limit(limit - len(rows)).all()
+        return rows
+
+    return query.filter(
+        date_column >= last_date,
+        or_(date_column > last_date, id_column > last_id)
+    ).order_by(*order).limit(limit).all()
+
+
+class PageRows:
+    """Até `limit` linhas de uma query que pede `limit + 1`, lidas em lotes.
+
+    Depois de percorrida, `has_next` indica se existia a linha adicional (uma
+    página seguinte), sem carregar a página inteira numa lista.
+    """
+
+    def __init__(self, query, limit, batch_size=500):
+        self.query = query
+        self.limit = limit
+        self.batch_size = batch_size
+        self.has_next = False
+
+    def __iter__(self):
+        for index, row in enumerate(self.query.yield_per(self.batch_size)):
+            if index == self.limit:
+                self.has_next = True
+                break
+            yield row
+
+
+class CountCache:
+    """Cache em memória de contagens exatas, com TTL e tamanho limitado"""
+
+    def __init__(self, ttl=60, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+
+    def get_or_count(self, key, query):
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry and entry[0] > now:
+            return entry[1]
+
+        total = query.order_by(None).count()
+
+        if len(self._entries) >= self.max_entries:
+            self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+        self._entries[key] = (now + self.ttl, total)
+        return total
+
+
+def count_total(query, mode, cache=None, cache_key=None):
+    """Total de resultados segundo o modo pedido.
+
+    Devolve (total, is_estimate). No modo "estimate" a contagem pára em
+    ESTIMATE_LIMIT linhas; no modo "none" o total é None.
+    """
+    if mode == 'none':
+        return None, False
+
+    if mode == 'estimate':
+        capped = query.order_by(None).limit(ESTIMATE_LIMIT + 1).count()
+        return min(capped, ESTIMATE_LIMIT), capped > ESTIMATE_LIMIT
+
+    if mode == 'cached' and cache is not None:
+        return cache.get_or_count(cache_key, query), False
+
+    return query.order_by(None).count(), False
@@ -0,0 +1,231 @@
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Hashing de passwords fora da thread do pedido.
+#
+# O scrypt/pbkdf2 ocupa o CPU (e o GIL) durante dezenas de milissegundos por
+# chamada; num pico de logins isso atrasa todos os outros pedidos do mesmo
+# worker. Os hashes são calculados num conjunto de processos dedicado, com um
+# limite de pedidos pendentes: acima dele o pedido é recusado de imediato
+# (PasswordHasherBusy -> 503 com Retry-After) em vez de ficar em fila.
+
+DEFAULT_METHOD = 'scrypt'
+DEFAULT_TIMEOUT = 30
+
+# Passwords por tarefa enviada aos processos em hash_many
+HASH_MANY_CHUNK = 8
+
+# Os processos só são criados no primeiro hash, ou em start() chamado num hook
+# do servidor (arranque ASGI, post_fork do gunicorn): comandos da CLI, scripts
+# e testes que importam a aplicação não os arrancam. Sem outras threads são
+# criados por fork (sem voltar a executar o __main__ da aplicação); com threads
+# de pedidos já ativas (primeiro login, conjunto recriado após uma avaria) um
+# fork poderia copiar locks ocupados, pelo que são criados a partir do
+# forkserver (ou por spawn, onde não existe).
+_START_METHODS = multiprocessing.get_all_start_methods()
+
+def _mp_context():
+    if threading.active_count() == 1 and 'fork' in _START_METHODS:
+        return multiprocessing.get_context('fork')
+    if 'forkserver' in _START_METHODS:
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+class PasswordHasherBusy(Exception):
+    """Fila de hashing cheia (ou sem resposta dentro do tempo limite)"""
+
+@lru_cache(maxsize=None)
+def _canonical_method(method):
+    # Parâmetros completos tal como ficam guardados no hash (ex.: "scrypt:32768:8:1")
+    return generate_password_hash('', method).split('$', 1)[0]
+
+def _hash(password, method):
+    return generate_password_hash(password, method)
+
+def _hash_chunk(passwords, method):
+    return [generate_password_hash(password, method) for password in passwords]
+
+def _verify(pwhash, password, method):
+    """(password correta, novo hash se os parâmetros configurados mudaram)"""
+    if not check_password_hash(pwhash, password):
+        return False, None
+    if pwhash.split('$', 1)[0] != _canonical_method(method):
+        return True, generate_password_hash(password, method)
+    return True, None
+
+class PasswordHasher:
+    """Conjunto de processos para hashing, com fila limitada.
+
+    Com `workers=0` o hashing é feito na própria thread (sem processos).
+    """
+
+    def __init__(self, method=DEFAULT_METHOD, workers=0, max_pending=None, timeout=DEFAULT_TIMEOUT):
+        self.method = method
+        self.workers = workers
+        self.max_pending = max_pending or max(workers * 4, 1)
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Criado no primeiro uso e de novo no processo de cada worker do gunicorn
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=_mp_context()
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def _discard_executor(self, executor):
+        """Descartar um conjunto avariado (ex.: um processo morto pelo sistema)"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, fn, *args, wait=False):
+        """(executor, future) de uma tarefa que ocupa uma vaga da fila até terminar.
+
+        Sem `wait` a fila cheia dá PasswordHasherBusy de imediato; com `wait`
+        espera por uma vaga até ao tempo limite.
+        """
+        # Com o conjunto avariado (BrokenProcessPool) é criado outro e o envio
+        # repetido uma vez, em vez de falharem todos os seguintes
+        for attempt in range(2):
+            acquired = self._slots.acquire(timeout=self.timeout) if wait else self._slots.acquire(blocking=False)
+            if not acquired:
+                raise PasswordHasherBusy()
+
+            executor = self._get_executor()
+            try:
+                future = executor.submit(fn, *args)
+            except BrokenProcessPool:
+                self._slots.release()
+                self._discard_executor(executor)
+                if attempt:
+                    raise
+                continue
+            except Exception:
+                self._slots.release()
+                raise
+
+            # A vaga só é libertada quando o processo termina, mesmo após timeout
+            future.add_done_callback(lambda _: self._slots.release())
+            return executor, future
+
+    def _result(self, executor, future):
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise PasswordHasherBusy()
+        except BrokenProcessPool:
+            self._discard_executor(executor)
+            raise
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+
+        # Tarefa repetida uma vez se o conjunto avariar durante a execução
+        for attempt in range(2):
+            try:
+                return self._result(*self._submit(fn, *args))
+            except BrokenProcessPool:
+                if attempt:
+                    raise
+
+    def start(self):
+        """Arrancar já os processos, num hook do servidor (por omissão são criados no primeiro hash)"""
+        if self.workers:
+            self._get_executor().submit(_canonical_method, self.method).result()
+
+    def hash(self, password):
+        return self._run(_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        return self._run(_verify, pwhash, password, self.method)
+
+    def hash_many(self, passwords):
+        """Hashes de muitas passwords (importações), usando todos os processos.
+
+        O trabalho é enviado em tarefas de HASH_MANY_CHUNK passwords, cada uma
+        com uma vaga da fila, e nunca mais de `workers` ao mesmo tempo: as
+        restantes vagas ficam para os logins, que esperam no máximo uma tarefa
+        por processo, e a fila limitada (503) continua a valer.
+        """
+        passwords = list(passwords)
+        if not self.workers:
+            return [_hash(password, self.method) for password in passwords]
+
+        chunks = [passwords[start:start + HASH_MANY_CHUNK] for start in range(0, len(passwords), HASH_MANY_CHUNK)]
+        hashes = []
+        pending = deque()
+
+        def collect():
+            chunk, retried, (executor, future) = pending.popleft()
+            try:
+                hashes.extend(self._result(executor, future))
+            except BrokenProcessPool:
+                if retried:
+                    raise
+                # Conjunto avariado: o lote é repetido uma vez, num conjunto novo
+                pending.appendleft((chunk, True, self._submit(_hash_chunk, chunk, self.method, wait=True)))
+                collect()
+
+        for chunk in chunks:
+            if len(pending) >= self.workers:
+                collect()
+            pending.append((chunk, False, self._submit(_hash_chunk, chunk, self.method, wait=True)))
+        while pending:
+            collect()
+        return hashes
+
+    def shutdown(self, wait=False):
+        """Terminar os processos; com `wait` só retorna depois de terminarem"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait, cancel_futures=True)
+                self._executor = None
+
+def create_password_hasher(app):
+    """Hasher configurado em PASSWORD_HASH_METHOD, PASSWORD_HASH_WORKERS e PASSWORD_HASH_MAX_PENDING"""
+    return PasswordHasher(
+        method=app.config.get('PASSWORD_HASH_METHOD') or DEFAULT_METHOD,
+        workers=int(app.config.get('PASSWORD_HASH_WORKERS') or 0),
+        max_pending=app.config.get('PASSWORD_HASH_MAX_PENDING'),
+        timeout=app.config.get('PASSWORD_HASH_TIMEOUT', DEFAULT_TIMEOUT)
+    )
+
+def init_password_hasher(app):
+    """Ativar o hashing em processos dedicados na aplicação (criados no primeiro uso)"""
+    app.extensions['password_hasher'] = create_password_hasher(app)
+
+def get_password_hasher():
+    hasher = current_app.extensions.get('password_hasher')
+    if hasher is None:
+        # Aplicação sem init_password_hasher: hashing na própria thread
+        hasher = create_password_hasher(current_app)
+        hasher.workers = 0
+        current_app.extensions['password_hasher'] = hasher
+    return hasher
+
+def hash_password(password):
+    return get_password_hasher().hash(password)
+
+def verify_password(pwhash, password):
+    """Verificar a password; devolve (válida, novo hash ou None)"""
+    return get_password_hasher().verify(pwhash, password)
+
+def hash_passwords(passwords):
+    return get_password_hasher().hash_many(passwords)
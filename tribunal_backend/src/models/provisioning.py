@@ -0,0 +1,164 @@
+import csv
+import io
+import json
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from src.models.user import db, User
+from src.models.cache import bump_versions
+from src.models.passwords import hash_passwords
+
+# Registo de utilizadores em massa (ex.: advogados de uma ordem, funcionários
+# de um tribunal). A unicidade é verificada por conjunto numa só consulta, as
+# passwords são processadas em paralelo nos processos de hashing e as linhas
+# inseridas em lotes (executemany) numa única transação.
+
+USER_ROLES = ('citizen', 'lawyer', 'judge', 'admin')
+
+IMPORT_FORMATS = ('csv', 'json')
+
+# Linhas por consulta de unicidade: dois parâmetros por linha, abaixo do
+# limite de 32766 parâmetros do SQLite
+UNIQUENESS_BATCH = 10000
+
+# Linhas por lote de INSERT
+INSERT_BATCH = 1000
+
+def parse_users(data, import_format):
+    """Linhas de um ficheiro CSV (com cabeçalho) ou JSON (lista de objetos)"""
+    if import_format == 'csv':
+        if isinstance(data, bytes):
+            data = data.decode('utf-8-sig')
+        return list(csv.DictReader(io.StringIO(data)))
+
+    if import_format == 'json':
+        rows = json.loads(data) if isinstance(data, (str, bytes)) else data
+        if isinstance(rows, dict):
+            rows = rows.get('users')
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise ValueError('JSON inválido: esperada uma lista de utilizadores')
+        return rows
+
+    raise ValueError(f'Formato de importação desconhecido: {import_format}')
+
+def _clean(row):
+    """(valores normalizados, erro ou None) de uma linha"""
+    values = {
+        'username': str(row.get('username') or '').strip(),
+        'email': str(row.get('email') or '').strip(),
+        'password': str(row.get('password') or ''),
+        'role': str(row.get('role') or 'citizen').strip(),
+    }
+
+    missing = [name for name in ('username', 'email', 'password') if not values[name]]
+    if missing:
+        return values, f'Dados em falta ({", ".join(missing)})'
+    if '@' not in values['email']:
+        return values, 'Email inválido'
+    if values['role'] not in USER_ROLES:
+        return values, f'Perfil inválido: {values["role"]}'
+    return values, None
+
+def _existing(rows):
+    """Nomes de utilizador e emails já registados, por conjunto"""
+    usernames = set()
+    emails = set()
+    for start in range(0, len(rows), UNIQUENESS_BATCH):
+        batch = rows[start:start + UNIQUENESS_BATCH]
+        result = db.session.execute(
+            db.select(User.username, User.email).where(db.or_(
+                User.username.in_([row['username'] for row in batch]),
+                User.email.in_([row['email'] for row in batch])
+            ))
+        )
+        for username, email in result:
+            usernames.add(username)
+            emails.add(email)
+    return usernames, emails
+
+def bulk_register(rows, dry_run=False):
+    """Registar utilizadores em massa; devolve o resultado de cada linha.
+
+    Com `dry_run` apenas valida (sem hashing nem inserções).
+    """
+    results = []
+    pending = []
+    seen_usernames = set()
+    seen_emails = set()
+
+    for number, row in enumerate(rows, start=1):
+        values, error = _clean(row)
+        result = {'row': number, 'username': values['username'], 'email': values['email']}
+        results.append(result)
+
+        if error is None and values['username'] in seen_usernames:
+            error = 'Nome de utilizador repetido na importação'
+        if error is None and values['email'] in seen_emails:
+            error = 'Email repetido na importação'
+
+        if error:
+            result.update(status='error', error=error)
+            continue
+
+        seen_usernames.add(values['username'])
+        seen_emails.add(values['email'])
+        pending.append((result, values))
+
+    usernames, emails = _existing([values for _, values in pending])
+    valid = []
+    for result, values in pending:
+        if values['username'] in usernames:
+            result.update(status='error', error='Nome de utilizador já existe')
+        elif values['email'] in emails:
+            result.update(status='error', error='Email já registado')
+        else:
+            valid.append((result, values))
+
+    if dry_run:
+        for result, _ in valid:
+            result['status'] = 'valid'
+        return results
+
+    hashes = hash_passwords([values['password'] for _, values in valid])
+    statement = insert(User).returning(User.id, sort_by_parameter_order=True)
+
+    try:
+        for start in range(0, len(valid), INSERT_BATCH):
+            batch = valid[start:start + INSERT_BATCH]
+            ids = db.session.execute(statement, [
+                {
+                    'username': values['username'],
+                    'email': values['email'],
+                    'password_hash': password_hash,
+                    'role': values['role'],
+                }
+                for (_, values), password_hash in zip(batch, hashes[start:start + INSERT_BATCH])
+            ]).scalars().all()
+
+            for (result, _), user_id in zip(batch, ids):
+                result.update(status='created', id=user_id)
+
+        db.session.commit()
+
+    except IntegrityError:
+        # Registo concorrente entre a verificação e a inserção: nada é gravado
+        db.session.rollback()
+        for result, _ in valid:
+            result.pop('id', None)
+            result.update(status='error', error='Conflito com um registo concorrente, repita a importação')
+        return results
+
+    # Inserções com Core não passam pela sessão do ORM: invalidar a cache aqui
+    if valid:
+        bump_versions('user')
+
+    return results
+
+def summarize_results(results):
+    created = sum(1 for result in results if result['status'] == 'created')
+    valid = sum(1 for result in results if result['status'] == 'valid')
+    return {
+        'total': len(results),
+        'created': created,
+        'valid': valid,
+        'failed': len(results) - created - valid,
+    }
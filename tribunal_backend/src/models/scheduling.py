@@ -0,0 +1,128 @@
+import heapq
+from datetime import timedelta
+from itertools import groupby
+from src.models.user import db, Hearing
+
+# Deteção de conflitos de agendamento: duas audiências ativas na mesma sala,
+# ou com o mesmo juiz, cujos intervalos [início, início + duração) se sobrepõem.
+#
+# Cada verificação é uma procura por intervalo nos índices (sala, data) e
+# (juiz, data), limitada a MAX_DURATION_MINUTES antes do início proposto: o
+# custo não depende do número de audiências e não há estado por worker.
+
+DEFAULT_DURATION_MINUTES = 60
+
+# Duração máxima de uma audiência. Limita o intervalo procurado no índice
+# (sala/juiz, data).
+MAX_DURATION_MINUTES = 12 * 60
+
+# Audiências que não ocupam a sala nem o juiz
+INACTIVE_STATUSES = ('cancelled', 'postponed')
+
+RESOURCES = {
+    'courtroom': Hearing.courtroom,
+    'judge': Hearing.judge_id,
+}
+
+def hearing_end(start, duration_minutes):
+    return start + timedelta(minutes=duration_minutes or DEFAULT_DURATION_MINUTES)
+
+def validate_duration(duration_minutes):
+    if duration_minutes is None:
+        return DEFAULT_DURATION_MINUTES
+    duration_minutes = int(duration_minutes)
+    if not 0 < duration_minutes <= MAX_DURATION_MINUTES:
+        raise ValueError(f'Duração inválida (1 a {MAX_DURATION_MINUTES} minutos)')
+    return duration_minutes
+
+def _active_hearings():
+    return db.select(
+        Hearing.id, Hearing.case_id, Hearing.courtroom, Hearing.judge_id,
+        Hearing.hearing_date, Hearing.duration_minutes
+    ).where(db.or_(Hearing.status.is_(None), Hearing.status.notin_(INACTIVE_STATUSES)))
+
+def _query_overlapping(resource, value, start, end):
+    """Audiências de `resource` = `value` que se sobrepõem a [start, end)"""
+    lower = start - timedelta(minutes=MAX_DURATION_MINUTES)
+    rows = db.session.execute(
+        _active_hearings().where(
+            RESOURCES[resource] == value,
+            Hearing.hearing_date > lower,
+            Hearing.hearing_date < end
+        )
+    ).all()
+    items = [
+        (row.hearing_date, hearing_end(row.hearing_date, row.duration_minutes), row.id, row.case_id)
+        for row in rows
+    ]
+    return [item for item in items if item[1] > start]
+
+def check_slot(start, duration_minutes, courtroom=None, judge_id=None, exclude_id=None):
+    """Conflitos de um horário proposto com as audiências existentes"""
+    end = hearing_end(start, duration_minutes)
+    conflicts = []
+
+    for resource, value in (('courtroom', courtroom), ('judge', judge_id)):
+        if value in (None, ''):
+            continue
+
+        for item_start, item_end, hearing_id, case_id in _query_overlapping(resource, value, start, end):
+            if hearing_id == exclude_id:
+                continue
+            conflicts.append({
+                'type': resource,
+                'resource': value,
+                'hearing_id': hearing_id,
+                'case_id': case_id,
+                'hearing_date': item_start,
+                'end': item_end,
+                'overlap_start': max(start, item_start),
+                'overlap_end': min(end, item_end)
+            })
+
+    return conflicts
+
+def _sweep(rows):
+    """Pares sobrepostos num grupo já ordenado por início (varrimento).
+
+    Um min-heap guarda os fins das audiências em curso: O(n log n + k) para n
+    audiências e k conflitos.
+    """
+    active = []
+    for row in rows:
+        while active and active[0][0] <= row.hearing_date:
+            heapq.heappop(active)
+        for _, _, other in active:
+            yield other, row
+        heapq.heappush(active, (hearing_end(row.hearing_date, row.duration_minutes), row.id, row))
+
+def audit(date_from=None, date_to=None):
+    """Todos os conflitos por sala e por juiz, opcionalmente num intervalo de datas"""
+    conflicts = []
+
+    for resource, column in RESOURCES.items():
+        query = _active_hearings().where(column.isnot(None))
+        if date_from is not None:
+            query = query.where(Hearing.hearing_date >= date_from - timedelta(minutes=MAX_DURATION_MINUTES))
+        if date_to is not None:
+            query = query.where(Hearing.hearing_date <= date_to)
+
+        # A ordenação (recurso, data) é servida pelo índice correspondente
+        rows = db.session.execute(query.order_by(column, Hearing.hearing_date, Hearing.id))
+
+        for value, group in groupby(rows, key=lambda row: getattr(row, column.key)):
+            for first, second in _sweep(group):
+                first_end = hearing_end(first.hearing_date, first.duration_minutes)
+                second_end = hearing_end(second.hearing_date, second.duration_minutes)
+                if date_from is not None and min(first_end, second_end) <= date_from:
+                    continue
+
+                conflicts.append({
+                    'type': resource,
+                    'resource': value,
+                    'hearings': [first.id, second.id],
+                    'overlap_start': max(first.hearing_date, second.hearing_date),
+                    'overlap_end': min(first_end, second_end)
+                })
+
+    return conflicts
@@ -0,0 +1,147 @@
+import re
+from sqlalchemy import text, table, column, literal_column, func, select
+from src.models.user import db
+
+# Índice de texto integral (SQLite FTS5) sobre os processos.
+# A tabela virtual usa a tabela "case" como conteúdo externo e é mantida
+# sincronizada por triggers, pelo que qualquer escrita (ORM ou Core) atualiza
+# o índice na mesma transação.
+CASE_FTS_TABLE = 'case_fts'
+CASE_FTS_COLUMNS = ('case_number', 'title', 'plaintiff', 'defendant', 'description')
+
+# Pesos bm25 por coluna (mesma ordem de CASE_FTS_COLUMNS)
+CASE_FTS_WEIGHTS = (10.0, 5.0, 3.0, 3.0, 1.0)
+
+case_fts = table(CASE_FTS_TABLE, column('rowid'), *[column(name) for name in CASE_FTS_COLUMNS])
+
+_COLUMN_LIST = ', '.join(CASE_FTS_COLUMNS)
+_NEW_VALUES = ', '.join(f'new.{name}' for name in CASE_FTS_COLUMNS)
+_OLD_VALUES = ', '.join(f'old.{name}' for name in CASE_FTS_COLUMNS)
+
+CASE_FTS_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {CASE_FTS_TABLE} USING fts5(
+        {_COLUMN_LIST},
+        content='case',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {CASE_FTS_TABLE}_ai AFTER INSERT ON "case" BEGIN
+        INSERT INTO {CASE_FTS_TABLE}(rowid, {_COLUMN_LIST})
+        VALUES (new.id, {_NEW_VALUES});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {CASE_FTS_TABLE}_ad AFTER DELETE ON "case" BEGIN
+        INSERT INTO {CASE_FTS_TABLE}({CASE_FTS_TABLE}, rowid, {_COLUMN_LIST})
+        VALUES ('delete', old.id, {_OLD_VALUES});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {CASE_FTS_TABLE}_au AFTER UPDATE OF {_COLUMN_LIST} ON "case" BEGIN
+        INSERT INTO {CASE_FTS_TABLE}({CASE_FTS_TABLE}, rowid, {_COLUMN_LIST})
+        VALUES ('delete', old.id, {_OLD_VALUES});
+        INSERT INTO {CASE_FTS_TABLE}(rowid, {_COLUMN_LIST})
+        VALUES (new.id, {_NEW_VALUES});
+    END
+    """,
+]
+
+CASE_FTS_TRIGGERS = [f'{CASE_FTS_TABLE}_{suffix}' for suffix in ('ai', 'ad', 'au')]
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def init_case_search(app):
+    """Criar o índice de texto integral (se necessário) e ativá-lo na aplicação.
+
+    Em bases de dados que não sejam SQLite, ou sem suporte FTS5, a pesquisa
+    continua a usar ILIKE.
+    """
+    app.config['CASE_FTS_ENABLED'] = False
+
+    if db.engine.dialect.name != 'sqlite':
+        return False
+
+    with db.engine.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': CASE_FTS_TABLE}
+        ).first() is not None
+
+        try:
+            for statement in CASE_FTS_DDL:
+                conn.exec_driver_sql(statement)
+        except Exception as e:
+            app.logger.warning('Índice FTS5 indisponível, a usar ILIKE: %s', e)
+            return False
+
+        # Base de dados existente: indexar os processos já registados
+        if not exists:
+            conn.exec_driver_sql(f"INSERT INTO {CASE_FTS_TABLE}({CASE_FTS_TABLE}) VALUES ('rebuild')")
+
+    app.config['CASE_FTS_ENABLED'] = True
+    return True
+
+
+def rebuild_case_search():
+    """Reconstruir o índice de texto integral a partir da tabela de processos"""
+    with db.engine.begin() as conn:
+        for statement in CASE_FTS_DDL:
+            conn.exec_driver_sql(statement)
+        conn.exec_driver_sql(f"INSERT INTO {CASE_FTS_TABLE}({CASE_FTS_TABLE}) VALUES ('rebuild')")
+        conn.exec_driver_sql(f"INSERT INTO {CASE_FTS_TABLE}({CASE_FTS_TABLE}) VALUES ('optimize')")
+        return conn.execute(text(f'SELECT count(*) FROM {CASE_FTS_TABLE}')).scalar()
+
+
+def drop_case_search_triggers(conn):
+    """Suspender a sincronização do índice (cargas em massa); repor com rebuild_case_search()"""
+    for name in CASE_FTS_TRIGGERS:
+        conn.exec_driver_sql(f'DROP TRIGGER IF EXISTS {name}')
+
+
+def fts_tokens(value):
+    """Extrair os termos pesquisáveis de um texto livre"""
+    return _TOKEN_RE.findall(value or '')
+
+
+def fts_phrase(value, columns=None):
+    """Expressão FTS5 para uma frase com prefixo no último termo.
+
+    Aproxima o ILIKE '%valor%' ao nível dos termos: "CV/00" encontra
+    "2024/CV/001", mas "024/CV" (a meio de um termo) não.
+    """
+    tokens = fts_tokens(value)
+    if not tokens:
+        return None
+
+    expression = '"' + ' '.join(tokens) + '" *'
+    if columns:
+        expression = '{' + ' '.join(columns) + '} : ' + expression
+    return expression
+
+
+def fts_all_terms(value):
+    """Expressão FTS5 que exige todos os termos (com prefixo) em qualquer coluna"""
+    tokens = fts_tokens(value)
+    if not tokens:
+        return None
+    return ' AND '.join(f'"{token}" *' for token in tokens)
+
+
+def case_fts_subquery(expressions):
+    """Subquery (rowid, rank) dos processos que satisfazem todas as expressões"""
+    match = ' AND '.join(f'({expression})' for expression in expressions)
+    fts = literal_column(CASE_FTS_TABLE)
+    return (
+        select(
+            case_fts.c.rowid.label('case_id'),
+            func.bm25(fts, *CASE_FTS_WEIGHTS).label('rank')
+        )
+        .select_from(case_fts)
+        .where(fts.op('MATCH')(match))
+        .subquery()
+    )
@@ -0,0 +1,140 @@
+from datetime import date, time
+from flask import current_app, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from src.models.metrics import timed_serialization
+
+try:
+    import orjson
+except ImportError:  # opcional: sem orjson usa-se o módulo json da biblioteca padrão
+    orjson = None
+
+# Codificação JSON das respostas.
+#
+# O JSONProvider da aplicação usa o orjson quando está instalado (várias vezes
+# mais rápido e sem a string intermédia: produz diretamente os bytes da
+# resposta) e o json da biblioteca padrão caso contrário. Em ambos, datas e
+# horas saem em ISO 8601, pelo que os to_dict() devolvem os próprios objetos
+# datetime em vez de chamarem isoformat().
+#
+# Listas grandes (mais de JSON_STREAM_MIN_ROWS linhas) são emitidas em
+# streaming por json_list_response(): as linhas são codificadas em lotes à
+# medida que são lidas, sem a lista de dicionários nem o corpo completo em
+# memória.
+
+JSON_ENCODERS = ('auto', 'orjson', 'stdlib')
+
+# Listas com mais linhas do que isto são enviadas em streaming
+STREAM_MIN_ROWS = 100
+
+# Itens codificados de cada vez
+STREAM_BATCH_ROWS = 100
+
+# Tamanho aproximado (bytes) de cada bloco enviado ao cliente
+STREAM_CHUNK_SIZE = 64 * 1024
+
+def _default(value):
+    """Tipos sem representação JSON: datas em ISO 8601, os restantes como no Flask"""
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    return DefaultJSONProvider.default(value)
+
+class JSONProvider(DefaultJSONProvider):
+    """JSONProvider com orjson (se disponível) e datas em ISO 8601 (JSON_ENCODER)"""
+
+    default = staticmethod(_default)
+
+    def __init__(self, app):
+        super().__init__(app)
+        encoder = app.config.get('JSON_ENCODER', 'auto')
+        if encoder not in JSON_ENCODERS:
+            raise ValueError(f'JSON_ENCODER inválido (opções: {", ".join(JSON_ENCODERS)})')
+        if encoder == 'orjson' and orjson is None:
+            raise ValueError('JSON_ENCODER=orjson mas o orjson não está instalado')
+        self.encoder = 'stdlib' if encoder == 'stdlib' or orjson is None else 'orjson'
+
+    def dumps_bytes(self, obj, indent=False):
+        """JSON compacto (ou indentado) em UTF-8"""
+        if self.encoder == 'orjson':
+            option = orjson.OPT_NON_STR_KEYS
+            if self.sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            if indent:
+                option |= orjson.OPT_INDENT_2
+            return orjson.dumps(obj, default=self.default, option=option)
+
+        separators = {'indent': 2} if indent else {'separators': (',', ':')}
+        return super().dumps(obj, **separators).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        if self.encoder == 'orjson' and not kwargs:
+            return self.dumps_bytes(obj).decode('utf-8')
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.encoder == 'orjson' and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        with timed_serialization():
+            body = self.dumps_bytes(obj, indent) + b'\n'
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+def init_json_provider(app):
+    """Usar o JSONProvider acima na aplicação"""
+    app.json = JSONProvider(app)
+
+def _json_list_chunks(provider, envelope, key, items, trailer):
+    dumps = provider.dumps_bytes
+    buffer = bytearray(dumps(envelope)[:-1])
+    if envelope:
+        buffer += b','
+    buffer += dumps(key) + b':['
+
+    # Itens codificados em lotes (uma chamada ao codificador por lote)
+    batch = []
+    separator = b''
+    for item in items:
+        batch.append(item)
+        if len(batch) < STREAM_BATCH_ROWS:
+            continue
+
+        with timed_serialization():
+            buffer += separator + dumps(batch)[1:-1]
+        separator = b','
+        batch = []
+        if len(buffer) >= STREAM_CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+
+    if batch:
+        with timed_serialization():
+            buffer += separator + dumps(batch)[1:-1]
+
+    # Chaves finais calculadas depois de percorridas as linhas
+    tail = dumps(trailer()) if trailer is not None else b'{}'
+    buffer += b']' + (b',' + tail[1:] if len(tail) > 2 else b'}') + b'\n'
+    yield bytes(buffer)
+
+def json_list_response(envelope, key, items, trailer=None, size=0):
+    """Resposta JSON {**envelope, key: [items], **trailer()}.
+
+    `trailer` é chamada depois de percorridos os itens, para valores que
+    dependem deles (ex.: has_next). Com `size` acima de JSON_STREAM_MIN_ROWS a
+    resposta é emitida em streaming: um erro a meio da lista já não pode mudar
+    o estado HTTP, e a resposta não é guardada na cache de respostas.
+    """
+    provider = current_app.json
+    if size <= current_app.config.get('JSON_STREAM_MIN_ROWS', STREAM_MIN_ROWS) or not hasattr(provider, 'dumps_bytes'):
+        result = dict(envelope)
+        result[key] = list(items)
+        if trailer is not None:
+            result.update(trailer())
+        return provider.response(result)
+
+    return current_app.response_class(
+        stream_with_context(_json_list_chunks(provider, envelope, key, items, trailer)),
+        mimetype=provider.mimetype
+    )
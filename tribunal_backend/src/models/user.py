@@ -1,7 +1,111 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import joinedload, load_only
 from datetime import datetime
+import unicodedata
+from src.models.database import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+class SerializerMixin:
+    """Forma de saída JSON declarada uma única vez por modelo.
+
+    `__fields__` mapeia o nome de cada campo para uma coluna do modelo ou para
+    um par (relação, atributo). `load_options()` devolve as opções de carregamento
+    que trazem as relações necessárias na mesma consulta (joinedload), evitando
+    uma consulta extra por linha ao chamar `to_dict()`.
+    """
+    __fields__ = {}
+
+    @classmethod
+    def parse_fields(cls, value):
+        """Converter o parâmetro `fields=a,b,c` numa lista de campos (None = todos)"""
+        if not value:
+            return None
+
+        fields = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in fields if name not in cls.__fields__]
+        if unknown:
+            raise ValueError(f"Campos desconhecidos: {', '.join(unknown)}")
+        return fields
+
+    @classmethod
+    def load_options(cls, fields=None, always=()):
+        """Opções de consulta para serializar `fields` sem consultas adicionais"""
+        selected = fields or list(cls.__fields__)
+        columns = {'id', *always}
+        relations = {}
+
+        for name in selected:
+            source = cls.__fields__[name]
+            if isinstance(source, tuple):
+                relation, attribute = source
+                relations.setdefault(relation, set()).add(attribute)
+            else:
+                columns.add(source)
+
+        mapper = db.inspect(cls)
+        for relation in relations:
+            # Colunas de chave estrangeira necessárias para a junção
+            for local_column in mapper.relationships[relation].local_columns:
+                columns.add(local_column.key)
+
+        options = [load_only(*[getattr(cls, column) for column in sorted(columns)])]
+        for relation, attributes in relations.items():
+            target = mapper.relationships[relation].mapper.class_
+            options.append(
+                joinedload(getattr(cls, relation)).load_only(
+                    *[getattr(target, attribute) for attribute in sorted(attributes)]
+                )
+            )
+        return options
+
+    def to_dict(self, fields=None):
+        data = {}
+        for name in fields or self.__fields__:
+            source = self.__fields__[name]
+            if isinstance(source, tuple):
+                relation, attribute = source
+                related = getattr(self, relation)
+                value = getattr(related, attribute) if related else None
+            else:
+                value = getattr(self, source)
+            data[name] = value
+        return data
+
+def normalize_text(value):
+    """Forma normalizada para comparação, sem acentos e em minúsculas ("João" -> "joao")"""
+    if value is None:
+        return None
+    decomposed = unicodedata.normalize('NFKD', value)
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.casefold().split())
+
+def add_missing_columns():
+    """Acrescentar às tabelas existentes as colunas declaradas depois da sua criação"""
+    with db.engine.begin() as conn:
+        # Inspeção na mesma ligação (o escritor do modo de produção tem apenas uma)
+        inspector = db.inspect(conn)
+        existing_tables = set(inspector.get_table_names())
+
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=db.engine.dialect)
+                    conn.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}')
+
+def create_missing_indexes():
+    """Criar os índices declarados nos modelos que ainda não existem.
+
+    `db.create_all()` só cria índices juntamente com tabelas novas; isto aplica
+    os índices acrescentados depois a bases de dados já existentes.
+    """
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -21,11 +125,11 @@ class User(db.Model):
             'username': self.username,
             'email': self.email,
             'role': self.role,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'created_at': self.created_at,
             'is_active': self.is_active
         }
 
-class Case(db.Model):
+class Case(SerializerMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     case_number = db.Column(db.String(50), unique=True, nullable=False)
     title = db.Column(db.String(200), nullable=False)
@@ -40,30 +144,82 @@ class Case(db.Model):
     description = db.Column(db.Text)
     is_public = db.Column(db.Boolean, default=True)
 
+    # Formas normalizadas (sem acentos, minúsculas) para pesquisa; mantidas
+    # automaticamente em cada escrita pelo ORM (ver normalize_case_names)
+    title_normalized = db.Column(db.String(200), index=True)
+    plaintiff_normalized = db.Column(db.String(200), index=True)
+    defendant_normalized = db.Column(db.String(200), index=True)
+
     judge = db.relationship('User', foreign_keys=[judge_id], backref='cases_as_judge')
     lawyer = db.relationship('User', foreign_keys=[lawyer_id], backref='cases_as_lawyer')
 
+    __table_args__ = (
+        # Ordenação e paginação por cursor da pesquisa de processos
+        db.Index('ix_case_filing_date_id', 'filing_date', 'id'),
+    )
+
+    __fields__ = {
+        'id': 'id',
+        'case_number': 'case_number',
+        'title': 'title',
+        'case_type': 'case_type',
+        'status': 'status',
+        'plaintiff': 'plaintiff',
+        'defendant': 'defendant',
+        'judge': ('judge', 'username'),
+        'lawyer': ('lawyer', 'username'),
+        'filing_date': 'filing_date',
+        'next_hearing': 'next_hearing',
+        'description': 'description',
+        'is_public': 'is_public'
+    }
+
     def __repr__(self):
         return f'<Case {self.case_number}>'
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'case_number': self.case_number,
-            'title': self.title,
-            'case_type': self.case_type,
-            'status': self.status,
-            'plaintiff': self.plaintiff,
-            'defendant': self.defendant,
-            'judge': self.judge.username if self.judge else None,
-            'lawyer': self.lawyer.username if self.lawyer else None,
-            'filing_date': self.filing_date.isoformat() if self.filing_date else None,
-            'next_hearing': self.next_hearing.isoformat() if self.next_hearing else None,
-            'description': self.description,
-            'is_public': self.is_public
-        }
+@db.event.listens_for(Case, 'before_insert')
+@db.event.listens_for(Case, 'before_update')
+def normalize_case_names(mapper, connection, target):
+    target.title_normalized = normalize_text(target.title)
+    target.plaintiff_normalized = normalize_text(target.plaintiff)
+    target.defendant_normalized = normalize_text(target.defendant)
 
-class Document(db.Model):
+def backfill_normalized_names(batch_size=1000):
+    """Preencher as colunas normalizadas de processos gravados antes da sua existência"""
+    table = Case.__table__
+    total = 0
+
+    while True:
+        rows = db.session.execute(
+            db.select(table.c.id, table.c.title, table.c.plaintiff, table.c.defendant)
+            .where(db.or_(
+                table.c.title_normalized.is_(None),
+                table.c.plaintiff_normalized.is_(None),
+                table.c.defendant_normalized.is_(None)
+            ))
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+
+        db.session.execute(
+            table.update().where(table.c.id == db.bindparam('case_id')),
+            [
+                {
+                    'case_id': row.id,
+                    'title_normalized': normalize_text(row.title) or '',
+                    'plaintiff_normalized': normalize_text(row.plaintiff) or '',
+                    'defendant_normalized': normalize_text(row.defendant) or ''
+                }
+                for row in rows
+            ]
+        )
+        db.session.commit()
+        total += len(rows)
+
+    return total
+
+class Document(SerializerMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     case_id = db.Column(db.Integer, db.ForeignKey('case.id'), nullable=False)
     title = db.Column(db.String(200), nullable=False)
@@ -72,26 +228,59 @@ class Document(db.Model):
     uploaded_by = db.Column(db.Integer, db.ForeignKey('user.id'))
     upload_date = db.Column(db.DateTime, default=datetime.utcnow)
     is_public = db.Column(db.Boolean, default=False)
+    # Conteúdo guardado por hash (ficheiros iguais partilham o mesmo blob)
+    sha256 = db.Column(db.String(64), index=True)
+    size = db.Column(db.BigInteger)
+    content_type = db.Column(db.String(100))
+    filename = db.Column(db.String(255))
 
     case = db.relationship('Case', backref='documents')
     uploader = db.relationship('User', backref='uploaded_documents')
 
+    __table_args__ = (
+        # Listagem dos documentos de um processo
+        db.Index('ix_document_case_date', 'case_id', 'upload_date'),
+    )
+
+    __fields__ = {
+        'id': 'id',
+        'case_id': 'case_id',
+        'title': 'title',
+        'document_type': 'document_type',
+        'file_path': 'file_path',
+        'uploaded_by': ('uploader', 'username'),
+        'upload_date': 'upload_date',
+        'is_public': 'is_public',
+        'sha256': 'sha256',
+        'size': 'size',
+        'content_type': 'content_type',
+        'filename': 'filename'
+    }
+
     def __repr__(self):
         return f'<Document {self.title}>'
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'case_id': self.case_id,
-            'title': self.title,
-            'document_type': self.document_type,
-            'file_path': self.file_path,
-            'uploaded_by': self.uploader.username if self.uploader else None,
-            'upload_date': self.upload_date.isoformat() if self.upload_date else None,
-            'is_public': self.is_public
-        }
+class DocumentIndexJob(db.Model):
+    """Fila persistente de indexação de texto dos documentos (ver models/indexing.py)"""
+    id = db.Column(db.Integer, primary_key=True)
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id'), nullable=False, unique=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, done, skipped, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = db.Column(db.DateTime)
+    chunks = db.Column(db.Integer)
+    last_error = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # Próximo trabalho pendente
+        db.Index('ix_document_index_job_status_run_after', 'status', 'run_after'),
+    )
+
+    def __repr__(self):
+        return f'<DocumentIndexJob {self.document_id} {self.status}>'
 
-class Hearing(db.Model):
+class Hearing(SerializerMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     case_id = db.Column(db.Integer, db.ForeignKey('case.id'), nullable=False)
     hearing_date = db.Column(db.DateTime, nullable=False)
@@ -100,26 +289,36 @@ class Hearing(db.Model):
     judge_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     status = db.Column(db.String(50), default='scheduled')  # scheduled, completed, postponed, cancelled
     notes = db.Column(db.Text)
+    duration_minutes = db.Column(db.Integer, default=60)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     case = db.relationship('Case', backref='hearings')
     judge = db.relationship('User', backref='hearings_as_judge')
 
+    __table_args__ = (
+        db.Index('ix_hearing_date_case', 'hearing_date', 'case_id'),
+        # Calendário por sala (igualdade) e deteção de conflitos por sala e por juiz;
+        # o filtro por parte do nome da sala em /hearings não usa este índice
+        db.Index('ix_hearing_courtroom_date', 'courtroom', 'hearing_date'),
+        db.Index('ix_hearing_judge_date', 'judge_id', 'hearing_date'),
+    )
+
+    __fields__ = {
+        'id': 'id',
+        'case_id': 'case_id',
+        'case_number': ('case', 'case_number'),
+        'hearing_date': 'hearing_date',
+        'duration_minutes': 'duration_minutes',
+        'hearing_type': 'hearing_type',
+        'courtroom': 'courtroom',
+        'judge': ('judge', 'username'),
+        'status': 'status',
+        'notes': 'notes'
+    }
+
     def __repr__(self):
         return f'<Hearing {self.case.case_number} - {self.hearing_date}>'
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'case_id': self.case_id,
-            'case_number': self.case.case_number if self.case else None,
-            'hearing_date': self.hearing_date.isoformat() if self.hearing_date else None,
-            'hearing_type': self.hearing_type,
-            'courtroom': self.courtroom,
-            'judge': self.judge.username if self.judge else None,
-            'status': self.status,
-            'notes': self.notes
-        }
-
 class Form(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -142,8 +341,8 @@ class Form(db.Model):
             'description': self.description,
             'file_path': self.file_path,
             'version': self.version,
-            'created_date': self.created_date.isoformat() if self.created_date else None,
-            'updated_date': self.updated_date.isoformat() if self.updated_date else None,
+            'created_date': self.created_date,
+            'updated_date': self.updated_date,
             'is_active': self.is_active
         }
 
@@ -1,12 +1,130 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from src.models.user import db, User
-from werkzeug.security import generate_password_hash, check_password_hash
+from src.models.passwords import PasswordHasherBusy, hash_password, verify_password
+from src.models.provisioning import IMPORT_FORMATS, parse_users, bulk_register, summarize_results
+from src.models.cache import get_cache_backend
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached
+from collections import OrderedDict
 import jwt
 import datetime
+import threading
+import time
 from functools import wraps
 
 auth_bp = Blueprint('auth', __name__)
 
+class AuthCache:
+    """Cache em memória de tokens já verificados e do respetivo utilizador ativo.
+
+    Cada entrada expira com o token (`exp`) ou ao fim de `ttl` segundos, o que
+    ocorrer primeiro, e é removida logo que o utilizador seja alterado. Guarda
+    também a versão da tabela de utilizadores na cache de respostas: uma
+    entrada só é usada enquanto essa versão não mudar. Com a cache partilhada
+    ('sqlite') uma alteração feita noutro worker invalida assim as entradas de
+    todos; sem ela a remoção é local e o limite é o `ttl` (AUTH_CACHE_TTL).
+    """
+
+    def __init__(self, ttl=60, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token, version=None):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None and entry[0] > now and entry[3] == version:
+                self.hits += 1
+                return entry[2]
+
+            if entry is not None:
+                del self._entries[token]
+            self.misses += 1
+            return None
+
+    def set(self, token, user, token_expires, ttl=None, version=None):
+        # Cópia desligada da sessão: partilhada entre pedidos só para leitura
+        snapshot = User(**{column.key: getattr(user, column.key) for column in User.__table__.columns})
+        make_transient_to_detached(snapshot)
+
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        if token_expires is not None:
+            expires = min(expires, token_expires)
+        with self._lock:
+            self._entries[token] = (expires, user.id, snapshot, version)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_users(self, user_ids):
+        with self._lock:
+            for token in [token for token, entry in self._entries.items() if entry[1] in user_ids]:
+                del self._entries[token]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
+
+auth_cache = AuthCache()
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_users(session, flush_context):
+    changed = {instance.id for instance in (*session.dirty, *session.deleted) if isinstance(instance, User)}
+    if changed:
+        session.info.setdefault('changed_users', set()).update(changed)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_changed_users(session):
+    changed = session.info.pop('changed_users', None)
+    if changed:
+        auth_cache.invalidate_users(changed)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changed_users(session):
+    session.info.pop('changed_users', None)
+
+def authenticate(token):
+    """Utilizador ativo de um token JWT: (utilizador, None) ou (None, mensagem de erro)"""
+    if token.startswith('Bearer '):
+        token = token[7:]
+    
+    use_cache = current_app.config.get('AUTH_CACHE_ENABLED', True)
+    version = None
+    if use_cache:
+        backend = get_cache_backend()
+        if backend is not None:
+            version = backend.get_versions(('user',))
+    snapshot = auth_cache.get(token, version) if use_cache else None
+    
+    if snapshot is not None:
+        # Sem consultas nem verificação HMAC: utilizador ligado à sessão a partir da cache
+        return db.session.merge(snapshot, load=False), None
+    
+    try:
+        data = jwt.decode(token, 'asdf#FGSgvasgf$5$WGT', algorithms=['HS256'])
+        current_user = db.session.get(User, data['user_id'])
+        
+        if not current_user or not current_user.is_active:
+            return None, 'Token inválido'
+        
+        if use_cache:
+            auth_cache.set(token, current_user, data.get('exp'), current_app.config.get('AUTH_CACHE_TTL'), version)
+            
+    except jwt.ExpiredSignatureError:
+        return None, 'Token expirado'
+    except (jwt.InvalidTokenError, KeyError, TypeError):
+        # Assinatura válida mas sem user_id (ou com um valor inválido)
+        return None, 'Token inválido'
+    
+    return current_user, None
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -15,25 +133,40 @@ def token_required(f):
         if not token:
             return jsonify({'success': False, 'error': 'Token em falta'}), 401
         
-        try:
-            if token.startswith('Bearer '):
-                token = token[7:]
-            
-            data = jwt.decode(token, 'asdf#FGSgvasgf$5$WGT', algorithms=['HS256'])
-            current_user = User.query.get(data['user_id'])
-            
-            if not current_user or not current_user.is_active:
-                return jsonify({'success': False, 'error': 'Token inválido'}), 401
-                
-        except jwt.ExpiredSignatureError:
-            return jsonify({'success': False, 'error': 'Token expirado'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'success': False, 'error': 'Token inválido'}), 401
+        current_user, error = authenticate(token)
+        if error:
+            return jsonify({'success': False, 'error': error}), 401
+        
+        return f(current_user, *args, **kwargs)
+    
+    return decorated
+
+def token_optional(f):
+    """Como token_required, mas sem token o endpoint recebe current_user=None"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        token = request.headers.get('Authorization')
+        
+        if not token:
+            return f(None, *args, **kwargs)
+        
+        current_user, error = authenticate(token)
+        if error:
+            return jsonify({'success': False, 'error': error}), 401
         
         return f(current_user, *args, **kwargs)
     
     return decorated
 
+def _hasher_busy():
+    response = jsonify({
+        'success': False,
+        'error': 'Serviço temporariamente sobrecarregado, tente novamente'
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = str(current_app.config.get('PASSWORD_HASH_RETRY_AFTER', 1))
+    return response
+
 @auth_bp.route('/auth/register', methods=['POST'])
 def register():
     """Registar novo utilizador"""
@@ -60,7 +193,7 @@ def register():
             }), 400
         
         # Criar novo utilizador
-        password_hash = generate_password_hash(data['password'])
+        password_hash = hash_password(data['password'])
         
         new_user = User(
             username=data['username'],
@@ -78,6 +211,70 @@ def register():
             'user': new_user.to_dict()
         }), 201
         
+    except PasswordHasherBusy:
+        db.session.rollback()
+        return _hasher_busy()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@auth_bp.route('/auth/users/bulk', methods=['POST'])
+@token_required
+def bulk_register_users(current_user):
+    """Registar utilizadores em massa a partir de CSV ou JSON (apenas administradores)"""
+    if current_user.role != 'admin':
+        return jsonify({
+            'success': False,
+            'error': 'Acesso reservado a administradores'
+        }), 403
+    
+    try:
+        upload = request.files.get('file')
+        import_format = request.args.get('format')
+        
+        if upload is not None:
+            data = upload.read()
+            # Parte sem nome de ficheiro (ou sem extensão): formato só por ?format=
+            filename = upload.filename or ''
+            if not import_format and '.' in filename:
+                import_format = filename.rsplit('.', 1)[-1].lower()
+        else:
+            data = request.get_data()
+            if not import_format:
+                import_format = 'csv' if request.mimetype == 'text/csv' else 'json'
+        
+        if not import_format:
+            return jsonify({
+                'success': False,
+                'error': f'Formato não indicado: use ?format= ({", ".join(IMPORT_FORMATS)}) ou um ficheiro com extensão'
+            }), 400
+        
+        if import_format not in IMPORT_FORMATS:
+            return jsonify({
+                'success': False,
+                'error': f'Formato inválido (opções: {", ".join(IMPORT_FORMATS)})'
+            }), 400
+        
+        rows = parse_users(data, import_format)
+        dry_run = request.args.get('dry_run', '').lower() in ('1', 'true', 'yes')
+        results = bulk_register(rows, dry_run=dry_run)
+        
+        return jsonify({
+            'success': True,
+            'dry_run': dry_run,
+            'summary': summarize_results(results),
+            'results': results
+        })
+        
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -106,12 +303,18 @@ def login():
                 'error': 'Utilizador não encontrado ou inativo'
             }), 401
         
-        if not check_password_hash(user.password_hash, data['password']):
+        valid, new_hash = verify_password(user.password_hash, data['password'])
+        if not valid:
             return jsonify({
                 'success': False,
                 'error': 'Password incorreta'
             }), 401
         
+        # Parâmetros de hashing alterados: guardar o hash com os parâmetros atuais
+        if new_hash:
+            user.password_hash = new_hash
+            db.session.commit()
+        
         # Gerar token JWT
         token = jwt.encode({
             'user_id': user.id,
@@ -127,6 +330,8 @@ def login():
             'user': user.to_dict()
         })
         
+    except PasswordHasherBusy:
+        return _hasher_busy()
     except Exception as e:
         return jsonify({
             'success': False,
@@ -165,7 +370,7 @@ def update_profile(current_user):
             current_user.email = data['email']
         
         if 'password' in data and data['password']:
-            current_user.password_hash = generate_password_hash(data['password'])
+            current_user.password_hash = hash_password(data['password'])
         
         db.session.commit()
         
@@ -175,6 +380,9 @@ def update_profile(current_user):
             'user': current_user.to_dict()
         })
         
+    except PasswordHasherBusy:
+        db.session.rollback()
+        return _hasher_busy()
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -0,0 +1,78 @@
+from flask import Blueprint, request, jsonify
+from src.models.autocomplete import MAX_SUGGESTIONS, get_indexes
+
+autocomplete_bp = Blueprint('autocomplete', __name__)
+
+# Sugestões por prefixo para a caixa de pesquisa, servidas de índices em
+# memória (sem consultas à base de dados enquanto os dados não mudam).
+
+DEFAULT_SUGGESTIONS = 10
+
+def _suggestion_args():
+    prefix = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', DEFAULT_SUGGESTIONS, type=int), 1), MAX_SUGGESTIONS)
+    return prefix, limit
+
+@autocomplete_bp.route('/autocomplete/cases', methods=['GET'])
+def autocomplete_cases():
+    """Números de processo começados por `q`"""
+    try:
+        prefix, limit = _suggestion_args()
+        matches = get_indexes('case').numbers.search(prefix, limit) if prefix else []
+        
+        return jsonify({
+            'success': True,
+            'suggestions': [
+                {'id': case_id, 'case_number': case_number}
+                for case_number, case_id in matches
+            ]
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@autocomplete_bp.route('/autocomplete/parties', methods=['GET'])
+def autocomplete_parties():
+    """Nomes de partes (autor ou réu) com uma palavra começada por `q`"""
+    try:
+        prefix, limit = _suggestion_args()
+        indexes = get_indexes('case')
+        matches = indexes.parties.search(prefix, limit) if prefix else []
+        
+        return jsonify({
+            'success': True,
+            'suggestions': [
+                {'name': name, 'cases': indexes.party_count(name)}
+                for name in matches
+            ]
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@autocomplete_bp.route('/autocomplete/forms', methods=['GET'])
+def autocomplete_forms():
+    """Títulos de formulários ativos com uma palavra começada por `q`"""
+    try:
+        prefix, limit = _suggestion_args()
+        matches = get_indexes('form').titles.search(prefix, limit) if prefix else []
+        
+        return jsonify({
+            'success': True,
+            'suggestions': [
+                {'id': form_id, 'title': title, 'category': category}
+                for title, form_id, category in matches
+            ]
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
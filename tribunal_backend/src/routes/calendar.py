@@ -0,0 +1,216 @@
+from flask import Blueprint, request, jsonify, Response
+from sqlalchemy import func
+from src.models.user import db, Case, User, Hearing
+from src.models.cache import get_cache_backend
+from src.models.scheduling import hearing_end
+from collections import OrderedDict
+from datetime import datetime, date, time, timedelta
+import hashlib
+import threading
+
+calendar_bp = Blueprint('calendar', __name__)
+
+# Feeds iCalendar (RFC 5545) por sala e por juiz.
+#
+# O ETag de cada feed deriva, com a cache de respostas partilhada ('sqlite'),
+# das versões das tabelas de audiências, processos e utilizadores nessa cache:
+# um 304 custa uma leitura das versões, sem consultar a base de dados. As
+# versões são comuns a todos os workers e mantidas entre arranques (escritas
+# fora do ORM devem chamar bump_versions). Sem ela (cache 'memory', com
+# versões por processo, ou sem cache) o ETag deriva dos próprios dados: número
+# de audiências do feed e o maior updated_at, obtidos numa consulta agregada
+# pelos índices da sala e do juiz. Um feed sem alterações devolve 304 sem
+# gerar o calendário. Quando há alterações, só os
+# eventos cujas linhas mudaram são formatados de novo; com a cache de
+# respostas ativa o feed completo fica em cache em bytes, pelo ETag.
+#
+# No ETag pelos dados, mudanças só no processo ou no juiz (número do processo,
+# nome do juiz) não o alteram até à próxima alteração de uma audiência do feed.
+
+# Tabelas de que o feed depende
+FEED_TABLES = ('hearing', 'case', 'user')
+
+# Audiências passadas incluídas no feed
+FEED_PAST_DAYS = 30
+
+# Eventos já formatados, pelos valores da linha
+EVENT_CACHE_SIZE = 50000
+_event_cache = OrderedDict()
+_event_cache_lock = threading.Lock()
+
+def _escape(value):
+    return (
+        (value or '')
+        .replace('\\', '\\\\')
+        .replace(';', '\\;')
+        .replace(',', '\\,')
+        .replace('\r\n', '\\n')
+        .replace('\n', '\\n')
+    )
+
+def _fold(line):
+    """Dobrar linhas com mais de 75 octetos (RFC 5545, 3.1)"""
+    data = line.encode('utf-8')
+    if len(data) <= 75:
+        return line + '\r\n'
+
+    parts = []
+    current = ''
+    size = 0
+    limit = 75
+    for char in line:
+        char_size = len(char.encode('utf-8'))
+        if size + char_size > limit:
+            parts.append(current)
+            current = ''
+            size = 0
+            limit = 74  # a linha de continuação começa com um espaço
+        current += char
+        size += char_size
+    parts.append(current)
+    return '\r\n '.join(parts) + '\r\n'
+
+def _format_local(value):
+    return value.strftime('%Y%m%dT%H%M%S')
+
+def _render_event(row):
+    start = row.hearing_date
+    end = hearing_end(start, row.duration_minutes)
+    stamp = row.updated_at or start
+    status = 'CANCELLED' if row.status == 'cancelled' else 'CONFIRMED'
+
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:hearing-{row.id}@tsrb.gov.mz',
+        f'DTSTAMP:{stamp.strftime("%Y%m%dT%H%M%SZ")}',
+        f'DTSTART:{_format_local(start)}',
+        f'DTEND:{_format_local(end)}',
+        f'SUMMARY:{_escape(f"Audiência ({row.hearing_type}) - Processo {row.case_number}")}',
+        f'LOCATION:{_escape(row.courtroom)}',
+        f'STATUS:{status}',
+    ]
+    description = [f'Processo: {row.case_number}', f'Estado: {row.status}']
+    if row.judge:
+        description.append(f'Juiz: {row.judge}')
+    if row.notes:
+        description.append(row.notes)
+    lines.append(f'DESCRIPTION:{_escape(chr(10).join(description))}')
+    lines.append('END:VEVENT')
+
+    return ''.join(_fold(line) for line in lines)
+
+def _cached_event(row):
+    key = tuple(row)
+    with _event_cache_lock:
+        event = _event_cache.get(key)
+        if event is not None:
+            _event_cache.move_to_end(key)
+            return event
+
+    event = _render_event(row)
+    with _event_cache_lock:
+        _event_cache[key] = event
+        while len(_event_cache) > EVENT_CACHE_SIZE:
+            _event_cache.popitem(last=False)
+    return event
+
+def _feed_filter(condition, since):
+    return (Case.is_public == True, Hearing.hearing_date >= since, condition)
+
+def _feed_tag(feed_key, condition, since, backend):
+    """ETag do feed: versões da cache partilhada ou, sem ela, número de audiências e maior updated_at"""
+    if backend is not None and backend.shared:
+        state = f'{backend.epoch}#{backend.get_versions(FEED_TABLES)}'
+    else:
+        count, last_update = db.session.execute(
+            db.select(func.count(Hearing.id), func.max(Hearing.updated_at))
+            .join(Case, Hearing.case_id == Case.id)
+            .where(*_feed_filter(condition, since))
+        ).one()
+        state = f'{count}#{last_update}'
+    return hashlib.sha1(f'{feed_key}#{state}'.encode('utf-8')).hexdigest()
+
+def _build_feed(name, condition, since):
+    """Gerar o calendário em bytes"""
+    rows = db.session.execute(
+        db.select(
+            Hearing.id, Hearing.hearing_date, Hearing.hearing_type, Hearing.courtroom,
+            Hearing.duration_minutes, Hearing.status, Hearing.notes, Hearing.updated_at,
+            Case.case_number, User.username.label('judge')
+        )
+        .join(Case, Hearing.case_id == Case.id)
+        .outerjoin(User, Hearing.judge_id == User.id)
+        .where(*_feed_filter(condition, since))
+        .order_by(Hearing.hearing_date.asc(), Hearing.id.asc())
+    ).all()
+
+    parts = [
+        'BEGIN:VCALENDAR\r\n',
+        'VERSION:2.0\r\n',
+        'PRODID:-//Tribunal Superior de Recurso da Beira//Audiências//PT\r\n',
+        'CALSCALE:GREGORIAN\r\n',
+        _fold(f'X-WR-CALNAME:{_escape(name)}'),
+    ]
+    parts.extend(_cached_event(row) for row in rows)
+    parts.append('END:VCALENDAR\r\n')
+
+    return ''.join(parts).encode('utf-8')
+
+def _feed_response(feed_key, name, condition):
+    # O feed inclui apenas os últimos FEED_PAST_DAYS dias, logo muda também com a data
+    since = datetime.combine(date.today() - timedelta(days=FEED_PAST_DAYS), time.min)
+    feed_key = f'{feed_key}@{date.today().isoformat()}'
+    backend = get_cache_backend()
+    etag = _feed_tag(feed_key, condition, since, backend)
+
+    # Feed sem alterações: 304 sem gerar o calendário
+    if etag in request.if_none_match:
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    if backend is not None:
+        cache_key = f'ics:{etag}'
+        body = backend.get(cache_key)
+        if body is None:
+            body = _build_feed(name, condition, since)
+            backend.set(cache_key, body)
+    else:
+        body = _build_feed(name, condition, since)
+
+    response = Response(body, mimetype='text/calendar')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+@calendar_bp.route('/hearings/courtroom/<courtroom>.ics', methods=['GET'])
+def courtroom_calendar(courtroom):
+    """Calendário iCalendar das audiências de uma sala"""
+    try:
+        return _feed_response(
+            f'courtroom:{courtroom}',
+            f'Audiências - {courtroom}',
+            Hearing.courtroom == courtroom
+        )
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@calendar_bp.route('/hearings/judge/<int:judge_id>.ics', methods=['GET'])
+def judge_calendar(judge_id):
+    """Calendário iCalendar das audiências de um juiz"""
+    try:
+        return _feed_response(
+            f'judge:{judge_id}',
+            f'Audiências - Juiz {judge_id}',
+            Hearing.judge_id == judge_id
+        )
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
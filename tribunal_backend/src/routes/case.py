@@ -1,39 +1,77 @@
-from flask import Blueprint, request, jsonify
-from src.models.user import db, Case, User, Hearing
-from datetime import datetime
-from sqlalchemy import or_, and_
+from flask import Blueprint, request, jsonify, current_app
+from src.models.user import db, Case, User, Hearing, normalize_text
+from src.models.search import case_fts_subquery, fts_phrase, fts_all_terms
+from src.models.cache import cached_response
+from src.models.export import EXPORT_FORMATS, stream_export
+from src.models.pagination import (
+    TOTAL_MODES, CountCache, PageRows, encode_cursor, decode_cursor, keyset_rows, count_total
+)
+from src.models.serialization import json_list_response
+from datetime import datetime, date, time, timedelta
+from sqlalchemy import or_, and_, func, extract, select, true
 
 case_bp = Blueprint('case', __name__)
 
+# Contagens exatas reutilizadas entre pedidos com os mesmos filtros (total=cached)
+case_count_cache = CountCache(ttl=60)
+
+# Parâmetros que não alteram o conjunto de resultados
+PAGINATION_ARGS = ('page', 'per_page', 'cursor', 'total', 'sort', 'fields', 'facets')
+
+# Máximo de processos por página na pesquisa
+CASES_MAX_PER_PAGE = 500
+
+# Paginação da listagem de audiências
+HEARINGS_PER_PAGE = 50
+HEARINGS_MAX_PER_PAGE = 500
+
+# Facetas disponíveis na pesquisa de processos
+CASE_FACETS = ('case_type', 'status', 'year')
+
 @case_bp.route('/cases/search', methods=['GET'])
+@cached_response('case', 'user')
 def search_cases():
     """Pesquisar processos com vários critérios"""
     try:
         # Parâmetros de pesquisa
-        case_number = request.args.get('case_number', '').strip()
-        party_name = request.args.get('party_name', '').strip()
+        sort = request.args.get('sort', '').strip()
+        fields = Case.parse_fields(request.args.get('fields', '').strip())
         case_type = request.args.get('case_type', '').strip()
         status = request.args.get('status', '').strip()
-        date_from = request.args.get('date_from', '').strip()
-        date_to = request.args.get('date_to', '').strip()
+        facet_names = [name.strip() for name in request.args.get('facets', '').split(',') if name.strip()]
         
-        # Paginação
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 10))
+        unknown_facets = [name for name in facet_names if name not in CASE_FACETS]
+        if unknown_facets:
+            return jsonify({
+                'success': False,
+                'error': f"Facetas desconhecidas: {', '.join(unknown_facets)}"
+            }), 400
         
-        # Construir query
-        query = Case.query.filter(Case.is_public == True)
+        # Paginação: por página (page/per_page) ou por cursor (cursor)
+        page = max(int(request.args.get('page', 1)), 1)
+        per_page = min(max(int(request.args.get('per_page', 10)), 1), CASES_MAX_PER_PAGE)
+        use_cursor = 'cursor' in request.args
+        cursor = request.args.get('cursor', '').strip()
+        total_mode = request.args.get('total', 'none' if use_cursor else 'exact').strip()
         
-        if case_number:
-            query = query.filter(Case.case_number.ilike(f'%{case_number}%'))
+        if total_mode not in TOTAL_MODES:
+            return jsonify({
+                'success': False,
+                'error': f"Modo de total inválido (valores: {', '.join(TOTAL_MODES)})"
+            }), 400
         
-        if party_name:
-            query = query.filter(
-                or_(
-                    Case.plaintiff.ilike(f'%{party_name}%'),
-                    Case.defendant.ilike(f'%{party_name}%')
-                )
-            )
+        if use_cursor and sort == 'relevance':
+            return jsonify({
+                'success': False,
+                'error': 'A paginação por cursor não suporta ordenação por relevância'
+            }), 400
+        
+        # Construir query
+        query, fts = _case_query(request.args)
+        
+        # Facetas calculadas antes dos filtros de tipo e estado, para que cada
+        # faceta mostre as alternativas aos filtros já escolhidos
+        facets = _case_facets(query, facet_names, case_type, status) if facet_names else None
         
         if case_type:
             query = query.filter(Case.case_type == case_type)
@@ -41,48 +79,203 @@ def search_cases():
         if status:
             query = query.filter(Case.status == status)
         
-        if date_from:
-            date_from_obj = datetime.fromisoformat(date_from)
-            query = query.filter(Case.filing_date >= date_from_obj)
+        # Relações carregadas na mesma consulta
+        query = query.options(*Case.load_options(fields, always=('filing_date',)))
+        
+        cache_key = tuple(sorted(
+            (key, value) for key, value in request.args.items(multi=True)
+            if key not in PAGINATION_ARGS
+        ))
         
-        if date_to:
-            date_to_obj = datetime.fromisoformat(date_to)
-            query = query.filter(Case.filing_date <= date_to_obj)
+        if use_cursor:
+            return _cursor_page(query, cursor, per_page, total_mode, cache_key, fields, facets)
         
-        # Ordenar por data de registo (mais recentes primeiro)
-        query = query.order_by(Case.filing_date.desc())
+        if sort == 'relevance' and fts is not None:
+            # Ordenar por relevância (bm25: valores menores são mais relevantes)
+            query = query.order_by(fts.c.rank.asc(), Case.filing_date.desc(), Case.id.desc())
+        else:
+            # Ordenar por data de registo (mais recentes primeiro)
+            query = query.order_by(Case.filing_date.desc(), Case.id.desc())
         
         # Paginação
-        paginated_cases = query.paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
+        total, total_is_estimate = count_total(query, total_mode, case_count_cache, cache_key)
+        rows = PageRows(query.limit(per_page + 1).offset((page - 1) * per_page), per_page)
+        
+        result = {'success': True}
+        if facets is not None:
+            result['facets'] = facets
+        
+        # Linhas codificadas à medida que são lidas (streaming em páginas grandes)
+        return json_list_response(
+            result, 'cases', (case.to_dict(fields) for case in rows),
+            lambda: {
+                'pagination': {
+                    'page': page,
+                    'per_page': per_page,
+                    'total': total,
+                    'total_is_estimate': total_is_estimate,
+                    'pages': -(-total // per_page) if total is not None else None,
+                    'has_next': rows.has_next,
+                    'has_prev': page > 1
+                }
+            },
+            size=per_page
         )
         
+    except ValueError as e:
         return jsonify({
-            'success': True,
-            'cases': [case.to_dict() for case in paginated_cases.items],
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': paginated_cases.total,
-                'pages': paginated_cases.pages,
-                'has_next': paginated_cases.has_next,
-                'has_prev': paginated_cases.has_prev
-            }
-        })
-        
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+def _case_query(args):
+    """Query dos processos públicos com os filtros de texto e de datas.
+
+    Devolve (query, fts); `fts` é a subquery do índice FTS5 (ou None) usada na
+    ordenação por relevância. Os filtros de tipo e estado ficam a cargo de
+    quem chama, para permitir o cálculo das facetas.
+    """
+    case_number = args.get('case_number', '').strip()
+    party_name = args.get('party_name', '').strip()
+    text_query = args.get('q', '').strip()
+    date_from = args.get('date_from', '').strip()
+    date_to = args.get('date_to', '').strip()
+    
+    query = Case.query.filter(Case.is_public == True)
+    fts = None
+    
+    # Número do processo: qualquer parte do número ("024/CV" ou "001" encontram
+    # "2024/CV/001"), também com o índice FTS5, que só encontra inícios de termos
+    if case_number:
+        query = query.filter(Case.case_number.ilike(f'%{case_number}%'))
+    
+    if current_app.config.get('CASE_FTS_ENABLED'):
+        # Pesquisa de texto integral através do índice FTS5
+        expression = fts_all_terms(text_query)
+        if expression:
+            fts = case_fts_subquery([expression])
+            query = query.join(fts, fts.c.case_id == Case.id)
+    else:
+        if text_query:
+            for term in text_query.split():
+                query = query.filter(
+                    or_(
+                        Case.case_number.ilike(f'%{term}%'),
+                        Case.title.ilike(f'%{term}%'),
+                        Case.plaintiff.ilike(f'%{term}%'),
+                        Case.defendant.ilike(f'%{term}%'),
+                        Case.description.ilike(f'%{term}%')
+                    )
+                )
+    
+    if party_name:
+        query = query.filter(_party_name_filter(party_name))
+    
+    if date_from:
+        date_from_obj = datetime.fromisoformat(date_from)
+        query = query.filter(Case.filing_date >= date_from_obj)
+    
+    if date_to:
+        date_to_obj = datetime.fromisoformat(date_to)
+        query = query.filter(Case.filing_date <= date_to_obj)
+    
+    return query, fts
+
+def _party_name_filter(party_name):
+    """Filtro por nome de parte, sem distinção de acentos nem maiúsculas.
+    
+    O início do nome é procurado nas colunas normalizadas por intervalo
+    (usa o índice B-tree); palavras no meio do nome ("Silva" em "João Silva")
+    são encontradas pelo índice FTS5 ou, sem ele, por LIKE sobre a forma
+    normalizada.
+    """
+    prefix = normalize_text(party_name)
+    if not prefix:
+        return true()
+    
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    conditions = [
+        and_(Case.plaintiff_normalized >= prefix, Case.plaintiff_normalized < upper),
+        and_(Case.defendant_normalized >= prefix, Case.defendant_normalized < upper)
+    ]
+    
+    words = fts_phrase(party_name, ['plaintiff', 'defendant'])
+    if current_app.config.get('CASE_FTS_ENABLED') and words:
+        conditions.append(Case.id.in_(select(case_fts_subquery([words]).c.case_id)))
+    else:
+        conditions.append(Case.plaintiff_normalized.like(f'%{prefix}%'))
+        conditions.append(Case.defendant_normalized.like(f'%{prefix}%'))
+    
+    return or_(*conditions)
+
+def _case_facets(query, names, case_type, status):
+    """Contagens por tipo, estado e ano numa única consulta agrupada.
+
+    A consulta agrupa por (tipo, estado, ano) sobre os filtros que não são
+    facetas; as contagens de cada faceta somam os grupos que respeitam os
+    filtros das outras facetas.
+    """
+    year = extract('year', Case.filing_date)
+    groups = query.order_by(None).with_entities(
+        Case.case_type, Case.status, year, func.count(Case.id)
+    ).group_by(Case.case_type, Case.status, year).all()
+    
+    counts = {name: {} for name in names}
+    for group_type, group_status, group_year, count in groups:
+        matches_type = not case_type or group_type == case_type
+        matches_status = not status or group_status == status
+        
+        if 'case_type' in counts and matches_status:
+            counts['case_type'][group_type] = counts['case_type'].get(group_type, 0) + count
+        if 'status' in counts and matches_type:
+            counts['status'][group_status] = counts['status'].get(group_status, 0) + count
+        if 'year' in counts and matches_type and matches_status:
+            counts['year'][group_year] = counts['year'].get(group_year, 0) + count
+    
+    return {
+        name: [
+            {'value': value, 'count': count}
+            for value, count in sorted(buckets.items(), key=lambda item: (-item[1], str(item[0])))
+        ]
+        for name, buckets in counts.items()
+    }
+
+def _cursor_page(query, cursor, per_page, total_mode, cache_key, fields, facets):
+    """Página de resultados por cursor, ordenada por (filing_date, id) descendente"""
+    total, total_is_estimate = count_total(query, total_mode, case_count_cache, cache_key)
+    
+    after = decode_cursor(cursor, 2) if cursor else None
+    rows = keyset_rows(query, Case.filing_date, Case.id, after, per_page + 1, descending=True)
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    
+    result = {
+        'success': True,
+        'pagination': {
+            'per_page': per_page,
+            'next_cursor': encode_cursor(rows[-1].filing_date, rows[-1].id) if has_next else None,
+            'has_next': has_next,
+            'total': total,
+            'total_is_estimate': total_is_estimate
+        }
+    }
+    if facets is not None:
+        result['facets'] = facets
+    
+    return json_list_response(result, 'cases', (case.to_dict(fields) for case in rows), size=len(rows))
+
 @case_bp.route('/cases/<int:case_id>', methods=['GET'])
+@cached_response('case', 'user')
 def get_case_details(case_id):
     """Obter detalhes de um processo específico"""
     try:
-        case = Case.query.get_or_404(case_id)
+        fields = Case.parse_fields(request.args.get('fields', '').strip())
+        case = Case.query.options(*Case.load_options(fields, always=('is_public',))).get_or_404(case_id)
         
         if not case.is_public:
             return jsonify({
@@ -92,9 +285,14 @@ def get_case_details(case_id):
         
         return jsonify({
             'success': True,
-            'case': case.to_dict()
+            'case': case.to_dict(fields)
         })
         
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -132,41 +330,141 @@ def get_case_statuses():
     })
 
 @case_bp.route('/hearings', methods=['GET'])
+@cached_response('hearing', 'case', 'user', vary=lambda: date.today().isoformat())
 def get_hearings():
-    """Obter audiências agendadas"""
+    """Obter audiências agendadas (paginadas por cursor)"""
     try:
         # Parâmetros de filtro
-        date_from = request.args.get('date_from', '').strip()
-        date_to = request.args.get('date_to', '').strip()
-        courtroom = request.args.get('courtroom', '').strip()
+        fields = Hearing.parse_fields(request.args.get('fields', '').strip())
+        per_page = max(1, min(int(request.args.get('per_page', HEARINGS_PER_PAGE)), HEARINGS_MAX_PER_PAGE))
+        cursor = request.args.get('cursor', '').strip()
         
-        # Construir query
-        query = Hearing.query.join(Case).filter(Case.is_public == True)
+        # Sem datas indicadas, apenas os próximos dias (window=all desativa)
+        window_days = None
+        if request.args.get('window', '').strip() != 'all':
+            window_days = current_app.config.get('HEARINGS_DEFAULT_WINDOW_DAYS', 30)
         
-        if date_from:
-            date_from_obj = datetime.fromisoformat(date_from)
-            query = query.filter(Hearing.hearing_date >= date_from_obj)
+        # Construir query (processo e juiz carregados na mesma consulta)
+        query = _hearing_query(request.args, window_days).options(*Hearing.load_options(fields, always=('hearing_date',)))
         
-        if date_to:
-            date_to_obj = datetime.fromisoformat(date_to)
-            query = query.filter(Hearing.hearing_date <= date_to_obj)
+        # Ordenar por data da audiência, continuando a partir do cursor
+        after = decode_cursor(cursor, 2) if cursor else None
+        hearings = keyset_rows(query, Hearing.hearing_date, Hearing.id, after, per_page + 1, descending=False)
+        has_next = len(hearings) > per_page
+        hearings = hearings[:per_page]
         
-        if courtroom:
-            query = query.filter(Hearing.courtroom.ilike(f'%{courtroom}%'))
+        return json_list_response({
+            'success': True,
+            'pagination': {
+                'per_page': per_page,
+                'next_cursor': encode_cursor(hearings[-1].hearing_date, hearings[-1].id) if has_next else None,
+                'has_next': has_next
+            }
+        }, 'hearings', (hearing.to_dict(fields) for hearing in hearings), size=len(hearings))
         
-        # Ordenar por data da audiência
-        query = query.order_by(Hearing.hearing_date.asc())
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+def _hearing_query(args, window_days=None):
+    """Query das audiências de processos públicos com os filtros de pesquisa.
+    
+    Com `window_days` e sem datas indicadas, limita-se às audiências de hoje
+    até `window_days` dias depois.
+    """
+    date_from = args.get('date_from', '').strip()
+    date_to = args.get('date_to', '').strip()
+    courtroom = args.get('courtroom', '').strip()
+    
+    query = Hearing.query.join(Case).filter(Case.is_public == True)
+    
+    if window_days and not date_from and not date_to:
+        today = datetime.combine(date.today(), time.min)
+        query = query.filter(
+            Hearing.hearing_date >= today,
+            Hearing.hearing_date < today + timedelta(days=window_days + 1)
+        )
+    
+    if date_from:
+        date_from_obj = datetime.fromisoformat(date_from)
+        query = query.filter(Hearing.hearing_date >= date_from_obj)
+    
+    if date_to:
+        date_to_obj = datetime.fromisoformat(date_to)
+        query = query.filter(Hearing.hearing_date <= date_to_obj)
+    
+    if courtroom:
+        # Qualquer parte do nome da sala, como antes: não usa ix_hearing_courtroom_date,
+        # pelo que as audiências são percorridas pela data (ix_hearing_date_case)
+        query = query.filter(Hearing.courtroom.ilike(f'%{courtroom}%'))
+    
+    return query
+
+def _export_format():
+    export_format = request.args.get('format', 'ndjson').strip()
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Formato inválido (valores: {', '.join(EXPORT_FORMATS)})")
+    return export_format
+
+@case_bp.route('/cases/export', methods=['GET'])
+def export_cases():
+    """Exportar processos públicos em NDJSON ou CSV (mesmos filtros da pesquisa)"""
+    try:
+        export_format = _export_format()
+        fields = Case.parse_fields(request.args.get('fields', '').strip())
+        case_type = request.args.get('case_type', '').strip()
+        status = request.args.get('status', '').strip()
         
-        hearings = query.all()
+        query, fts = _case_query(request.args)
         
-        return jsonify({
-            'success': True,
-            'hearings': [hearing.to_dict() for hearing in hearings]
-        })
+        if case_type:
+            query = query.filter(Case.case_type == case_type)
         
+        if status:
+            query = query.filter(Case.status == status)
+        
+        query = query.options(*Case.load_options(fields)).order_by(Case.filing_date.desc(), Case.id.desc())
+        
+        return stream_export(query, Case, fields, export_format, 'processos')
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+@case_bp.route('/hearings/export', methods=['GET'])
+def export_hearings():
+    """Exportar audiências públicas em NDJSON ou CSV (mesmos filtros da listagem)"""
+    try:
+        export_format = _export_format()
+        fields = Hearing.parse_fields(request.args.get('fields', '').strip())
+        
+        query = _hearing_query(request.args).options(*Hearing.load_options(fields))
+        query = query.order_by(Hearing.hearing_date.asc(), Hearing.id.asc())
+        
+        return stream_export(query, Hearing, fields, export_format, 'audiencias')
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
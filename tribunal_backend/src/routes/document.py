@@ -0,0 +1,470 @@
+from flask import Blueprint, current_app, request, jsonify
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
+from src.models.user import db, Case, User, Document
+from src.models.documents import (
+    DocumentTooLarge, UploadBusy, UploadOffsetMismatch, get_document_store, document_file_info
+)
+from src.models.files import send_file_response
+from src.models.indexing import enqueue_document, document_matches
+from src.models.search import fts_all_terms
+from src.routes.auth import token_required, token_optional
+from sqlalchemy import and_, or_, true
+
+document_bp = Blueprint('document', __name__)
+
+DOCUMENT_TYPES = ('petition', 'motion', 'order', 'judgment')
+
+# Perfis que podem submeter documentos
+UPLOAD_ROLES = ('lawyer', 'judge', 'admin')
+
+# Perfis que veem todos os documentos, públicos ou não
+PRIVILEGED_ROLES = ('judge', 'admin')
+
+# Campos devolvidos (o caminho do blob no servidor não é exposto)
+DOCUMENT_FIELDS = [name for name in Document.__fields__ if name != 'file_path']
+
+SEARCH_MAX_PER_PAGE = 100
+
+def _visible_documents(user):
+    """Condição SQL dos documentos visíveis para `user` (None = anónimo)"""
+    public = and_(Document.is_public == True, Case.is_public == True)
+    if user is None:
+        return public
+    if user.role in PRIVILEGED_ROLES:
+        return true()
+    return or_(public, Case.lawyer_id == user.id, Case.judge_id == user.id, Document.uploaded_by == user.id)
+
+def _case_visible(user, is_public, lawyer_id, judge_id):
+    if is_public:
+        return True
+    return _case_member(user, lawyer_id, judge_id)
+
+def _case_member(user, lawyer_id, judge_id):
+    """Utilizador com acesso ao processo independentemente de ser público"""
+    if user is None:
+        return False
+    return user.role in PRIVILEGED_ROLES or user.id in (lawyer_id, judge_id)
+
+def _document_dict(document, uploader):
+    data = document.to_dict([name for name in DOCUMENT_FIELDS if name != 'uploaded_by'])
+    data['uploaded_by'] = uploader
+    return data
+
+def _document_meta(source):
+    """Metadados de um documento a partir de `source` (parâmetros, formulário ou JSON)"""
+    title = (source.get('title') or '').strip()
+    document_type = (source.get('document_type') or '').strip()
+    
+    if document_type not in DOCUMENT_TYPES:
+        raise ValueError(f'Tipo de documento inválido (opções: {", ".join(DOCUMENT_TYPES)})')
+    
+    is_public = source.get('is_public', False)
+    if isinstance(is_public, str):
+        is_public = is_public.lower() in ('1', 'true', 'yes')
+    
+    return {
+        'title': title,
+        'document_type': document_type,
+        'is_public': bool(is_public),
+        'filename': (source.get('filename') or '').strip() or None,
+        'content_type': (source.get('content_type') or '').strip() or None
+    }
+
+def _upload_case(current_user, case_id):
+    """Processo onde `current_user` pode submeter documentos, ou resposta de erro.
+
+    Advogados só submetem (e só tornam públicos documentos) nos processos em
+    que estão; processos privados sem acesso respondem como inexistentes,
+    como nos downloads.
+    """
+    if current_user.role not in UPLOAD_ROLES:
+        return None, (jsonify({
+            'success': False,
+            'error': 'Acesso reservado a advogados, juízes e administradores'
+        }), 403)
+    
+    case = db.session.get(Case, case_id)
+    if case is None or not _case_visible(current_user, case.is_public, case.lawyer_id, case.judge_id):
+        return None, (jsonify({
+            'success': False,
+            'error': 'Processo não encontrado'
+        }), 404)
+    
+    if not _case_member(current_user, case.lawyer_id, case.judge_id):
+        return None, (jsonify({
+            'success': False,
+            'error': 'Sem permissão para submeter documentos neste processo'
+        }), 403)
+    
+    return case, None
+
+def _create_document(case_id, current_user, meta, sha256, size, path):
+    document = Document(
+        case_id=case_id,
+        title=meta['title'] or meta['filename'] or sha256[:12],
+        document_type=meta['document_type'],
+        file_path=path,
+        uploaded_by=current_user.id,
+        is_public=meta['is_public'],
+        sha256=sha256,
+        size=size,
+        content_type=meta['content_type'] or 'application/octet-stream',
+        filename=meta['filename']
+    )
+    db.session.add(document)
+    db.session.flush()
+    
+    # Indexação do texto feita pelos workers (flask index-documents), não aqui
+    enqueue_document(document.id)
+    db.session.commit()
+    return document
+
+def _too_large(e):
+    # RequestEntityTooLarge: corpo acima de MAX_CONTENT_LENGTH, detetado durante a leitura
+    return jsonify({
+        'success': False,
+        'error': e.description if isinstance(e, RequestEntityTooLarge) else str(e)
+    }), 413
+
+@document_bp.route('/cases/<int:case_id>/documents', methods=['GET'])
+@token_optional
+def list_case_documents(current_user, case_id):
+    """Documentos de um processo visíveis para o utilizador (uma única consulta)"""
+    try:
+        rows = db.session.execute(
+            db.select(Case.is_public, Case.lawyer_id, Case.judge_id, Document, User.username)
+            .select_from(Case)
+            .outerjoin(Document, and_(Document.case_id == Case.id, _visible_documents(current_user)))
+            .outerjoin(User, Document.uploaded_by == User.id)
+            .where(Case.id == case_id)
+            .order_by(Document.upload_date.desc(), Document.id.desc())
+        ).all()
+        
+        if not rows or not _case_visible(current_user, *rows[0][:3]):
+            return jsonify({
+                'success': False,
+                'error': 'Processo não encontrado'
+            }), 404
+        
+        documents = [_document_dict(row.Document, row.username) for row in rows if row.Document is not None]
+        
+        return jsonify({
+            'success': True,
+            'documents': documents,
+            'total': len(documents)
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@document_bp.route('/cases/<int:case_id>/documents', methods=['POST'])
+@token_required
+def upload_document(current_user, case_id):
+    """Submeter um documento.
+
+    O corpo pode ser o próprio ficheiro (metadados nos parâmetros do URL),
+    escrito em disco à medida que chega, ou multipart/form-data com `file`.
+    """
+    try:
+        case, error = _upload_case(current_user, case_id)
+        if error:
+            return error
+        
+        store = get_document_store()
+        if request.content_length is not None and request.content_length > store.max_size:
+            raise DocumentTooLarge(f'Documento acima do limite de {store.max_size} bytes')
+        
+        if request.mimetype == 'multipart/form-data':
+            upload = request.files.get('file')
+            if upload is None:
+                return jsonify({
+                    'success': False,
+                    'error': 'Ficheiro em falta (file)'
+                }), 400
+            
+            meta = _document_meta(request.form)
+            meta['filename'] = meta['filename'] or upload.filename
+            meta['content_type'] = meta['content_type'] or upload.mimetype
+            sha256, size, path = store.save_stream(upload.stream)
+        else:
+            meta = _document_meta(request.args)
+            meta['content_type'] = meta['content_type'] or request.mimetype or None
+            sha256, size, path = store.save_stream(request.stream)
+        
+        document = _create_document(case.id, current_user, meta, sha256, size, path)
+        
+        return jsonify({
+            'success': True,
+            'document': _document_dict(document, current_user.username)
+        }), 201
+        
+    except (DocumentTooLarge, RequestEntityTooLarge) as e:
+        db.session.rollback()
+        return _too_large(e)
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@document_bp.route('/cases/<int:case_id>/documents/uploads', methods=['POST'])
+@token_required
+def create_document_upload(current_user, case_id):
+    """Iniciar um upload retomável (blocos enviados com PATCH e Upload-Offset)"""
+    try:
+        case, error = _upload_case(current_user, case_id)
+        if error:
+            return error
+        
+        meta = _document_meta(request.get_json() or {})
+        upload_id = get_document_store().create_upload(dict(meta, case_id=case.id, user_id=current_user.id))
+        
+        response = jsonify({
+            'success': True,
+            'upload_id': upload_id,
+            'offset': 0
+        })
+        response.status_code = 201
+        response.headers['Upload-Offset'] = '0'
+        return response
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def _own_upload(current_user, upload_id):
+    found = get_document_store().upload_meta(upload_id)
+    if found is None or found[0]['user_id'] != current_user.id:
+        return None, None
+    return found
+
+def _upload_not_found():
+    return jsonify({
+        'success': False,
+        'error': 'Upload não encontrado ou expirado'
+    }), 404
+
+@document_bp.route('/documents/uploads/<upload_id>', methods=['GET', 'HEAD'])
+@token_required
+def get_document_upload(current_user, upload_id):
+    """Bytes já recebidos de um upload retomável"""
+    meta, offset = _own_upload(current_user, upload_id)
+    if meta is None:
+        return _upload_not_found()
+    
+    response = jsonify({
+        'success': True,
+        'upload_id': upload_id,
+        'offset': offset
+    })
+    response.headers['Upload-Offset'] = str(offset)
+    return response
+
+@document_bp.route('/documents/uploads/<upload_id>', methods=['PATCH'])
+@token_required
+def append_document_upload(current_user, upload_id):
+    """Acrescentar um bloco (corpo do pedido) a partir de Upload-Offset"""
+    try:
+        meta, _ = _own_upload(current_user, upload_id)
+        if meta is None:
+            return _upload_not_found()
+        
+        offset = request.headers.get('Upload-Offset', type=int)
+        if offset is None:
+            return jsonify({
+                'success': False,
+                'error': 'Cabeçalho Upload-Offset em falta'
+            }), 400
+        
+        offset = get_document_store().append_upload(upload_id, offset, request.stream)
+        
+        response = jsonify({
+            'success': True,
+            'upload_id': upload_id,
+            'offset': offset
+        })
+        response.headers['Upload-Offset'] = str(offset)
+        return response
+        
+    except UploadOffsetMismatch as e:
+        response = jsonify({
+            'success': False,
+            'error': str(e),
+            'offset': e.offset
+        })
+        response.status_code = 409
+        response.headers['Upload-Offset'] = str(e.offset)
+        return response
+    except (DocumentTooLarge, RequestEntityTooLarge) as e:
+        return _too_large(e)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@document_bp.route('/documents/uploads/<upload_id>/complete', methods=['POST'])
+@token_required
+def complete_document_upload(current_user, upload_id):
+    """Concluir um upload retomável e registar o documento"""
+    try:
+        meta, _ = _own_upload(current_user, upload_id)
+        if meta is None:
+            return _upload_not_found()
+        
+        # O acesso ao processo pode ter mudado desde o início do upload
+        case, error = _upload_case(current_user, meta['case_id'])
+        if error:
+            return error
+        
+        sha256, size, path = get_document_store().complete_upload(upload_id)
+        document = _create_document(case.id, current_user, meta, sha256, size, path)
+        
+        return jsonify({
+            'success': True,
+            'document': _document_dict(document, current_user.username)
+        }), 201
+        
+    except UploadBusy as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'offset': e.offset
+        }), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@document_bp.route('/documents/search', methods=['GET'])
+@token_optional
+def search_documents(current_user):
+    """Pesquisa no texto integral dos documentos visíveis para o utilizador.
+
+    O texto é indexado em segundo plano (flask index-documents); documentos
+    acabados de submeter só aparecem depois de processados.
+    """
+    try:
+        if not current_app.config.get('DOCUMENT_FTS_ENABLED'):
+            return jsonify({
+                'success': False,
+                'error': 'Pesquisa de documentos indisponível'
+            }), 503
+        
+        expression = fts_all_terms(request.args.get('q', '').strip())
+        if expression is None:
+            raise ValueError('Termo de pesquisa em falta (q)')
+        
+        case_id = request.args.get('case_id', type=int)
+        page = max(int(request.args.get('page', 1)), 1)
+        per_page = min(max(int(request.args.get('per_page', 10)), 1), SEARCH_MAX_PER_PAGE)
+        
+        # Visibilidade (e processo) filtrados dentro da consulta FTS
+        conditions = [_visible_documents(current_user)]
+        if case_id is not None:
+            conditions.append(Document.case_id == case_id)
+        
+        matches = document_matches(expression, *conditions)
+        query = (
+            db.select(Document, Case.case_number, User.username, matches.c.rank, matches.c.snippet)
+            .join(matches, matches.c.document_id == Document.id)
+            .join(Case, Document.case_id == Case.id)
+            .outerjoin(User, Document.uploaded_by == User.id)
+            .order_by(matches.c.rank, Document.id)
+        )
+        
+        rows = db.session.execute(query.limit(per_page + 1).offset((page - 1) * per_page)).all()
+        has_next = len(rows) > per_page
+        
+        documents = []
+        for row in rows[:per_page]:
+            data = _document_dict(row.Document, row.username)
+            data['case_number'] = row.case_number
+            data['snippet'] = row.snippet
+            data['rank'] = row.rank
+            documents.append(data)
+        
+        return jsonify({
+            'success': True,
+            'documents': documents,
+            'pagination': {
+                'page': page,
+                'per_page': per_page,
+                'has_next': has_next,
+                'has_prev': page > 1
+            }
+        })
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@document_bp.route('/documents/<int:document_id>/download', methods=['GET'])
+@token_optional
+def download_document(current_user, document_id):
+    """Download de um documento (ETag, 304 e Range), respeitando a visibilidade"""
+    try:
+        row = db.session.execute(
+            db.select(Document, Case.is_public, Case.lawyer_id, Case.judge_id)
+            .join(Case, Document.case_id == Case.id)
+            .where(Document.id == document_id, _visible_documents(current_user))
+        ).first()
+        
+        # Documentos sem acesso respondem como inexistentes
+        if row is None or not _case_visible(current_user, *row[1:]):
+            return jsonify({
+                'success': False,
+                'error': 'Documento não encontrado'
+            }), 404
+        
+        document = row.Document
+        info = document_file_info(document)
+        if info is None:
+            return jsonify({
+                'success': False,
+                'error': 'Ficheiro do documento não encontrado'
+            }), 404
+        
+        response = send_file_response(
+            info,
+            document.filename or document.title,
+            mimetype=document.content_type or 'application/octet-stream'
+        )
+        if not (document.is_public and row.is_public):
+            response.cache_control.private = True
+        return response
+        
+    except HTTPException:
+        # Ex.: 416 para um Range inválido
+        raise
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
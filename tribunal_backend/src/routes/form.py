@@ -1,42 +1,61 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, Response
+from werkzeug.exceptions import HTTPException
 from src.models.user import db, Form
-import os
+from src.models.cache import get_cache_backend
+from src.models.catalog import CatalogVariant, form_catalog, encode_payload
+from src.models.files import file_info, send_file_response
+import hashlib
 
 form_bp = Blueprint('form', __name__)
 
+# Metadados de download por formulário (ativo, ficheiro, título), válidos
+# enquanto a versão da tabela de formulários não mudar
+_download_cache = {}
+
+def _download_meta(form_id):
+    backend = get_cache_backend()
+    version = backend.get_versions(('form',)) if backend is not None else None
+
+    cached = _download_cache.get(form_id)
+    if version is not None and cached is not None and cached[0] == version:
+        return cached[1]
+
+    meta = db.session.execute(
+        db.select(Form.is_active, Form.file_path, Form.title).where(Form.id == form_id)
+    ).first()
+    if meta is not None and version is not None:
+        _download_cache[form_id] = (version, meta)
+    return meta
+
 @form_bp.route('/forms', methods=['GET'])
 def get_forms():
-    """Obter lista de formulários disponíveis"""
+    """Obter lista de formulários disponíveis (servida do catálogo em memória)"""
     try:
         category = request.args.get('category', '').strip()
         search = request.args.get('search', '').strip()
         
-        # Construir query
-        query = Form.query.filter(Form.is_active == True)
-        
-        if category:
-            query = query.filter(Form.category == category)
+        catalog = form_catalog()
         
         if search:
-            query = query.filter(Form.title.ilike(f'%{search}%'))
-        
-        # Ordenar por categoria e título
-        query = query.order_by(Form.category.asc(), Form.title.asc())
-        
-        forms = query.all()
+            # Pesquisa no título feita no índice do catálogo, sem consultar a base de dados
+            body = encode_payload(catalog.search(category, search))
+            response = Response(body, mimetype='application/json')
+            response.set_etag(hashlib.sha256(body).hexdigest()[:32])
+        else:
+            variant = catalog.variants.get(category or None)
+            if variant is None:
+                # Categoria sem formulários ativos
+                variant = CatalogVariant(encode_payload(catalog.search(category, '')))
+            
+            encoding, body, etag = variant.representation(request.accept_encodings)
+            response = Response(body, mimetype='application/json')
+            response.set_etag(etag)
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
         
-        # Agrupar por categoria
-        forms_by_category = {}
-        for form in forms:
-            if form.category not in forms_by_category:
-                forms_by_category[form.category] = []
-            forms_by_category[form.category].append(form.to_dict())
-        
-        return jsonify({
-            'success': True,
-            'forms': forms_by_category,
-            'total': len(forms)
-        })
+        response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
         
     except Exception as e:
         return jsonify({
@@ -84,31 +103,30 @@ def get_form_details(form_id):
 
 @form_bp.route('/forms/<int:form_id>/download', methods=['GET'])
 def download_form(form_id):
-    """Fazer download de um formulário"""
+    """Fazer download de um formulário (suporta ETag, If-Modified-Since e Range)"""
     try:
-        form = Form.query.get_or_404(form_id)
+        meta = _download_meta(form_id)
         
-        if not form.is_active:
+        if meta is None or not meta.is_active:
             return jsonify({
                 'success': False,
                 'error': 'Formulário não disponível'
             }), 404
         
-        if not form.file_path or not os.path.exists(form.file_path):
+        info = file_info(meta.file_path) if meta.file_path else None
+        if info is None:
             return jsonify({
                 'success': False,
                 'error': 'Ficheiro do formulário não encontrado'
             }), 404
         
-        return send_file(
-            form.file_path,
-            as_attachment=True,
-            download_name=f"{form.title}.pdf"
-        )
+        return send_file_response(info, f"{meta.title}.pdf", mimetype='application/pdf')
         
+    except HTTPException:
+        # Ex.: 416 para um Range inválido
+        raise
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
-
@@ -0,0 +1,35 @@
+import hmac
+from flask import Blueprint, request, jsonify, current_app, Response
+from src.models.metrics import PROMETHEUS_CONTENT_TYPE, get_metrics
+from src.routes.auth import auth_cache
+
+metrics_bp = Blueprint('metrics', __name__)
+
+# Métricas do processo no formato do Prometheus. O scraper tem de enviar
+# "Authorization: Bearer <METRICS_TOKEN>"; sem METRICS_TOKEN configurado o
+# acesso é sempre recusado (tráfego, erros e caches não são públicos).
+
+def _authorized(token):
+    return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Latências, consultas SQL e caches (texto do Prometheus)"""
+    try:
+        registry = get_metrics()
+        if registry is None:
+            return jsonify({'success': False, 'error': 'Métricas desativadas'}), 404
+        token = current_app.config.get('METRICS_TOKEN')
+        if not token:
+            return jsonify({'success': False, 'error': 'Acesso às métricas desativado (METRICS_TOKEN não configurado)'}), 403
+        if not _authorized(token):
+            return jsonify({'success': False, 'error': 'Token inválido'}), 401
+
+        body = registry.render({'auth': auth_cache.stats()})
+        return Response(body, content_type=PROMETHEUS_CONTENT_TYPE)
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
@@ -0,0 +1,95 @@
+from flask import Blueprint, request, jsonify
+from src.models.scheduling import check_slot, audit, validate_duration
+from src.routes.auth import token_required
+from datetime import datetime
+import time
+
+scheduling_bp = Blueprint('scheduling', __name__)
+
+# Perfis com acesso ao agendamento de audiências
+SCHEDULING_ROLES = ('judge', 'admin')
+
+def _forbidden():
+    return jsonify({
+        'success': False,
+        'error': 'Acesso reservado a juízes e administradores'
+    }), 403
+
+@scheduling_bp.route('/hearings/conflicts/check', methods=['POST'])
+@token_required
+def check_hearing_slot(current_user):
+    """Verificar conflitos de sala e de juiz para um horário proposto"""
+    if current_user.role not in SCHEDULING_ROLES:
+        return _forbidden()
+    
+    try:
+        data = request.get_json()
+        
+        if not data or 'hearing_date' not in data or not (data.get('courtroom') or data.get('judge_id')):
+            return jsonify({
+                'success': False,
+                'error': 'Dados em falta (hearing_date e courtroom ou judge_id)'
+            }), 400
+        
+        start = datetime.fromisoformat(data['hearing_date'])
+        duration_minutes = validate_duration(data.get('duration_minutes'))
+        
+        started = time.perf_counter()
+        conflicts = check_slot(
+            start,
+            duration_minutes,
+            courtroom=data.get('courtroom'),
+            judge_id=data.get('judge_id'),
+            exclude_id=data.get('exclude_id')
+        )
+        
+        return jsonify({
+            'success': True,
+            'available': not conflicts,
+            'conflicts': conflicts,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 3)
+        })
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@scheduling_bp.route('/hearings/conflicts', methods=['GET'])
+@token_required
+def audit_hearing_conflicts(current_user):
+    """Auditoria de todos os conflitos de agendamento (por sala e por juiz)"""
+    if current_user.role not in SCHEDULING_ROLES:
+        return _forbidden()
+    
+    try:
+        date_from = request.args.get('date_from', '').strip()
+        date_to = request.args.get('date_to', '').strip()
+        
+        conflicts = audit(
+            datetime.fromisoformat(date_from) if date_from else None,
+            datetime.fromisoformat(date_to) if date_to else None
+        )
+        
+        return jsonify({
+            'success': True,
+            'conflicts': conflicts,
+            'total': len(conflicts)
+        })
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
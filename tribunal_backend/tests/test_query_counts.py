@@ -0,0 +1,100 @@
+"""Número de consultas SQL por pedido independente do número de linhas.
+
+Uso: python -m pytest tests (a partir de tribunal_backend/)
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+# DON'T CHANGE THIS !!!
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+from src.models.user import db, User, Case, Hearing, add_missing_columns, create_missing_indexes
+from src.models.database import configure_database, init_database
+from src.models.search import init_case_search
+from src.models.serialization import init_json_provider
+from src.routes.case import case_bp
+
+
+def create_app(db_path, cases):
+    """Aplicação com o blueprint dos processos e `cases` processos, cada um com juiz, advogado e 2 audiências"""
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'test'
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['RESPONSE_CACHE_BACKEND'] = None
+    app.register_blueprint(case_bp, url_prefix='/api')
+
+    init_json_provider(app)
+    configure_database(app)
+    db.init_app(app)
+    init_database(app)
+    with app.app_context():
+        db.create_all()
+        add_missing_columns()
+        create_missing_indexes()
+        init_case_search(app)
+
+        start = datetime(2026, 1, 5, 9, 0)
+        for i in range(cases):
+            # Juiz e advogado diferentes em cada processo
+            judge = User(username=f'juiz{i}', email=f'juiz{i}@tsrb.gov.mz', password_hash='-', role='judge')
+            lawyer = User(username=f'advogado{i}', email=f'advogado{i}@tsrb.gov.mz', password_hash='-', role='lawyer')
+            case = Case(
+                case_number=f'2026/CV/{i:06d}', title=f'Processo {i}', case_type='civil',
+                plaintiff=f'Autor {i}', defendant=f'Réu {i}', judge=judge, lawyer=lawyer, is_public=True,
+                filing_date=start + timedelta(days=i)
+            )
+            db.session.add_all([judge, lawyer, case])
+            for day in range(2):
+                db.session.add(Hearing(
+                    case=case, judge=judge, hearing_type='trial', courtroom='Sala 1',
+                    hearing_date=start + timedelta(days=i, hours=day)
+                ))
+        db.session.commit()
+    return app
+
+
+def count_queries(app, url):
+    client = app.test_client()
+    with app.app_context():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        engine = db.engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            response = client.get(url)
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return len(statements), response.get_json()
+
+
+@pytest.fixture(scope='module')
+def apps(tmp_path_factory):
+    small = create_app(tmp_path_factory.mktemp('small') / 'test.db', 3)
+    large = create_app(tmp_path_factory.mktemp('large') / 'test.db', 40)
+    return small, large
+
+
+@pytest.mark.parametrize('url, key', [
+    ('/api/cases/search?per_page=50', 'cases'),
+    ('/api/cases/search?per_page=50&cursor=', 'cases'),
+    ('/api/cases/search?per_page=50&fields=id,case_number,judge,lawyer', 'cases'),
+    ('/api/hearings?window=all&per_page=100', 'hearings'),
+    ('/api/hearings?window=all&per_page=100&fields=id,hearing_date,case_number,judge', 'hearings'),
+])
+def test_query_count_independent_of_rows(apps, url, key):
+    small, large = apps
+    small_queries, small_body = count_queries(small, url)
+    large_queries, large_body = count_queries(large, url)
+
+    assert len(large_body[key]) > len(small_body[key])
+    assert large_queries == small_queries